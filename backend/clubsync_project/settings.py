@@ -185,6 +185,37 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Solver — worker processes used to solve independent schedule components in parallel
+SOLVER_WORKERS = int(os.getenv("SOLVER_WORKERS", "1"))
+# Most cores the solver may keep busy at once (portfolio runs × search threads); 0 = all of them
+SOLVER_CORE_BUDGET = int(os.getenv("SOLVER_CORE_BUDGET", "0"))
+# Where solves run with dump_model write their CP-SAT models (replay with manage.py replay_solver_model)
+SOLVER_DUMP_DIR = os.getenv("SOLVER_DUMP_DIR", str(BASE_DIR / "solver_dumps"))
+
+# Solver result cache — identical re-runs are served from here. Entries expire after the TTL; a
+# full cache culls entries (LocMemCache drops the least recently used, DatabaseCache a share of
+# them in key order) so it stays within MAX_ENTRIES.
+# LocMemCache is per process, so with several gunicorn workers a re-run only hits when it lands on
+# the same worker; share it with SOLVER_CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+# and SOLVER_CACHE_LOCATION=<table> (created by `manage.py createcachetable`), as the Docker image does
+SOLVER_CACHE_ALIAS = "solver"
+SOLVER_CACHE_BACKEND = os.getenv("SOLVER_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    SOLVER_CACHE_ALIAS: {
+        "BACKEND": SOLVER_CACHE_BACKEND,
+        "LOCATION": os.getenv("SOLVER_CACHE_LOCATION", "solver-results"),
+        "TIMEOUT": int(os.getenv("SOLVER_CACHE_TTL", "3600")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("SOLVER_CACHE_MAX_ENTRIES", "32"))},
+    },
+}
+
+# Solve jobs — 'thread' (in-process pool), 'command' (manage.py run_solve_jobs) or 'inline'
+SOLVE_JOB_RUNNER = os.getenv("SOLVE_JOB_RUNNER", "thread")
+SOLVE_JOB_THREADS = int(os.getenv("SOLVE_JOB_THREADS", "1"))
+
 # CORS / CSRF settings
 CORS_ALLOW_CREDENTIALS = True
 CSRF_TRUSTED_ORIGINS = [
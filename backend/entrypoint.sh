@@ -3,6 +3,7 @@ set -e
 
 echo "Running database migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
 
 echo "Loading sample data..."
 python manage.py load_sample_data
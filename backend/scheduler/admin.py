@@ -1,6 +1,6 @@
 # scheduler/admin.py
 from django.contrib import admin
-from .models import Facility, Event, Team, BookingRequest
+from .models import Facility, Event, Team, BookingRequest, SolveJob
 
 
 @admin.register(Facility)
@@ -29,3 +29,10 @@ class BookingRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'priority', 'event_type', 'recurrence')
     search_fields = ('title', 'team__name')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(SolveJob)
+class SolveJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'date_from', 'date_until', 'status', 'progress', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
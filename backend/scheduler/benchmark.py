@@ -0,0 +1,271 @@
+# scheduler/benchmark.py — Synthetic clubs for solver benchmarking
+#
+# Builds a parameterised club (N teams, M facilities, K weeks, fixed-fixture
+# density) from a seed, so the same scenario is reproducible across runs and
+# machines. Used by `manage.py benchmark_solver`, which runs inside a throwaway
+# test database (benchmark_database) so the real club data is never touched.
+# Each scenario is built and solved inside a transaction that is rolled back,
+# so every scenario starts from an empty club.
+#
+# Models dumped by a real solve (options.dump_model) can be re-solved with
+# replay_dump(), used by `manage.py replay_solver_model`.
+
+import csv
+import json
+import os
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+from ortools.sat.python import cp_model
+
+from .models import Facility, Team, Event, BookingRequest
+from .solver import solve_schedule, SolverOptions, PORTFOLIO_PRESETS, STATUS_MAP
+
+BENCHMARK_START = date(2030, 1, 7)  # a Monday, clear of any real club data
+AGE_GROUPS = ['U8', 'U10', 'U12', 'U14', 'U16', 'Minor', 'Junior', 'Senior']
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+FIXTURE_HOURS = (10, 13, 16)        # weekend fixture starts — 2h match + warmup never touch
+GYM_SESSION_SHARE = 0.3             # share of teams that also request a gym session
+PREFERRED_FACILITY_SHARE = 0.5      # share of training requests naming a preferred pitch
+
+
+@dataclass
+class BenchmarkScenario:
+    teams: int
+    facilities: int
+    weeks: int
+    fixed_density: float = 1.0      # fixed fixtures per pitch per week
+    seed: int = 0
+
+    @property
+    def date_from(self) -> date:
+        return BENCHMARK_START
+
+    @property
+    def date_until(self) -> date:
+        return BENCHMARK_START + timedelta(weeks=self.weeks, days=-1)
+
+
+@contextmanager
+def benchmark_database():
+    """Point the default connection at a new, empty test database until the block exits.
+
+    Uses Django's test-database machinery (test_<NAME>; an in-memory database on
+    SQLite), so the configured database — and the live club — is never locked or
+    written. On PostgreSQL the database user needs the CREATEDB privilege.
+    """
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def _clear_club() -> None:
+    BookingRequest.objects.all().delete()
+    Event.objects.all().delete()
+    Team.objects.all().delete()
+    Facility.objects.all().delete()
+
+
+def build_synthetic_club(scenario: BenchmarkScenario) -> dict:
+    """Create facilities, teams, fixed fixtures and pending requests for a scenario.
+
+    Roughly three in four facilities are pitches (at least one), the rest split
+    between halls and gyms. Every team asks for two weekday trainings in an
+    evening window; some also want a gym session. Returns counts of what was made.
+    """
+    rng = random.Random(scenario.seed)
+
+    num_pitches = max(1, round(scenario.facilities * 0.75))
+    facilities = []
+    for i in range(scenario.facilities):
+        if i < num_pitches:
+            facilities.append(Facility.objects.create(
+                name=f'Pitch {i + 1}', type='pitch',
+                suitable_for=['match', 'championship', 'adult_training', 'juvenile_training'],
+            ))
+        elif (i - num_pitches) % 2 == 0:
+            facilities.append(Facility.objects.create(
+                name=f'Gym {i + 1}', type='gym', suitable_for=['gym_session'],
+            ))
+        else:
+            facilities.append(Facility.objects.create(
+                name=f'Hall {i + 1}', type='hall', suitable_for=['meeting'],
+            ))
+    pitches = facilities[:num_pitches]
+    gyms = [f for f in facilities if f.type == 'gym']
+
+    teams = [
+        Team.objects.create(
+            name=f'Team {i + 1}', age_group=AGE_GROUPS[i % len(AGE_GROUPS)],
+            is_flexible=rng.random() < 0.7,
+        )
+        for i in range(scenario.teams)
+    ]
+
+    # ── Fixed fixtures (weekend, published) ──
+    fixtures = 0
+    per_week = round(scenario.fixed_density * num_pitches)
+    for week in range(scenario.weeks):
+        saturday = scenario.date_from + timedelta(weeks=week, days=5)
+        spots = [(saturday + timedelta(days=d), hour, pitch)
+                 for d in (0, 1) for hour in FIXTURE_HOURS for pitch in pitches]
+        busy_teams = set()
+        for day, hour, pitch in rng.sample(spots, min(per_week, len(spots))):
+            team = rng.choice([t for t in teams if (t.id, day) not in busy_teams] or [None])
+            if team is not None:
+                busy_teams.add((team.id, day))
+            start = timezone.make_aware(datetime.combine(day, time(hour, 0)))
+            Event.objects.create(
+                title=f'Fixture {fixtures + 1}', start_time=start, end_time=start + timedelta(hours=2),
+                facility=pitch, team=team, event_type='match', is_fixed=True, status='published',
+            )
+            fixtures += 1
+
+    # ── Pending requests ──
+    requests = []
+    for team in teams:
+        juvenile = team.age_group in ('U8', 'U10', 'U12', 'U14')
+        window_start = rng.choice([17, 18]) if juvenile else rng.choice([18, 19])
+        requests.append(BookingRequest(
+            team=team, title=f'{team.name} Training',
+            event_type='juvenile_training' if juvenile else 'adult_training',
+            duration_minutes=60 if juvenile else 90,
+            recurrence='weekly',
+            preferred_days=sorted(rng.sample(WEEKDAYS, 2), key=WEEKDAYS.index),
+            preferred_facility=rng.choice(pitches) if rng.random() < PREFERRED_FACILITY_SHARE else None,
+            preferred_time_start=time(window_start, 0),
+            preferred_time_end=time(min(window_start + 3, 22), 0),
+            priority=rng.choice([1, 2, 2, 3]),
+            schedule_from=scenario.date_from, schedule_until=scenario.date_until,
+        ))
+        if gyms and rng.random() < GYM_SESSION_SHARE:
+            requests.append(BookingRequest(
+                team=team, title=f'{team.name} Gym', event_type='gym_session',
+                duration_minutes=60, recurrence='weekly',
+                preferred_days=[rng.choice(WEEKDAYS)],
+                preferred_time_start=time(17, 0), preferred_time_end=time(22, 0),
+                priority=1,
+                schedule_from=scenario.date_from, schedule_until=scenario.date_until,
+            ))
+    BookingRequest.objects.bulk_create(requests)
+
+    return {'requests': len(requests), 'fixed_events': fixtures}
+
+
+def run_scenario(scenario: BenchmarkScenario, options: SolverOptions | None = None) -> dict:
+    """Build a scenario, solve it and return one report row. Leaves the database unchanged.
+
+    Clears the club in the current database for the length of a rolled-back
+    transaction: run it inside benchmark_database(), never on a live database.
+    """
+    options = options or SolverOptions()
+    options.use_cache = False  # always measure a real solve
+
+    with transaction.atomic():
+        _clear_club()
+        counts = build_synthetic_club(scenario)
+
+        started = perf_counter()
+        result = solve_schedule(scenario.date_from, scenario.date_until, options)
+        wall_time = perf_counter() - started
+
+        transaction.set_rollback(True)
+
+    row = {
+        'teams': scenario.teams,
+        'facilities': scenario.facilities,
+        'weeks': scenario.weeks,
+        'fixed_density': scenario.fixed_density,
+        'seed': scenario.seed,
+        'formulation': 'lean' if options.lean_model else 'classic',
+        'objective_mode': 'two_stage' if options.two_stage else 'weighted',
+        **counts,
+        'slots_scheduled': len(result.events),
+        'slots_unscheduled': len(result.unscheduled),
+        'status': result.status,
+        'stop_reason': result.stop_reason,
+        'time_limit': result.time_limit,
+        'penalty': result.penalty,
+        'best_bound': result.stats.get('best_bound'),
+        'solve_time': round(result.solve_time, 4),
+        'wall_time': round(wall_time, 4),
+        'components': result.components,
+    }
+    for key in ('variables', 'intervals', 'no_overlaps', 'penalties', 'pruned_choices', 'unfit_slots',
+                'branches', 'conflicts'):
+        row[key] = result.stats.get(key)
+    for phase in ('query', 'generate_slots', 'presolve', 'greedy', 'build', 'search', 'extract'):
+        row[f'{phase}_time'] = round(result.timings.get(phase, 0.0), 4)
+    return row
+
+
+def replay_dump(model_path: str, overrides: dict | None = None, preset: str | None = None) -> dict:
+    """Re-solve a dumped model and return one report row next to the recorded outcome.
+
+    Starts from the numeric CP-SAT parameters in the model's JSON sidecar (if
+    there is one), then applies the named PORTFOLIO_PRESETS entry and finally
+    the overrides (e.g. {'max_time_in_seconds': 10, 'random_seed': 2}).
+    """
+    sidecar = {}
+    sidecar_path = os.path.splitext(model_path)[0] + '.json'
+    if os.path.exists(sidecar_path):
+        with open(sidecar_path) as fh:
+            sidecar = json.load(fh)
+
+    model = cp_model.CpModel()
+    with open(model_path) as fh:
+        model.proto.parse_text_format(fh.read())
+
+    # Enum-valued parameters are recorded as text — a preset puts them back
+    params = {k: v for k, v in sidecar.get('parameters', {}).items() if isinstance(v, (int, float))}
+    if preset:
+        params.update(dict(PORTFOLIO_PRESETS)[preset])
+    params.update(overrides or {})
+
+    solver = cp_model.CpSolver()
+    for name, value in params.items():
+        setattr(solver.parameters, name, value)
+    started = perf_counter()
+    status_code = solver.solve(model)
+    wall_time = perf_counter() - started
+    solved = status_code in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    recorded = sidecar.get('result', {})
+    return {
+        'model': os.path.basename(model_path),
+        'slots': len(sidecar.get('slots', [])),
+        'variables': len(model.proto.variables),
+        'constraints': len(model.proto.constraints),
+        'time_limit': params.get('max_time_in_seconds'),
+        'workers': params.get('num_workers'),
+        'seed': params.get('random_seed'),
+        'preset': preset or '',
+        'status': STATUS_MAP.get(status_code, 'UNKNOWN'),
+        'objective': solver.objective_value if solved else None,
+        'best_bound': solver.best_objective_bound if solved else None,
+        'wall_time': round(wall_time, 4),
+        'branches': solver.num_branches,
+        'conflicts': solver.num_conflicts,
+        'recorded_status': recorded.get('status'),
+        'recorded_objective': recorded.get('objective'),
+        'recorded_wall_time': recorded.get('wall_time'),
+    }
+
+
+def write_report(rows: list[dict], path: str) -> None:
+    """Write report rows to path; .json writes JSON, anything else CSV."""
+    with open(path, 'w', newline='') as fh:
+        if path.endswith('.json'):
+            json.dump(rows, fh, indent=2)
+        else:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,572 @@
+# scheduler/jobs.py — Background solve jobs
+#
+# POST /schedule/generate/ records a SolveJob and hands it to a runner so the
+# HTTP worker is freed immediately; clients poll GET /schedule/jobs/<id>/.
+# Runner is chosen by settings.SOLVE_JOB_RUNNER:
+#   'thread'  — small in-process thread pool (default)
+#   'command' — left queued for `manage.py run_solve_jobs` in a separate process
+#   'inline'  — run before the response is sent (tests, debugging)
+# While a job runs, a watcher thread writes the improving solutions found so far to
+# SolveJob.solutions, and POST /schedule/jobs/<id>/accept/ stops the search with the
+# best schedule so far. The watcher also stamps SolveJob.heartbeat_at; a running
+# job whose heartbeat goes quiet lost its worker (e.g. a restart) and is failed by
+# the sweep in fail_stale_jobs().
+#
+# Also home to the solve-and-apply services shared by the views: full range
+# generation and the (fast, synchronous) incremental re-solve of one request.
+
+import logging
+import threading
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Facility, Event, BookingRequest, SolveJob
+from .solver import solve_schedule as run_solver, solve_incremental, SolveProgress, SolverOptions, SolverResult
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+SOLVED_STATUSES = ('scheduled', 'partial', 'rejected')  # set by the solver; reset before a re-run
+WATCH_INTERVAL = 0.5           # seconds between job-row writes of new solutions / checks for an accept-early request
+MAX_STORED_SOLUTIONS = 100     # keep the job row small on long searches
+HEARTBEAT_INTERVAL = 30        # seconds between heartbeat_at stamps while a job runs
+STALE_JOB_TIMEOUT = 120        # seconds without a heartbeat before a running job counts as lost
+STALE_JOB_ERROR = 'The worker running this job stopped before it finished.'
+
+
+def generate_schedule_for_range(date_from: date, date_until: date, options: SolverOptions,
+                                progress: SolveProgress | None = None) -> dict:
+    """
+    Run the solver for a date range and apply the result.
+
+    Writes the proposed Events (only the rows that changed, see
+    _upsert_proposed_events), updates BookingRequest statuses and returns the
+    response payload (including schedule_diff) for the review panel.
+    """
+    # Reset any previously solved requests back to pending
+    BookingRequest.objects.filter(
+        status__in=SOLVED_STATUSES,
+        schedule_from__lte=date_until,
+        schedule_until__gte=date_from,
+    ).update(status='pending', rejection_reason='')
+
+    # Run solver — before touching old proposals so it can warm-start from them
+    result = run_solver(date_from, date_until, options, progress)
+    proposed = Event.objects.filter(
+        status='proposed',
+        start_time__date__gte=date_from,
+        start_time__date__lte=date_until,
+    )
+
+    if not result.success:
+        proposed.delete()  # clean slate, as the failed run proposes nothing
+        _log_solve('generate', date_from, date_until, result)
+        return {
+            'success': False,
+            'solver_status': result.status,
+            'solve_time_seconds': round(result.solve_time, 2),
+            **_metrics(result),
+            'conflicts': _conflicts_payload(result),
+            'message': _failure_message(
+                result, 'Could not find a valid schedule. Try reducing requests or relaxing constraints.'),
+        }
+
+    started = perf_counter()
+    event_changes = _upsert_proposed_events(proposed, result.events)
+
+    # Update processed BookingRequests to 'scheduled' / 'partial' / 'rejected'
+    outcomes = _apply_request_outcomes(result)
+    result.timings['apply'] = perf_counter() - started
+
+    # Build schedule_diff for the review panel
+    started = perf_counter()
+    schedule_diff = _build_schedule_diff(result.events, result.requests_processed)
+    result.timings['schedule_diff'] = perf_counter() - started
+    _log_solve('generate', date_from, date_until, result)
+
+    return {
+        'success': True,
+        'solver_status': result.status,
+        'solve_time_seconds': round(result.solve_time, 2),
+        'total_penalty': result.penalty,
+        'events_created': len(result.events),
+        'event_changes': event_changes,
+        'requests_processed': len(result.requests_processed),
+        'requests_partial': outcomes['partial'],
+        'requests_rejected': outcomes['rejected'],
+        'unscheduled': _unscheduled_payload(result),
+        'components': result.components,
+        'windows': result.windows,
+        'hints_added': result.hints_added,
+        'hints_kept': result.hints_kept,
+        'cached': result.cached,
+        'stopped_early': result.stopped_early,
+        **_metrics(result),
+        'schedule_diff': schedule_diff,
+    }
+
+
+def resolve_request_incrementally(booking_request: BookingRequest, date_from: date, date_until: date,
+                                  options: SolverOptions) -> dict:
+    """
+    Re-place one BookingRequest, moving only the proposed events it could disturb.
+
+    Nothing is changed unless the solver succeeds. Returns a payload shaped like
+    the generate result, plus events_replaced.
+    """
+    result = solve_incremental(booking_request.id, date_from, date_until, options)
+
+    if not result.success:
+        _log_solve('incremental', date_from, date_until, result)
+        return {
+            'success': False,
+            'solver_status': result.status,
+            'solve_time_seconds': round(result.solve_time, 2),
+            **_metrics(result),
+            'conflicts': _conflicts_payload(result),
+            'message': _failure_message(
+                result, 'The request does not fit around the current proposals. Run a full Generate instead.'),
+        }
+
+    started = perf_counter()
+    Event.objects.filter(id__in=result.replaced_event_ids, status='proposed').delete()
+    _create_proposed_events(result.events)
+    outcomes = _apply_request_outcomes(result, request_ids={booking_request.id})
+    result.timings['apply'] = perf_counter() - started
+
+    started = perf_counter()
+    schedule_diff = _build_schedule_diff(result.events, result.requests_processed)
+    result.timings['schedule_diff'] = perf_counter() - started
+    _log_solve('incremental', date_from, date_until, result)
+
+    return {
+        'success': True,
+        'solver_status': result.status,
+        'solve_time_seconds': round(result.solve_time, 2),
+        'total_penalty': result.penalty,
+        'events_created': len(result.events),
+        'events_replaced': len(result.replaced_event_ids),
+        'requests_processed': len(result.requests_processed),
+        'requests_partial': outcomes['partial'],
+        'requests_rejected': outcomes['rejected'],
+        'unscheduled': _unscheduled_payload(result),
+        **_metrics(result),
+        'schedule_diff': schedule_diff,
+    }
+
+
+def _apply_request_outcomes(result: SolverResult, request_ids: set | None = None) -> dict:
+    """Mark requests scheduled, partial (some slots left out) or rejected (all left out).
+
+    Left-out slots get a rejection_reason listing their dates and why. Only
+    requests in request_ids are touched when it is given. Returns the counts.
+    """
+    left_out = defaultdict(list)
+    for entry in result.unscheduled:
+        left_out[entry['request_id']].append(entry)
+
+    placed = set(result.requests_processed)
+    if request_ids is not None:
+        placed &= request_ids
+        left_out = {rid: entries for rid, entries in left_out.items() if rid in request_ids}
+
+    BookingRequest.objects.filter(id__in=placed - left_out.keys()).update(
+        status='scheduled', rejection_reason='',
+    )
+    counts = {'partial': 0, 'rejected': 0}
+    for request_id, entries in left_out.items():
+        status = 'partial' if request_id in placed else 'rejected'
+        BookingRequest.objects.filter(id=request_id).update(
+            status=status, rejection_reason=_rejection_reason(entries),
+        )
+        counts[status] += 1
+    return counts
+
+
+def _rejection_reason(entries: list[dict]) -> str:
+    """e.g. 'Not scheduled on 2026-03-17, 2026-03-24: No free time in the preferred window — ...'"""
+    by_reason = defaultdict(list)
+    for entry in sorted(entries, key=lambda e: e['date']):
+        by_reason[entry['reason']].append(entry['date'].isoformat())
+    return ' '.join(
+        f"Not scheduled on {', '.join(dates)}: {reason}" for reason, dates in by_reason.items()
+    )
+
+
+def _unscheduled_payload(result: SolverResult) -> list[dict]:
+    return [
+        {'request_id': entry['request_id'], 'date': entry['date'].isoformat(), 'reason': entry['reason']}
+        for entry in result.unscheduled
+    ]
+
+
+def _conflicts_payload(result: SolverResult) -> dict:
+    """Describe the minimal conflicting requests/events of an INFEASIBLE run for the admin."""
+    conflicts = result.conflicts or {}
+    requests = BookingRequest.objects.filter(id__in=conflicts.get('requests', [])).select_related('team')
+    events = Event.objects.filter(id__in=conflicts.get('events', [])).select_related('facility')
+    return {
+        'requests': [
+            {'id': r.id, 'title': r.title, 'team_name': r.team.name}
+            for r in requests
+        ],
+        'events': [
+            {
+                'id': ev.id,
+                'title': ev.title,
+                'facility_name': ev.facility.name,
+                'start_time': timezone.localtime(ev.start_time).isoformat(),
+            }
+            for ev in events
+        ],
+    }
+
+
+def _failure_message(result: SolverResult, default: str) -> str:
+    if result.conflicts.get('requests') or result.conflicts.get('events'):
+        return 'These requests and events cannot all be scheduled together — change or remove one of them.'
+    return default
+
+
+def _metrics(result: SolverResult) -> dict:
+    """Per-phase timings (seconds), model/search stats and why the search stopped."""
+    return {
+        'stop_reason': result.stop_reason,
+        'time_limit_seconds': round(result.time_limit, 2) if result.time_limit is not None else None,
+        'timings': {phase: round(seconds, 4) for phase, seconds in result.timings.items()},
+        'model_stats': result.stats,
+        'portfolio': result.portfolio,
+    }
+
+
+def _log_solve(kind: str, date_from: date, date_until: date, result: SolverResult) -> None:
+    logger.info(
+        'Solve (%s) %s..%s: status=%s stop_reason=%s cached=%s timings=%s stats=%s',
+        kind, date_from, date_until, result.status, result.stop_reason, result.cached,
+        {phase: round(seconds, 4) for phase, seconds in result.timings.items()}, result.stats,
+    )
+
+
+def _create_proposed_events(events: list[dict]) -> None:
+    """Bulk create proposed events (bypasses Event.save() overlap check — solver guarantees HC1)."""
+    Event.objects.bulk_create([
+        Event(
+            title=ev['title'],
+            start_time=ev['start_time'],
+            end_time=ev['end_time'],
+            facility_id=ev['facility_id'],
+            team_id=ev['team_id'],
+            event_type=ev['event_type'],
+            booking_request_id=ev['request_id'],
+            status='proposed',
+            is_fixed=False,
+        )
+        for ev in events
+    ])
+
+
+PROPOSAL_FIELDS = ('title', 'start_time', 'end_time', 'facility_id', 'team_id', 'event_type', 'booking_request_id')
+
+
+def _upsert_proposed_events(proposed, events: list[dict]) -> dict:
+    """Write solved events over the existing proposals, touching only rows that changed.
+
+    A solved event takes over the proposal of the same request on the same date:
+    that row is left alone when nothing moved and updated in place when it did.
+    Events without a proposal are created, and proposals the solver no longer
+    places are deleted. Proposals from before Event.booking_request have no
+    request to match on, so they are matched on team, title and date like the
+    solver's previous placements are, and take over the request when reused.
+    Returns the created/updated/unchanged/deleted counts.
+    """
+    existing = {}
+    legacy = {}
+    stale = []
+    for ev in proposed:
+        day = timezone.localtime(ev.start_time).date()
+        if ev.booking_request_id is None:
+            index, key = legacy, (ev.team_id, ev.title, day)
+        else:
+            index, key = existing, (ev.booking_request_id, day)
+        if key in index:
+            stale.append(ev.id)
+        else:
+            index[key] = ev
+
+    to_create = []
+    to_update = []
+    unchanged = 0
+    for solved in events:
+        day = solved['start_time'].date()
+        ev = existing.pop((solved['request_id'], day), None)
+        if ev is None:
+            ev = legacy.pop((solved['team_id'], solved['title'], day), None)
+        if ev is None:
+            to_create.append(solved)
+            continue
+        values = {
+            'title': solved['title'],
+            'start_time': _aware(solved['start_time']),
+            'end_time': _aware(solved['end_time']),
+            'facility_id': solved['facility_id'],
+            'team_id': solved['team_id'],
+            'event_type': solved['event_type'],
+            'booking_request_id': solved['request_id'],
+        }
+        if all(getattr(ev, name) == value for name, value in values.items()):
+            unchanged += 1
+            continue
+        for name, value in values.items():
+            setattr(ev, name, value)
+        to_update.append(ev)
+
+    stale.extend(ev.id for ev in [*existing.values(), *legacy.values()])
+    with transaction.atomic():
+        Event.objects.filter(id__in=stale).delete()
+        Event.objects.bulk_update(to_update, PROPOSAL_FIELDS)
+        _create_proposed_events(to_create)
+    return {'created': len(to_create), 'updated': len(to_update), 'unchanged': unchanged, 'deleted': len(stale)}
+
+
+def _aware(dt):
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def _build_schedule_diff(events: list[dict], request_ids: set) -> list[dict]:
+    """Compare solver-assigned events against each request's preferences (review panel rows)."""
+    schedule_diff = []
+    if request_ids:
+        facility_lookup = {f.id: f.name for f in Facility.objects.all()}
+
+        processed_requests = {
+            r.id: r
+            for r in BookingRequest.objects.filter(
+                id__in=request_ids
+            ).select_related('team', 'preferred_facility')
+        }
+
+        events_by_request = defaultdict(list)
+        for ev in events:
+            events_by_request[ev['request_id']].append(ev)
+
+        for req_id, req in processed_requests.items():
+            assigned_events = events_by_request.get(req_id, [])
+            if not assigned_events:
+                continue
+
+            # Determine assigned facility
+            facility_ids = {ev['facility_id'] for ev in assigned_events}
+            if len(facility_ids) == 1:
+                assigned_facility = facility_lookup.get(facility_ids.pop(), 'Unknown')
+            else:
+                most_common_id = Counter(ev['facility_id'] for ev in assigned_events).most_common(1)[0][0]
+                assigned_facility = f"Mixed (mostly {facility_lookup.get(most_common_id, 'Unknown')})"
+
+            # Determine assigned time
+            start_times = {ev['start_time'].strftime('%H:%M') for ev in assigned_events}
+            if len(start_times) == 1:
+                assigned_time = start_times.pop()
+            else:
+                most_common_time = Counter(ev['start_time'].strftime('%H:%M') for ev in assigned_events).most_common(1)[0][0]
+                assigned_time = f"Mixed (mostly {most_common_time})"
+
+            # Compare against preferences
+            requested_facility = req.preferred_facility.name if req.preferred_facility else 'Any'
+            requested_time = f"{req.preferred_time_start.strftime('%H:%M')}-{req.preferred_time_end.strftime('%H:%M')}"
+
+            facility_changed = bool(
+                req.preferred_facility and
+                not all(ev['facility_id'] == req.preferred_facility_id for ev in assigned_events)
+            )
+
+            time_changed = False
+            pref_start_mins = req.preferred_time_start.hour * 60 + req.preferred_time_start.minute
+            pref_end_mins = req.preferred_time_end.hour * 60 + req.preferred_time_end.minute
+            for ev in assigned_events:
+                ev_start_mins = ev['start_time'].hour * 60 + ev['start_time'].minute
+                ev_end_mins = ev_start_mins + req.duration_minutes
+                if ev_start_mins < pref_start_mins or ev_end_mins > pref_end_mins:
+                    time_changed = True
+                    break
+
+            # Per-week breakdown for expandable row
+            weekly_breakdown = []
+            for ev in sorted(assigned_events, key=lambda e: e['start_time']):
+                weekly_breakdown.append({
+                    'date': ev['start_time'].strftime('%a %d %b'),
+                    'facility': facility_lookup.get(ev['facility_id'], 'Unknown'),
+                    'time': ev['start_time'].strftime('%H:%M'),
+                    'duration': req.duration_minutes,
+                })
+
+            schedule_diff.append({
+                'request_id': req_id,
+                'team_name': req.team.name,
+                'event_type': req.event_type,
+                'title': req.title,
+                'requested_facility': requested_facility,
+                'assigned_facility': assigned_facility,
+                'facility_changed': facility_changed,
+                'requested_time': requested_time,
+                'assigned_time': assigned_time,
+                'time_changed': time_changed,
+                'events_count': len(assigned_events),
+                'priority': req.priority,
+                'weekly_breakdown': weekly_breakdown,
+            })
+
+    return schedule_diff
+
+
+# ── Job lifecycle ──
+
+def create_job(date_from: date, date_until: date, options: SolverOptions, user=None) -> SolveJob:
+    """Record a queued SolveJob and dispatch it to the configured runner."""
+    job = SolveJob.objects.create(
+        date_from=date_from,
+        date_until=date_until,
+        options=asdict(options),
+        requested_by=user if user is not None and user.is_authenticated else None,
+        progress='Queued',
+        runner=getattr(settings, 'SOLVE_JOB_RUNNER', 'thread'),
+    )
+    dispatch_job(job.id)
+    job.refresh_from_db()
+    return job
+
+
+def dispatch_job(job_id: int) -> None:
+    """Hand a queued job to the runner selected by settings.SOLVE_JOB_RUNNER."""
+    runner = getattr(settings, 'SOLVE_JOB_RUNNER', 'thread')
+    if runner == 'inline':
+        run_job(job_id, watch_for_stop=False)  # the caller is blocked until it finishes anyway
+    elif runner == 'thread':
+        _get_executor().submit(_run_job_in_thread, job_id)
+    # 'command': picked up by `manage.py run_solve_jobs`
+
+
+def run_job(job_id: int, watch_for_stop: bool = True) -> SolveJob | None:
+    """Execute a queued job. Returns None if another runner already claimed it.
+
+    With watch_for_stop, a helper thread saves streamed solutions to the job row
+    and polls it for an accept-early request.
+    """
+    # Claim atomically so two runners never execute the same job
+    now = timezone.now()
+    claimed = SolveJob.objects.filter(id=job_id, status='queued').update(
+        status='running', started_at=now, heartbeat_at=now, progress='Solving',
+    )
+    if not claimed:
+        return None
+
+    job = SolveJob.objects.get(id=job_id)
+    progress = SolveProgress()
+    finished = threading.Event()
+    watcher = None
+    if watch_for_stop:
+        watcher = threading.Thread(target=_watch_job, args=(job_id, progress, finished),
+                                   name=f'solve-job-{job_id}-watch', daemon=True)
+        watcher.start()
+    try:
+        payload = generate_schedule_for_range(
+            job.date_from, job.date_until, SolverOptions(**job.options), progress,
+        )
+    except Exception as exc:
+        logger.exception('Solve job %s failed', job_id)
+        job.status = 'failed'
+        job.error = str(exc)
+        job.progress = 'Failed'
+    else:
+        job.status = 'succeeded'
+        job.result = payload
+        job.progress = 'Done (accepted early)' if payload.get('stopped_early') else 'Done'
+    finally:
+        finished.set()
+        if watcher is not None:
+            watcher.join()
+    job.solutions = progress.solutions[-MAX_STORED_SOLUTIONS:]
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'solutions', 'finished_at'])
+    return job
+
+
+def request_stop(job: SolveJob) -> bool:
+    """Ask a queued/running job to finish with the best schedule found so far."""
+    return bool(SolveJob.objects.filter(id=job.id, status__in=('queued', 'running')).update(stop_requested=True))
+
+
+def fail_stale_jobs() -> int:
+    """Fail running jobs whose worker died, i.e. whose heartbeat is older than STALE_JOB_TIMEOUT.
+
+    Called when a process starts its job executor and on every run_solve_jobs
+    poll. They are failed rather than re-queued, so a job that kills its worker
+    cannot do it again and again. Inline jobs are left alone: they have no
+    watcher to send a heartbeat, and they live and die with the request that
+    runs them. Returns the number of jobs failed.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=STALE_JOB_TIMEOUT)
+    stale = SolveJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='running',
+    ).exclude(runner='inline')
+    count = stale.update(status='failed', error=STALE_JOB_ERROR, progress='Failed', finished_at=now)
+    if count:
+        logger.warning('Failed %s solve job(s) left running by a stopped worker', count)
+    return count
+
+
+def _watch_job(job_id: int, progress: SolveProgress, finished: threading.Event) -> None:
+    """Until the solve finishes, save new solutions to the job row and pass on an accept-early request.
+
+    CP-SAT reports solutions on its own native thread, which must not touch the
+    database (each thread would open a connection nothing closes), so the solver
+    callback only appends to progress.solutions and this thread does the writes.
+    Every write stamps heartbeat_at, and a quiet search still gets one every
+    HEARTBEAT_INTERVAL so fail_stale_jobs() leaves the job alone.
+    """
+    saved = 0
+    beat = perf_counter()
+    try:
+        while not finished.wait(WATCH_INTERVAL):
+            fields = {}
+            solutions = progress.solutions[-MAX_STORED_SOLUTIONS:]
+            count = len(progress.solutions)
+            if count != saved:
+                saved = count
+                fields['solutions'] = solutions
+                fields['progress'] = f"Solving — {count} solutions, latest penalty {solutions[-1]['objective']}"
+            if fields or perf_counter() - beat >= HEARTBEAT_INTERVAL:
+                beat = perf_counter()
+                SolveJob.objects.filter(id=job_id).update(heartbeat_at=timezone.now(), **fields)
+            if not progress.stopped and SolveJob.objects.filter(id=job_id, stop_requested=True).exists():
+                progress.stop()
+    finally:
+        connection.close()  # this thread's own DB connection
+
+
+def _run_job_in_thread(job_id: int) -> None:
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        fail_stale_jobs()  # jobs a restarted or crashed worker left running
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'SOLVE_JOB_THREADS', 1),
+            thread_name_prefix='solve-job',
+        )
+    return _executor
@@ -0,0 +1,107 @@
+"""
+Management command that benchmarks the solver on synthetic clubs.
+
+Usage: python manage.py benchmark_solver [--teams 8 16 32 60] [--facilities 4 8] [--weeks 1 4]
+                                         [--fixed-density 1.0] [--seeds 1 2 3]
+                                         [--draft] [--portfolio-runs 4] [--dump-model]
+                                         [--formulations lean classic] [--objectives weighted two_stage]
+                                         [--time-limit 30] [--relative-gap 0.05] [--absolute-gap 100]
+                                         [--output report.csv|report.json]
+
+Runs every combination of teams × facilities × weeks × seeds (× model formulation,
+to compare build and solve times of the lean and classic builders, × objective mode,
+to compare one weighted objective with the two-stage one) and records status,
+solve time, model size, objective and search stats for each. Without --facilities,
+each club gets one facility per TEAMS_PER_FACILITY teams (at least 4), which keeps
+demand at a fixed density as the club grows. Everything runs in a throwaway test
+database created for the run and destroyed afterwards, so the configured database
+is never touched (on PostgreSQL the user needs CREATEDB).
+"""
+
+from itertools import product
+
+from django.core.management.base import BaseCommand, CommandError
+from scheduler.benchmark import BenchmarkScenario, benchmark_database, run_scenario, write_report
+from scheduler.solver import SolverOptions, TIME_GRANULARITIES
+
+TEAMS_PER_FACILITY = 4
+FORMULATIONS = ('lean', 'classic')
+OBJECTIVES = ('weighted', 'two_stage')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the solver on synthetic clubs and write a CSV/JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, nargs='+', default=[8, 16, 32, 60])
+        parser.add_argument('--facilities', type=int, nargs='+',
+                            help=f'Facility counts (default: one per {TEAMS_PER_FACILITY} teams, at least 4)')
+        parser.add_argument('--weeks', type=int, nargs='+', default=[1, 4])
+        parser.add_argument('--fixed-density', type=float, default=1.0,
+                            help='Fixed weekend fixtures per pitch per week')
+        parser.add_argument('--seeds', type=int, nargs='+', default=[1])
+        parser.add_argument('--workers', type=int, help='Solver worker processes (default: settings)')
+        parser.add_argument('--window-days', type=int, help='Rolling-horizon window length')
+        parser.add_argument('--pattern-mode', action='store_true')
+        parser.add_argument('--draft', action='store_true', help='Greedy placement only, no CP-SAT')
+        parser.add_argument('--dump-model', action='store_true',
+                            help='Write each CP-SAT model to SOLVER_DUMP_DIR for replay_solver_model')
+        parser.add_argument('--portfolio-runs', type=int, default=1,
+                            help='Seeded solves per component; the best is kept')
+        parser.add_argument('--formulations', nargs='+', choices=FORMULATIONS, default=['lean'],
+                            help='Model builders to run: lean (facility booleans) and/or classic')
+        parser.add_argument('--objectives', nargs='+', choices=OBJECTIVES, default=['weighted'],
+                            help='Objective modes to run: one weighted objective and/or two-stage')
+        parser.add_argument('--time-granularity', type=int, default=1, choices=TIME_GRANULARITIES)
+        parser.add_argument('--time-limit', type=float, help='Seconds per solve (default: derived from model size)')
+        parser.add_argument('--relative-gap', type=float, help='Stop once within this relative gap of optimal')
+        parser.add_argument('--absolute-gap', type=float, help='Stop once within this many penalty points of optimal')
+        parser.add_argument('--output', help='Report path; .json writes JSON, anything else CSV')
+
+    def handle(self, *args, **options):
+        if min(options['teams'] + (options['facilities'] or [1]) + options['weeks']) < 1:
+            raise CommandError('--teams, --facilities and --weeks must be at least 1.')
+
+        sizes = [
+            (teams, facilities)
+            for teams in options['teams']
+            for facilities in (options['facilities'] or [max(4, teams // TEAMS_PER_FACILITY)])
+        ]
+
+        with benchmark_database():
+            rows = self._run(sizes, options)
+
+        if options['output']:
+            write_report(rows, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _run(self, sizes: list[tuple[int, int]], options: dict) -> list[dict]:
+        rows = []
+        for (teams, facilities), weeks, seed, formulation, objective in product(
+                sizes, options['weeks'], options['seeds'], options['formulations'], options['objectives']):
+            scenario = BenchmarkScenario(
+                teams=teams, facilities=facilities, weeks=weeks,
+                fixed_density=options['fixed_density'], seed=seed,
+            )
+            solver_options = SolverOptions(
+                workers=options['workers'],
+                window_days=options['window_days'],
+                pattern_mode=options['pattern_mode'],
+                draft=options['draft'],
+                portfolio_runs=options['portfolio_runs'],
+                dump_model=options['dump_model'],
+                time_granularity=options['time_granularity'],
+                time_limit=options['time_limit'],
+                relative_gap=options['relative_gap'],
+                absolute_gap=options['absolute_gap'],
+                lean_model=formulation == 'lean',
+                two_stage=objective == 'two_stage',
+            )
+            row = run_scenario(scenario, solver_options)
+            rows.append(row)
+            self.stdout.write(
+                f"{teams:>4} teams {facilities:>3} facilities {weeks:>3} weeks seed {seed} {formulation:<7} {objective:<9}: "
+                f"{row['status']:<10} {row['stop_reason']:<10} {row['solve_time']:>8.2f}s  penalty={row['penalty']}  "
+                f"vars={row['variables']}  intervals={row['intervals']}  build={row['build_time']:.2f}s"
+            )
+        return rows
@@ -0,0 +1,42 @@
+"""
+Management command that works through queued solve jobs.
+
+Usage: python manage.py run_solve_jobs [--once] [--interval 2]
+
+Use with SOLVE_JOB_RUNNER=command so solves run in their own process and the
+web workers only record jobs and serve status polls. Each poll first fails
+running jobs whose worker died (see scheduler.jobs.fail_stale_jobs).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from scheduler.jobs import fail_stale_jobs, run_job
+from scheduler.models import SolveJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued solver jobs (oldest first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            stale = fail_stale_jobs()
+            if stale:
+                self.stdout.write(f'Failed {stale} stale running job(s)')
+            job_ids = list(
+                SolveJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)
+            )
+            for job_id in job_ids:
+                job = run_job(job_id)
+                if job is not None:
+                    self.stdout.write(f'Job {job.id}: {job.get_status_display()}')
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0008_solvejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='booking_request',
+            field=models.ForeignKey(blank=True, help_text='The booking request the solver created this event for', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='scheduler.bookingrequest'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0009_event_booking_request'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solvejob',
+            name='solutions',
+            field=models.JSONField(blank=True, default=list, help_text='Improving solutions found so far: objective, bound and elapsed seconds'),
+        ),
+        migrations.AddField(
+            model_name='solvejob',
+            name='stop_requested',
+            field=models.BooleanField(default=False, help_text='Set to accept the best schedule found so far instead of waiting for the timeout'),
+        ),
+    ]
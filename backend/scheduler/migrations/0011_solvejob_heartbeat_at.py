@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0010_solvejob_solutions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solvejob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life from the worker running this job', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0011_solvejob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solvejob',
+            name='runner',
+            field=models.CharField(blank=True, help_text='SOLVE_JOB_RUNNER the job was dispatched to', max_length=20),
+        ),
+    ]
@@ -112,6 +112,14 @@ class Event(models.Model):
         choices=STATUS_CHOICES,
         default='draft',
     )
+    booking_request = models.ForeignKey(
+        'BookingRequest',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events',
+        help_text="The booking request the solver created this event for",
+    )
 
     def clean(self):
         if self.end_time <= self.start_time:
@@ -269,3 +277,67 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"{self.user.username} ({self.get_role_display()})"
+
+
+class SolveJob(models.Model):
+    """A queued/running/finished solver run started from POST /schedule/generate/."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    date_from = models.DateField()
+    date_until = models.DateField()
+    options = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="SolverOptions fields for this run",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+    )
+    progress = models.CharField(max_length=200, blank=True)
+    solutions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Improving solutions found so far: objective, bound and elapsed seconds",
+    )
+    stop_requested = models.BooleanField(
+        default=False,
+        help_text="Set to accept the best schedule found so far instead of waiting for the timeout",
+    )
+    runner = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="SOLVE_JOB_RUNNER the job was dispatched to",
+    )
+
+    # Result — the generate response payload (including schedule_diff) once finished
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='solve_jobs',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last sign of life from the worker running this job",
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Solve {self.date_from} → {self.date_until} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Facility, Event, Team, BookingRequest, EVENT_TYPE_PRIORITIES
+from .models import Facility, Event, Team, BookingRequest, SolveJob, EVENT_TYPE_PRIORITIES
 
 
 class FacilitySerializer(serializers.ModelSerializer):
@@ -97,3 +97,17 @@ class BookingRequestSerializer(serializers.ModelSerializer):
         data['priority'] = EVENT_TYPE_PRIORITIES.get(event_type, 1)
 
         return data
+
+
+class SolveJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = SolveJob
+        fields = (
+            'job_id', 'status', 'status_display', 'progress', 'solutions', 'stop_requested',
+            'date_from', 'date_until', 'options', 'result', 'error',
+            'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
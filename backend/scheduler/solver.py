@@ -1,18 +1,52 @@
 # scheduler/solver.py — OR-Tools CP-SAT Constraint Programming Solver
 #
 # Pure function: reads from DB, returns SolverResult. Does NOT write to DB.
-# The caller (views.py) handles Event creation and BookingRequest status updates.
-
-from dataclasses import dataclass, field
+# The caller (jobs.py) handles Event creation and BookingRequest status updates.
+#
+# load_snapshot() reads every input once into an immutable SolverSnapshot and
+# solve_snapshot() solves it: slots are split into independent facility/team
+# components, each built and solved as its own CpModel (optionally across a
+# process pool), and merged back into one SolverResult. solve_incremental()
+# re-solves one request against the frozen proposed schedule. SolverOptions
+# lists the tuning knobs.
+
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
 from datetime import date, datetime, timedelta, time
+from time import perf_counter
+from typing import NamedTuple
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
 from django.db.models import Q
+from django.utils import timezone
 from ortools.sat.python import cp_model
 
-from .models import Facility, Team, Event, BookingRequest
+from .models import Facility, Event, BookingRequest
 
 # ── Constants ──
+MINUTES_PER_DAY = 24 * 60  # linearised minutes per calendar day
+NO_HINT = -2 ** 31         # SlotTable hint columns: no hint
 WARMUP_BUFFER = 15         # minutes before match/championship for team warmup on pitch
-SOLVER_TIMEOUT = 30        # seconds
+MIN_TIME_LIMIT = 5         # seconds — floor of the default time budget
+MAX_TIME_LIMIT = 120       # seconds — cap of the default time budget
+SECONDS_PER_CHOICE = 0.01  # default budget per (slot, compatible facility) pair
+MIN_COMPONENT_TIMEOUT = 1  # seconds — floor for a component's share of the time budget
+STAGE_ONE_SHARE = 0.5      # two-stage mode: share of a component's time limit for stage one
+DIAGNOSIS_TIMEOUT = 10     # seconds — budget for explaining an INFEASIBLE run
+MAX_PORTFOLIO_RUNS = 16    # cap on seeded runs per component in portfolio mode
+HINT_LOOKBACK_DAYS = 56    # how far back to look for previous events to warm-start from
+TIME_GRANULARITIES = (1, 5, 10, 15, 30, 60)  # allowed start-time grids (minutes; divide an hour)
 MATCH_TYPES = {'match', 'championship'}  # event types that require a warmup buffer
 
 PENALTY_WEIGHTS = {
@@ -21,11 +55,29 @@ PENALTY_WEIGHTS = {
     'usual_time_strict': 200,
     'usual_time_flexible': 50,
     'younger_earlier': 30,
+    'moved_time': 80,          # SC7 — per slot moved off its previous start (options.stability)
+    'moved_facility': 80,      # SC7 — per slot moved off its previous facility
 }
 
+# Cost of leaving one slot unscheduled, per priority point. Larger than the worst
+# soft-constraint penalty a slot can collect, so a slot is only dropped when it
+# cannot be placed at all (or displaces a higher-priority slot).
+UNSCHEDULED_PENALTY = 10_000
+NO_FACILITY_REASON = 'No facility is suitable for this event type.'
+NO_ROOM_REASON = 'No free time in the preferred window — blocked by fixed events or higher-priority bookings.'
+
 JUVENILE_AGE_GROUPS = {'U10', 'U12', 'U14'}
 EVENING_CUTOFF_HOUR = 19   # 7 PM — SC6 younger-earlier threshold
 
+# Portfolio mode — run n uses random_seed n and preset n (cycling); presets are
+# CP-SAT parameter overrides that pull the search in different directions
+PORTFOLIO_PRESETS = (
+    ('default', {}),
+    ('lp_heavy', {'linearization_level': 2}),
+    ('core', {'optimize_with_core': True}),
+    ('quick_restart', {'search_branching': cp_model.PORTFOLIO_WITH_QUICK_RESTART_SEARCH}),
+)
+
 DAY_NAME_TO_WEEKDAY = {
     'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
     'friday': 4, 'saturday': 5, 'sunday': 6,
@@ -33,21 +85,270 @@ DAY_NAME_TO_WEEKDAY = {
 
 
 # ── Data Classes ──
-@dataclass
+class TeamRecord(NamedTuple):
+    """The Team fields the solver reads."""
+    id: int
+    age_group: str
+    usual_time: time | None
+    usual_facility_id: int | None
+    is_flexible: bool
+
+
+class FacilityRecord(NamedTuple):
+    """The Facility fields the solver reads."""
+    id: int
+    suitable_for: tuple[str, ...]   # empty = all event types
+
+
+class RequestRecord(NamedTuple):
+    """The BookingRequest fields the solver reads, with its team inlined."""
+    id: int
+    team_id: int
+    team: TeamRecord
+    title: str
+    event_type: str
+    priority: int
+    duration_minutes: int
+    recurrence: str
+    target_date: date | None
+    preferred_days: tuple[str, ...]
+    preferred_time_start: time
+    preferred_time_end: time
+    preferred_facility_id: int | None
+    schedule_from: date
+    schedule_until: date
+
+
+class EventRecord(NamedTuple):
+    """The Event fields the solver reads — a fixed/published event or a frozen placement."""
+    id: int | None
+    start_time: datetime
+    end_time: datetime
+    facility_id: int
+    team_id: int | None
+    event_type: str
+    booking_request_id: int | None
+
+
+class HintRecord(NamedTuple):
+    """A previous placement of a team's event, used as a warm-start hint."""
+    team_id: int
+    title: str
+    start_time: datetime
+    facility_id: int
+
+
+@dataclass(frozen=True)
+class SolverSnapshot:
+    """Everything one solve reads from the database, as immutable records.
+
+    Built by load_snapshot() and solved by solve_snapshot(), which never touches
+    the ORM — a snapshot can be pickled to a worker process, fingerprinted for
+    the result cache, or saved to replay a solve later. hint_events (previous
+    placements, for warm-start hints and the stability objective) is None when
+    the snapshot was loaded without them.
+    """
+    date_from: date
+    date_until: date
+    facilities: tuple[FacilityRecord, ...]
+    requests: tuple[RequestRecord, ...]
+    fixed_events: tuple[EventRecord, ...]
+    hint_events: tuple[HintRecord, ...] | None = None
+
+
+class SlotTable:
+    """Generated slots as a struct of arrays — one row per schedulable occurrence.
+
+    Columns are int32 NumPy arrays: request_idx (into requests), day (days from
+    epoch to the slot's date), duration (minutes) and time_start / time_end (the
+    preferred window, minutes from midnight). Warm-start hints and the optional
+    flag are columns too, as is the previous placement the stability objective
+    (SC7) measures moves against. Solver variables are kept in per-table lists
+    made on first use, so a SlotInstance is nothing but a (table, row) view.
+    """
+
+    def __init__(self, epoch: date, requests: list, request_idx, day, duration, time_start, time_end):
+        self.epoch = epoch
+        self.requests = requests
+        self.request_idx = request_idx
+        self.day = day
+        self.duration = duration
+        self.time_start = time_start
+        self.time_end = time_end
+        self.hint_start = np.full(len(day), NO_HINT, dtype=np.int32)
+        self.hint_facility = np.full(len(day), NO_HINT, dtype=np.int32)
+        self.previous_start = np.full(len(day), NO_HINT, dtype=np.int32)
+        self.previous_facility = np.full(len(day), NO_HINT, dtype=np.int32)
+        self.optional = np.ones(len(day), dtype=bool)
+        self.state = {}     # solver variable name → list with one entry per row
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    def views(self) -> list['SlotInstance']:
+        return [SlotInstance(self, row) for row in range(len(self))]
+
+    def take(self, rows) -> 'SlotTable':
+        """A new table holding copies of just the given rows and the requests they use."""
+        rows = np.asarray(rows, dtype=np.intp)
+        used, request_idx = np.unique(self.request_idx[rows], return_inverse=True)
+        table = SlotTable(self.epoch, [self.requests[i] for i in used], request_idx.astype(np.int32),
+                          self.day[rows], self.duration[rows], self.time_start[rows], self.time_end[rows])
+        for name in ('hint_start', 'hint_facility', 'previous_start', 'previous_facility', 'optional'):
+            setattr(table, name, getattr(self, name)[rows])
+        table.state = {name: [column[row] for row in rows] for name, column in self.state.items()}
+        return table
+
+
+class _SlotState:
+    """A SlotInstance attribute stored in its table's state lists (None until set)."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, slot, owner=None):
+        if slot is None:
+            return self
+        column = slot.table.state.get(self.name)
+        return None if column is None else column[slot.row]
+
+    def __set__(self, slot, value):
+        column = slot.table.state.get(self.name)
+        if column is None:
+            column = slot.table.state[self.name] = [None] * len(slot.table)
+        column[slot.row] = value
+
+
 class SlotInstance:
-    """One schedulable occurrence generated from a BookingRequest."""
-    request: BookingRequest
-    target_date: date
-    duration: int               # minutes
-    day_start_offset: int       # linearised minutes from epoch to midnight of target_date
-    time_start_min: int         # earliest start (minutes from midnight)
-    time_end_min: int           # latest end (minutes from midnight)
+    """One schedulable occurrence generated from a BookingRequest — a view of one SlotTable row."""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: SlotTable, row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def request(self) -> RequestRecord:
+        return self.table.requests[self.table.request_idx.item(self.row)]
+
+    @property
+    def target_date(self) -> date:
+        return self.table.epoch + timedelta(days=self.table.day.item(self.row))
+
+    @property
+    def duration(self) -> int:
+        """Minutes."""
+        return self.table.duration.item(self.row)
+
+    @property
+    def day_start_offset(self) -> int:
+        """Linearised minutes from epoch to midnight of target_date."""
+        return self.table.day.item(self.row) * MINUTES_PER_DAY
+
+    @property
+    def time_start_min(self) -> int:
+        """Earliest start (minutes from midnight)."""
+        return self.table.time_start.item(self.row)
+
+    @property
+    def time_end_min(self) -> int:
+        """Latest end (minutes from midnight)."""
+        return self.table.time_end.item(self.row)
+
+    # Warm-start hints — assigned by _attach_hints before model building
+    @property
+    def hint_start(self) -> int | None:
+        """Absolute minutes from epoch."""
+        value = self.table.hint_start.item(self.row)
+        return None if value == NO_HINT else value
+
+    @hint_start.setter
+    def hint_start(self, value: int | None) -> None:
+        self.table.hint_start[self.row] = NO_HINT if value is None else value
+
+    @property
+    def hint_facility(self) -> int | None:
+        """Facility index."""
+        value = self.table.hint_facility.item(self.row)
+        return None if value == NO_HINT else value
+
+    @hint_facility.setter
+    def hint_facility(self, value: int | None) -> None:
+        self.table.hint_facility[self.row] = NO_HINT if value is None else value
+
+    # Stability (SC7) — the slot's previous placement, assigned by _attach_previous
+    @property
+    def previous_start(self) -> int | None:
+        """Absolute minutes from epoch."""
+        value = self.table.previous_start.item(self.row)
+        return None if value == NO_HINT else value
+
+    @previous_start.setter
+    def previous_start(self, value: int | None) -> None:
+        self.table.previous_start[self.row] = NO_HINT if value is None else value
+
+    @property
+    def previous_facility(self) -> int | None:
+        """Facility index."""
+        value = self.table.previous_facility.item(self.row)
+        return None if value == NO_HINT else value
+
+    @previous_facility.setter
+    def previous_facility(self, value: int | None) -> None:
+        self.table.previous_facility[self.row] = NO_HINT if value is None else value
+
+    # Partial scheduling — optional slots may be left out (see SolverOptions.allow_partial)
+    @property
+    def optional(self) -> bool:
+        return self.table.optional.item(self.row)
+
+    @optional.setter
+    def optional(self, value: bool) -> None:
+        self.table.optional[self.row] = value
+
     # Solver variables — assigned during model building
-    start_var: object = None
-    facility_var: object = None
-    interval_var: object = None
-    facility_bools: dict = field(default_factory=dict)       # {fac_idx: BoolVar}
-    facility_intervals: dict = field(default_factory=dict)   # {fac_idx: IntervalVar}
+    start_var = _SlotState()
+    facility_var = _SlotState()
+    interval_var = _SlotState()
+    facility_bools = _SlotState()       # {fac_idx: BoolVar}
+    facility_intervals = _SlotState()   # {fac_idx: IntervalVar}
+    present = _SlotState()              # BoolVar; None when the slot is mandatory
+    # Presolve — start ranges left free by fixed events, see _presolve_slots
+    free_starts = _SlotState()          # {fac_idx: [[first, last], ...]} minutes from midnight; None = whole window
+
+
+@dataclass
+class SolverOptions:
+    """Tuning knobs for a single solve_schedule() call.
+
+    With allow_partial each slot has a presence literal, so a request that cannot
+    fit is left out at a large priority-weighted cost (SolverResult.unscheduled)
+    instead of making the run INFEASIBLE. A component that is still INFEASIBLE is
+    re-solved under diagnose for a minimal conflicting set
+    (SolverResult.conflicts). The search ends at time_limit or a gap limit, and
+    SolverResult.stop_reason says which. Dumped models replay with
+    `manage.py replay_solver_model`. The classic formulation (lean_model=False) is
+    kept for benchmark comparisons.
+    """
+    workers: int | None = None          # worker processes; None = settings.SOLVER_WORKERS
+    window_days: int | None = None      # rolling-horizon window length; None = whole range at once
+    concurrent_windows: bool = False    # solve windows together instead of one after another
+    use_hints: bool = True              # warm-start from previous proposed/published events
+    pattern_mode: bool = False          # one time/facility decision per (request, weekday) across weeks
+    time_granularity: int = 1           # start times restricted to this grid (minutes past midnight)
+    use_cache: bool = True              # reuse a cached result when the inputs are unchanged
+    allow_partial: bool = True          # leave unplaceable slots out instead of failing the run
+    diagnose: bool = True               # find a minimal conflicting set when a run is INFEASIBLE
+    time_limit: float | None = None     # seconds for the whole solve; None = derived from model size
+    relative_gap: float | None = None   # stop once (objective - bound) / objective is at most this
+    absolute_gap: float | None = None   # stop once objective - bound is at most this (penalty points)
+    draft: bool = False                 # greedy placement only, no CP-SAT — a quick draft for huge ranges
+    greedy_hints: bool = True           # warm-start slots without a previous placement from a greedy pass
+    portfolio_runs: int = 1             # seeded solves per component; the best is kept
+    dump_model: bool = False            # write each component's model to settings.SOLVER_DUMP_DIR
+    lean_model: bool = True             # facility booleans + exactly-one; False = facility variable formulation
+    two_stage: bool = False             # schedule the most priority first, then minimise preference penalties
+    stability: bool = False             # SC7: penalise moving a slot off its previous proposed/published placement
 
 
 @dataclass
@@ -58,12 +359,185 @@ class SolverResult:
     penalty: int | None         # objective value (lower = better)
     events: list[dict] = field(default_factory=list)
     requests_processed: set = field(default_factory=set)
+    replaced_event_ids: set = field(default_factory=set)   # proposed Events superseded (incremental)
+    components: int = 0         # number of independent sub-models solved
+    windows: int = 1            # number of rolling-horizon windows
+    hints_added: int = 0        # slots given a warm-start hint
+    hints_kept: int = 0         # hinted slots whose solution matches the hint
+    cached: bool = False        # served from the result cache instead of a fresh solve
+    timings: dict = field(default_factory=dict)  # phase name → seconds
+    stats: dict = field(default_factory=dict)    # model size and CP-SAT search counters
+    unscheduled: list[dict] = field(default_factory=list)  # {'request_id', 'date', 'reason'}
+    conflicts: dict = field(default_factory=dict)  # INFEASIBLE only: {'requests': [ids], 'events': [ids]}
+    stopped_early: bool = False  # the search was stopped to accept the best solution so far
+    stop_reason: str = ''       # see STOP_REASONS; '' when no search ran
+    time_limit: float | None = None  # seconds the search was allowed
+    portfolio: list[dict] = field(default_factory=list)  # portfolio mode: one entry per run, see ComponentResult.runs
+
+
+@dataclass
+class SolverComponent:
+    """Slots that share no facility or team with any other component (one CpModel)."""
+    slots: list[SlotInstance]
+    facility_indices: set[int]
+    team_ids: set[int]
+    fixed_events: list = field(default_factory=list)
+    absolute_gap: float | None = None   # this component's share of options.absolute_gap
+    dump_path: str | None = None        # file path without extension, set when options.dump_model
+
+    def __getstate__(self) -> dict:
+        # Slots are views of tables shared by every component: pickle (for a worker
+        # process) only this component's rows, re-homed in tables of their own
+        state = self.__dict__.copy()
+        state['slots'] = _compact_slots(self.slots)
+        return state
+
+
+@dataclass
+class ComponentResult:
+    status: str
+    wall_time: float
+    penalty: int | None
+    events: list[dict] = field(default_factory=list)
+    hints_added: int = 0
+    hints_kept: int = 0
+    unscheduled: list[dict] = field(default_factory=list)
+    conflict: list[tuple] = field(default_factory=list)   # [('request' | 'event', id)] — diagnose only
+    build_time: float = 0.0     # seconds spent building the CpModel
+    extract_time: float = 0.0   # seconds spent reading the solution back out
+    stats: dict = field(default_factory=dict)
+    stop_reason: str = ''
+    runs: list[dict] = field(default_factory=list)  # portfolio mode: {'run', 'seed', 'preset', 'status', ...}
+
+
+class SolveProgress:
+    """Live view of a running solve: improving solutions as they are found, and an early stop.
+
+    stop() may be called from another thread to accept the best schedule found
+    so far; components not yet solved then stop at their first feasible solution.
+    Only components solved in-process report solutions or can be interrupted —
+    with a worker pool, a stop takes effect once the running pool finishes.
+    """
+
+    def __init__(self, on_solution=None):
+        self.solutions = []             # {'component', 'objective', 'bound', 'elapsed'}
+        self._on_solution = on_solution
+        self._started = perf_counter()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._active = None             # the CpSolver currently searching
+        self._active_solved = False     # ... and whether it has a solution to fall back on
+        self._components = 0
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            # Without a solution yet, the callback stops the search at the first one
+            if self._active is not None and self._active_solved:
+                self._active.stop_search()
+
+    def _attach(self, solver, new_component: bool = True) -> '_SolutionRecorder':
+        # Stage two of a two-stage solve reports under its stage one's component number
+        with self._lock:
+            self._active = solver
+            self._active_solved = False
+            self._components += new_component
+            return _SolutionRecorder(self, self._components)
+
+    def _detach(self) -> None:
+        with self._lock:
+            self._active = None
+
+    def _record(self, component: int, objective: int, bound: int) -> None:
+        entry = {
+            'component': component,
+            'objective': objective,
+            'bound': bound,
+            'elapsed': round(perf_counter() - self._started, 3),
+        }
+        self.solutions.append(entry)
+        with self._lock:
+            self._active_solved = True
+        if self._on_solution is not None:
+            self._on_solution(entry)
+
+
+class _SolutionRecorder(cp_model.CpSolverSolutionCallback):
+    """CP-SAT solution callback that forwards each improving solution to a SolveProgress."""
+
+    def __init__(self, progress: SolveProgress, component: int):
+        super().__init__()
+        self._progress = progress
+        self._component = component
+
+    def on_solution_callback(self):
+        self._progress._record(self._component, round(self.objective_value),
+                              max(0, round(self.best_objective_bound)))
+        if self._progress.stopped:
+            self.stop_search()
+
+
+STATUS_MAP = {
+    cp_model.OPTIMAL: 'OPTIMAL',
+    cp_model.FEASIBLE: 'FEASIBLE',
+    cp_model.INFEASIBLE: 'INFEASIBLE',
+    cp_model.MODEL_INVALID: 'MODEL_INVALID',
+    cp_model.UNKNOWN: 'UNKNOWN',
+}
+
+
+# Why a search ended, most significant first — a run reports the first reason
+# any of its components has
+STOP_REASONS = ('infeasible', 'model_invalid', 'stopped', 'time_limit', 'gap_limit', 'optimal')
+
+
+# Model-size and search counters summed across components (best_bound is summed
+# too — the objective is a sum of independent component objectives)
+STAT_KEYS = ('variables', 'intervals', 'fixed_intervals', 'no_overlaps', 'penalties', 'greedy_hints',
+             'pruned_choices', 'branches', 'conflicts', 'best_bound')
 
 
 # ── Helpers ──
 
+@contextmanager
+def _phase(timings: dict, name: str):
+    """Add the wall time of the enclosed block to timings[name]."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + perf_counter() - started
+
+
+def _model_stats(model, fac_intervals: dict, team_intervals: dict, no_overlaps: int, penalties: list) -> dict:
+    """Size of a built CpModel: variables, intervals, no-overlap constraints, penalty terms."""
+    interval_lists = list(fac_intervals.values()) + list(team_intervals.values())
+    return {
+        'variables': len(model.proto.variables),
+        'intervals': sum(len(intervals) for intervals in interval_lists),
+        'no_overlaps': no_overlaps,
+        'penalties': len(penalties),
+    }
+
+
+def _sum_stats(stats_list: list[dict]) -> dict:
+    """Merge per-component stats; best_bound only when every component reports one."""
+    totals = {}
+    for key in STAT_KEYS:
+        values = [stats.get(key) for stats in stats_list]
+        if values and all(v is not None for v in values):
+            totals[key] = sum(values)
+    return totals
+
+
 def _linearise(dt: datetime, epoch: date) -> int:
-    """Convert a datetime to absolute minutes from midnight of epoch."""
+    """Convert a datetime to absolute minutes from midnight of epoch (local time)."""
+    if timezone.is_aware(dt):
+        dt = timezone.localtime(dt)
     delta = datetime.combine(dt.date(), dt.time()) - datetime.combine(epoch, time(0, 0))
     return int(delta.total_seconds() // 60)
 
@@ -73,7 +547,7 @@ def _time_to_minutes(t: time) -> int:
     return t.hour * 60 + t.minute
 
 
-def _is_juvenile(team: Team) -> bool:
+def _is_juvenile(team: TeamRecord) -> bool:
     """Check if team is juvenile (U10, U12, U14) for SC6."""
     ag = team.age_group.strip().upper() if team.age_group else ''
     return any(ag.startswith(j) for j in JUVENILE_AGE_GROUPS)
@@ -92,8 +566,21 @@ def _compatible_facilities(facilities: list, event_type: str) -> list[int]:
 
 
 def _generate_slots(requests, date_from: date, date_until: date, epoch: date) -> list[SlotInstance]:
-    """Generate SlotInstances from pending BookingRequests."""
-    slots = []
+    """Generate SlotInstances from pending BookingRequests (views of one SlotTable)."""
+    return _slot_table(requests, date_from, date_until, epoch).views()
+
+
+def _slot_table(requests, date_from: date, date_until: date, epoch: date) -> SlotTable:
+    """Build the SlotTable of pending BookingRequests with vectorised date arithmetic.
+
+    Each request contributes runs of weekly occurrences — (first day, count) per
+    preferred weekday, or a single day when it is one-time — and all runs are
+    expanded into rows by NumPy at once, in request, weekday and week order.
+    """
+    epoch_weekday = epoch.weekday()
+    kept = []
+    windows = []                                # per kept request: (duration, time_start, time_end)
+    run_request, run_first, run_count = [], [], []
     for req in requests:
         # Determine the effective date range (intersection of request range and solver range)
         effective_from = max(req.schedule_from, date_from)
@@ -102,331 +589,1945 @@ def _generate_slots(requests, date_from: date, date_until: date, epoch: date) ->
         if effective_from > effective_until:
             continue
 
-        time_start = _time_to_minutes(req.preferred_time_start)
-        time_end = _time_to_minutes(req.preferred_time_end)
-
-        # One-time with target_date — create slot directly, skip day iteration
+        runs = []
         if req.recurrence == 'once' and req.target_date:
-            target = req.target_date
-            if effective_from <= target <= effective_until:
-                day_offset = (target - epoch).days * 24 * 60
-                slots.append(SlotInstance(
-                    request=req,
-                    target_date=target,
-                    duration=req.duration_minutes,
-                    day_start_offset=day_offset,
-                    time_start_min=time_start,
-                    time_end_min=time_end,
-                ))
-            continue
+            # One-time with target_date — a single occurrence, no weekday search
+            if effective_from <= req.target_date <= effective_until:
+                runs.append(((req.target_date - epoch).days, 1))
+        else:
+            # Weekly, or one-time without target_date (backward compat for old data)
+            first_day = (effective_from - epoch).days
+            last_day = (effective_until - epoch).days
+            for day_name in req.preferred_days:
+                weekday = DAY_NAME_TO_WEEKDAY.get(day_name.lower())
+                if weekday is None:
+                    continue
+                first = first_day + (weekday - epoch_weekday - first_day) % 7
+                if first > last_day:
+                    continue
+                if req.recurrence == 'weekly':
+                    runs.append((first, (last_day - first) // 7 + 1))
+                elif req.recurrence == 'once':
+                    runs.append((first, 1))  # fallback: the first matching weekday in range
+                    break
 
-        # Weekly or one-time without target_date (backward compat for old data)
-        for day_name in req.preferred_days:
-            weekday = DAY_NAME_TO_WEEKDAY.get(day_name.lower())
-            if weekday is None:
-                continue
+        if runs:
+            for first, count in runs:
+                run_request.append(len(kept))
+                run_first.append(first)
+                run_count.append(count)
+            kept.append(req)
+            windows.append((req.duration_minutes, _time_to_minutes(req.preferred_time_start),
+                            _time_to_minutes(req.preferred_time_end)))
 
-            if req.recurrence == 'weekly':
-                # Find all occurrences of this weekday in the effective range
-                current = effective_from
-                days_ahead = (weekday - current.weekday()) % 7
-                current = current + timedelta(days=days_ahead)
-
-                while current <= effective_until:
-                    day_offset = (current - epoch).days * 24 * 60
-                    slots.append(SlotInstance(
-                        request=req,
-                        target_date=current,
-                        duration=req.duration_minutes,
-                        day_start_offset=day_offset,
-                        time_start_min=time_start,
-                        time_end_min=time_end,
-                    ))
-                    current += timedelta(weeks=1)
-
-            elif req.recurrence == 'once':
-                # Fallback: find the first matching weekday in the effective range
-                current = effective_from
-                days_ahead = (weekday - current.weekday()) % 7
-                current = current + timedelta(days=days_ahead)
-
-                if current <= effective_until:
-                    day_offset = (current - epoch).days * 24 * 60
-                    slots.append(SlotInstance(
-                        request=req,
-                        target_date=current,
-                        duration=req.duration_minutes,
-                        day_start_offset=day_offset,
-                        time_start_min=time_start,
-                        time_end_min=time_end,
-                    ))
-                    break
+    if not kept:
+        return SlotTable(epoch, [], *np.zeros((5, 0), dtype=np.int32))
 
-    return slots
+    counts = np.array(run_count, dtype=np.int32)
+    run = np.repeat(np.arange(len(counts)), counts)
+    week = np.arange(len(run), dtype=np.int32) - np.repeat(np.cumsum(counts) - counts, counts)
+    day = np.array(run_first, dtype=np.int32)[run] + 7 * week
+    request_idx = np.array(run_request, dtype=np.int32)[run]
+    duration, time_start, time_end = np.array(windows, dtype=np.int32)[request_idx].T
+    return SlotTable(epoch, kept, request_idx, day, duration, time_start, time_end)
 
 
-# ── Main Solver ──
+def _previous_placements(previous, fac_index: dict) -> tuple[dict, dict]:
+    """Index previous placements (HintRecords, most recent first) by date and by weekday.
 
-def solve_schedule(date_from: date, date_until: date) -> SolverResult:
+    Keys are (team_id, title, date) and (team_id, title, weekday); values are
+    (minute of day, facility index or None), the latest placement for the key.
     """
-    Generate a conflict-free schedule from pending BookingRequests.
+    same_date = {}
+    same_weekday = {}
+    for team_id, title, start_time, facility_id in previous:
+        if timezone.is_aware(start_time):
+            start_time = timezone.localtime(start_time)
+        placement = (_time_to_minutes(start_time.time()), fac_index.get(facility_id))
+        # Ordered most recent first, so setdefault keeps the latest placement
+        same_date.setdefault((team_id, title, start_time.date()), placement)
+        same_weekday.setdefault((team_id, title, start_time.weekday()), placement)
+    return same_date, same_weekday
+
+
+def _attach_hints(slots: list[SlotInstance], facilities: list, previous) -> None:
+    """Set hint_start/hint_facility on each slot from the most relevant previous placement.
+
+    Looks, in order, for: an Event for the same team and title on the slot's date;
+    the most recent such Event on the same weekday (previous holds HintRecords
+    most recent first, see _load_hint_events); and finally the team's usual_time /
+    usual_facility. Hints only guide the search — the solver is free to ignore them.
+    """
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+    same_date, same_weekday = _previous_placements(previous, fac_index)
+
+    for slot in slots:
+        req = slot.request
+        placement = (
+            same_date.get((req.team_id, req.title, slot.target_date))
+            or same_weekday.get((req.team_id, req.title, slot.target_date.weekday()))
+        )
+        if placement:
+            minute_of_day, facility_idx = placement
+        else:
+            team = req.team
+            minute_of_day = _time_to_minutes(team.usual_time) if team.usual_time else None
+            facility_idx = fac_index.get(team.usual_facility_id)
 
-    Reads BookingRequests (status='pending'), existing fixed/published Events,
-    Facilities, and Teams. Builds a CP-SAT model with hard and soft constraints.
-    Returns a SolverResult with proposed events ready for bulk creation.
+        if minute_of_day is not None:
+            slot.hint_start = slot.day_start_offset + minute_of_day
+        slot.hint_facility = facility_idx
+
+
+def _attach_previous(slots: list[SlotInstance], facilities: list, previous) -> None:
+    """Set previous_start/previous_facility on slots already placed on their own date (SC7).
+
+    A slot's previous placement is the latest proposed/published Event for the
+    same team and title on the slot's date — the event a re-solve would move.
     """
-    epoch = date_from
+    same_date, _ = _previous_placements(previous, {f.id: i for i, f in enumerate(facilities)})
+    for slot in slots:
+        req = slot.request
+        placement = same_date.get((req.team_id, req.title, slot.target_date))
+        if placement:
+            minute_of_day, facility_idx = placement
+            slot.previous_start = slot.day_start_offset + minute_of_day
+            slot.previous_facility = facility_idx
+
+
+# ── Decomposition ──
+
+def _compact_slots(slots: list[SlotInstance]) -> list[SlotInstance]:
+    """The same slots, in order, as views of new tables holding only their rows."""
+    by_table = {}
+    for i, slot in enumerate(slots):
+        by_table.setdefault(id(slot.table), (slot.table, []))[1].append((i, slot.row))
+    compact = [None] * len(slots)
+    for table, entries in by_table.values():
+        sub_table = table.take([row for _, row in entries])
+        for new_row, (i, _) in enumerate(entries):
+            compact[i] = SlotInstance(sub_table, new_row)
+    return compact
+
+
+def _partition_slots(slots: list[SlotInstance], facilities: list, fixed_events: list) -> list[SolverComponent]:
+    """Split slots into connected components of the slot/facility/team graph.
+
+    Two slots interact only through HC1 (a shared compatible facility) or HC3
+    (the same team), so each component can be modelled and solved on its own.
+    Fixed events are attached to every component that uses their facility or team.
+    Slots with no compatible facility (HC7) are dropped here — _solve_slots
+    reports them as unscheduled.
+    """
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    compatible_by_type = {}
+    slot_facs = []
+    for slot in slots:
+        event_type = slot.request.event_type
+        if event_type not in compatible_by_type:
+            compatible_by_type[event_type] = _compatible_facilities(facilities, event_type)
+        compatible_facs = compatible_by_type[event_type]
+        slot_facs.append(compatible_facs)
+        if not compatible_facs:
+            continue
+        team_key = ('team', slot.request.team_id)
+        for fi in compatible_facs:
+            union(team_key, ('fac', fi))
+
+    components = {}
+    for slot, compatible_facs in zip(slots, slot_facs):
+        if not compatible_facs:
+            continue
+        root = find(('team', slot.request.team_id))
+        comp = components.get(root)
+        if comp is None:
+            comp = components[root] = SolverComponent(slots=[], facility_indices=set(), team_ids=set())
+        comp.slots.append(slot)
+        comp.facility_indices.update(compatible_facs)
+        comp.team_ids.add(slot.request.team_id)
 
-    # ── Query DB ──
-    facilities = list(Facility.objects.all())
     fac_index = {f.id: i for i, f in enumerate(facilities)}
-    num_facilities = len(facilities)
+    for ev in fixed_events:
+        roots = set()
+        fac_idx = fac_index.get(ev.facility_id)
+        if fac_idx is not None and ('fac', fac_idx) in parent:
+            roots.add(find(('fac', fac_idx)))
+        if ev.team_id and ('team', ev.team_id) in parent:
+            roots.add(find(('team', ev.team_id)))
+        for root in roots:
+            if root in components:
+                components[root].fixed_events.append(ev)
+
+    return list(components.values())
+
+
+def _split_windows(date_from: date, date_until: date, window_days: int | None) -> list[tuple[date, date]]:
+    """Split the solver range into consecutive windows of window_days (last one may be shorter)."""
+    if not window_days:
+        return [(date_from, date_until)]
+    windows = []
+    current = date_from
+    while current <= date_until:
+        window_until = min(current + timedelta(days=window_days - 1), date_until)
+        windows.append((current, window_until))
+        current = window_until + timedelta(days=1)
+    return windows
+
+
+def _events_in_span(events: list, span_from: date, span_until: date) -> list:
+    """Return events that could interact with slots dated span_from..span_until.
+
+    Slot intervals stay within their own day, so a one-day margin either side
+    safely covers warmup buffers and events that run past midnight.
+    """
+    lo = span_from - timedelta(days=1)
+    hi = span_until + timedelta(days=1)
+    return [ev for ev in events if ev.start_time.date() <= hi and ev.end_time.date() >= lo]
+
+
+def _as_fixed_event(ev: dict) -> EventRecord:
+    """Wrap a solved event dict as an EventRecord so later windows treat it as fixed."""
+    return EventRecord(
+        id=None,
+        start_time=ev['start_time'],
+        end_time=ev['end_time'],
+        facility_id=ev['facility_id'],
+        team_id=ev['team_id'],
+        event_type=ev['event_type'],
+        booking_request_id=ev['request_id'],
+    )
 
-    if num_facilities == 0:
-        return SolverResult(success=False, status='INFEASIBLE', solve_time=0.0,
-                            penalty=None, events=[], requests_processed=set())
 
-    requests = list(BookingRequest.objects.filter(
-        status='pending',
-        schedule_from__lte=date_until,
-        schedule_until__gte=date_from,
-    ).select_related('team', 'preferred_facility'))
+# ── Model Building ──
 
-    if not requests:
-        return SolverResult(success=True, status='OPTIMAL', solve_time=0.0,
-                            penalty=0, events=[], requests_processed=set())
+def _add_soft_constraints(model, penalties: list, name: str, req, fac_index: dict,
+                          start, facility_var, day_offset: int, lb: int, ub: int,
+                          occurrences: int = 1, facility_bools: dict | None = None,
+                          present=None) -> None:
+    """Add the SC1/SC3/SC4/SC6 penalty terms for one start/facility decision.
 
-    fixed_events = list(Event.objects.filter(
-        start_time__date__lte=date_until,
-        end_time__date__gte=date_from,
-    ).filter(
-        models_q_fixed_or_published()
-    ).select_related('facility', 'team'))
+    `start` is measured in minutes with midnight of its day at `day_offset`
+    (0 for a weekly pattern's time-of-day variable). `occurrences` scales every
+    penalty when one decision stands for several weekly slots.
 
-    teams = {t.id: t for t in Team.objects.all()}
+    With facility_bools (the lean formulation) SC1 reuses the facility literal
+    instead of a reified bool of its own, and terms that the start domain
+    [lb, ub] already decides become constants or are left out.
 
-    # ── Generate slots ──
-    slots = _generate_slots(requests, date_from, date_until, epoch)
+    A slot left out (present false) pays UNSCHEDULED_PENALTY only, so every
+    penalty here is conditional on presence.
+    """
+    team = req.team
+    priority_multiplier = req.priority * occurrences  # 1, 2, or 3 per slot (SC5)
+    lean = facility_bools is not None
+    placed = [] if present is None else [present]  # only a placed slot is held to a penalty-free side
+    scale = 1 if present is None else present      # a lean constant is charged only when placed
+
+    # SC1 — Preferred Facility
+    if req.preferred_facility_id is not None:
+        pref_fac_idx = fac_index.get(req.preferred_facility_id)
+        if pref_fac_idx is not None and lean:
+            # Placed anywhere else — every booking when the preferred facility is not an option.
+            # A sum of the other literals rather than (present - at_pref) keeps the term's
+            # trivial bound at 0
+            elsewhere = [at_fac for fi, at_fac in facility_bools.items() if fi != pref_fac_idx]
+            if elsewhere:
+                penalties.append(cp_model.LinearExpr.sum(elsewhere)
+                                 * (PENALTY_WEIGHTS['preferred_facility'] * priority_multiplier))
+        elif pref_fac_idx is not None:
+            not_at_pref = model.new_bool_var(f'not_pref_fac_{name}')
+            model.add(facility_var != pref_fac_idx).only_enforce_if(not_at_pref)
+            model.add(facility_var == pref_fac_idx).only_enforce_if([not_at_pref.negated(), *placed])
+            penalties.append(not_at_pref * PENALTY_WEIGHTS['preferred_facility'] * priority_multiplier)
+
+    # SC3 — Preferred Time Window
+    # Penalise if start is outside the preferred window
+    pref_start_abs = day_offset + _time_to_minutes(req.preferred_time_start)
+    pref_end_abs = day_offset + _time_to_minutes(req.preferred_time_end) - req.duration_minutes
+    if pref_end_abs > pref_start_abs and not (lean and lb == pref_start_abs and ub == pref_end_abs):
+        outside_window = model.new_bool_var(f'outside_time_{name}')
+        # If the window is the full domain, this var is never true
+        # But we already bounded start to [lb, ub] so this is satisfied by domain
+        # SC3 penalty applies if we ever need to expand the domain
+        # For now, skip if domain already matches preferred window
+        if lb == pref_start_abs and ub == pref_end_abs:
+            pass  # already constrained to preferred window, no penalty needed
+        else:
+            penalties.append(outside_window * PENALTY_WEIGHTS['preferred_time'] * priority_multiplier)
+
+    # SC4 — Usual Time
+    if team.usual_time is not None and lean and not lb <= day_offset + _time_to_minutes(team.usual_time) <= ub:
+        weight = (PENALTY_WEIGHTS['usual_time_strict'] if not team.is_flexible
+                  else PENALTY_WEIGHTS['usual_time_flexible'])
+        penalties.append(scale * (weight * priority_multiplier))  # the usual time is outside the window
+    elif team.usual_time is not None:
+        usual_abs = day_offset + _time_to_minutes(team.usual_time)
+        not_at_usual = model.new_bool_var(f'not_usual_{name}')
+        model.add(start != usual_abs).only_enforce_if(not_at_usual)
+        model.add(start == usual_abs).only_enforce_if([not_at_usual.negated(), *placed])
+
+        weight = (PENALTY_WEIGHTS['usual_time_strict'] if not team.is_flexible
+                  else PENALTY_WEIGHTS['usual_time_flexible'])
+        penalties.append(not_at_usual * weight * priority_multiplier)
+
+    # SC6 — Younger Teams Earlier (before 7pm)
+    evening_abs = day_offset + EVENING_CUTOFF_HOUR * 60
+    if _is_juvenile(team) and lean and (ub < evening_abs or lb >= evening_abs):
+        if lb >= evening_abs:
+            penalties.append(scale * (PENALTY_WEIGHTS['younger_earlier'] * priority_multiplier))  # the whole window is late
+    elif _is_juvenile(team):
+        starts_late = model.new_bool_var(f'late_{name}')
+        model.add(start >= evening_abs).only_enforce_if(starts_late)
+        model.add(start < evening_abs).only_enforce_if([starts_late.negated(), *placed])
+        penalties.append(starts_late * PENALTY_WEIGHTS['younger_earlier'] * priority_multiplier)
+
+
+def _add_stability_penalties(model, penalties: list, name: str, slot: SlotInstance,
+                             facility_bools: dict) -> None:
+    """SC7 — Stability: penalise moving a slot off its previous start or facility.
+
+    Moves cost the same whatever the priority: every moved event is one more
+    change to publish and notify. A slot left out moves nothing and pays
+    UNSCHEDULED_PENALTY only.
+    """
+    placed = [] if slot.present is None else [slot.present]
+    moved_time = model.new_bool_var(f'moved_time_{name}')
+    model.add(slot.start_var == slot.previous_start).only_enforce_if([moved_time.negated(), *placed])
+    penalties.append(moved_time * PENALTY_WEIGHTS['moved_time'])
 
-    if not slots:
-        return SolverResult(success=True, status='OPTIMAL', solve_time=0.0,
-                            penalty=0, events=[], requests_processed=set())
+    # Booked anywhere else — the facility literals of an absent slot are all 0
+    elsewhere = [at_fac for fi, at_fac in facility_bools.items() if fi != slot.previous_facility]
+    if elsewhere:
+        penalties.append(cp_model.LinearExpr.sum(elsewhere) * PENALTY_WEIGHTS['moved_facility'])
 
-    # ── Build CP-SAT Model ──
-    model = cp_model.CpModel()
-    penalties = []
 
-    # Per-facility interval collectors (for HC1 NoOverlap)
-    fac_intervals = {i: [] for i in range(num_facilities)}
+def _fixed_span(ev, epoch: date, step: int) -> tuple[int, int]:
+    """A fixed event's start and end in absolute minutes, snapped outwards onto the time grid.
 
-    # Per-team interval collectors (for HC3 team single location)
-    team_intervals = {}
+    Snapping outwards is conservative — it never frees a blocked minute.
+    """
+    start_min = _linearise(ev.start_time, epoch)
+    end_min = _linearise(ev.end_time, epoch)
+    if step > 1:
+        start_min = start_min // step * step
+        end_min = -(-end_min // step) * step
+    return start_min, end_min
+
+
+def _merge_spans(spans) -> list[list[int]]:
+    """Union of (start, end) spans as sorted [start, end] pairs; touching spans merge."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
 
-    # ── Add fixed events as constants (HC2) ──
-    for ev in fixed_events:
-        fac_idx = fac_index.get(ev.facility_id)
-        if fac_idx is None:
+
+def _reachable_spans(slots: list[SlotInstance], facilities: list) -> tuple[dict, dict]:
+    """Where each facility and team could be occupied by some slot, as merged spans.
+
+    A slot reaches from its earliest start (less the warmup buffer, for matches)
+    to its latest end, on every compatible facility and for its team.
+    """
+    fac_reach = {}
+    team_reach = {}
+    compatible = {}
+    for slot in slots:
+        event_type = slot.request.event_type
+        if event_type not in compatible:
+            compatible[event_type] = _compatible_facilities(facilities, event_type)
+        lo, hi = _window_bounds(slot)
+        start = slot.day_start_offset + lo
+        end = slot.day_start_offset + hi + slot.duration
+        buffer = WARMUP_BUFFER if slot.request.event_type in MATCH_TYPES else 0
+        for fac_idx in compatible[event_type]:
+            fac_reach.setdefault(fac_idx, []).append((start - buffer, end))
+        team_reach.setdefault(slot.request.team_id, []).append((start, end))
+    return ({k: _merge_spans(v) for k, v in fac_reach.items()},
+            {k: _merge_spans(v) for k, v in team_reach.items()})
+
+
+def _fixed_blocks(fixed: list[tuple], reach: list[list[int]], merge: bool) -> list[tuple[int, int, list]]:
+    """Fixed (start, end, event) spans on one facility or team, reduced to what the model needs.
+
+    Spans that overlap no reachable span are dropped. With merge, overlapping
+    or touching spans become one block — the blocked time is the same, and two
+    overlapping constants can no longer make the model infeasible by themselves.
+    Returns (start, end, [events]) blocks.
+    """
+    reach_starts = [start for start, _ in reach]
+
+    def reachable(start, end):
+        # Reach spans are disjoint and sorted, so only the last one starting before `end` can overlap
+        i = bisect_left(reach_starts, end)
+        return i > 0 and reach[i - 1][1] > start
+
+    blocks = []
+    for start, end, ev in sorted(fixed, key=lambda f: (f[0], f[1])):
+        if not reachable(start, end):
             continue
+        if merge and blocks and start <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+            blocks[-1][2].append(ev)
+        else:
+            blocks.append([start, end, [ev]])
+    return [tuple(block) for block in blocks]
+
+
+def _by_day(entries: list[tuple]) -> dict[int, list]:
+    """Bucket (interval, earliest start, latest end) entries by calendar day.
+
+    An interval joins the bucket of every day its reachable span touches — only
+    those whose window or warmup buffer crosses midnight land in more than one.
+    """
+    buckets = {}
+    for interval, start, end in entries:
+        for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1):
+            buckets.setdefault(day, []).append(interval)
+    return buckets
+
 
-        start_min = _linearise(ev.start_time, epoch)
-        end_min = _linearise(ev.end_time, epoch)
-        duration = end_min - start_min
+def _new_facility_choice(model, name: str, compatible_facs: list[int], hint_facility: int | None,
+                         present=None):
+    """Create the facility variable and its per-facility booleans (HC7).
 
-        # HC4 — warmup buffer before matches/championships only
-        if ev.event_type in MATCH_TYPES:
-            fac_start = start_min - WARMUP_BUFFER
-            fac_duration = duration + WARMUP_BUFFER
+    With a presence literal, exactly one boolean is true when the slot is
+    scheduled and none when it is left out, so an absent slot books nothing.
+    """
+    if len(compatible_facs) == 1:
+        facility_var = model.new_constant(compatible_facs[0])
+    else:
+        facility_var = model.new_int_var_from_domain(
+            cp_model.Domain.from_values(compatible_facs), f'fac_{name}'
+        )
+        if hint_facility is not None:
+            model.add_hint(facility_var, hint_facility)
+
+    facility_bools = {}
+    for fi in compatible_facs:  # HC7: only create booleans for compatible facilities
+        is_at_fac = model.new_bool_var(f'at_f{fi}_{name}')
+        facility_bools[fi] = is_at_fac
+        model.add(facility_var == fi).only_enforce_if(is_at_fac)
+        if present is None:
+            model.add(facility_var != fi).only_enforce_if(is_at_fac.negated())
+        if hint_facility is not None:
+            model.add_hint(is_at_fac, fi == hint_facility)
+    if present is not None:
+        model.add(sum(facility_bools.values()) == present)
+    return facility_var, facility_bools
+
+
+def _new_facility_literals(model, name: str, compatible_facs: list[int], hint_facility: int | None,
+                           present=None):
+    """Lean facility choice (HC7): one boolean per compatible facility, exactly one true.
+
+    No facility variable and no reified equalities — the facility index is the
+    expression sum(fi * at_fi). With a presence literal the booleans sum to it,
+    so an absent slot books nothing.
+    """
+    facility_bools = {fi: model.new_bool_var(f'at_f{fi}_{name}') for fi in compatible_facs}
+    if present is None:
+        model.add_exactly_one(facility_bools.values())
+    else:
+        model.add(cp_model.LinearExpr.sum(list(facility_bools.values())) == present)
+    if hint_facility is not None:
+        for fi, is_at_fac in facility_bools.items():
+            model.add_hint(is_at_fac, fi == hint_facility)
+    facility_var = cp_model.LinearExpr.weighted_sum(list(facility_bools.values()), compatible_facs)
+    return facility_var, facility_bools
+
+
+def _window_bounds(slot: SlotInstance) -> tuple[int, int]:
+    """Earliest and latest start for a slot, in minutes relative to its own midnight."""
+    lo = slot.time_start_min
+    hi = slot.time_end_min - slot.duration
+    if hi < lo:
+        hi = lo  # if window too tight, pin to start
+    return lo, hi
+
+
+def _start_domain(ranges: list[list[int]], frame: int, step: int):
+    """CP-SAT domain of the grid starts in [first, last] ranges, shifted by frame."""
+    if step == 1:
+        return cp_model.Domain.from_intervals([[frame + first, frame + last] for first, last in ranges])
+    return cp_model.Domain.from_values([frame + s for first, last in ranges for s in range(first, last + 1, step)])
+
+
+def _grid_starts(lo: int, hi: int, step: int) -> list[int]:
+    """Start times on the time grid within [lo, hi] (minutes from midnight).
+
+    Falls back to [lo] when the window is narrower than one grid step.
+    """
+    first = -(-lo // step) * step
+    return list(range(first, hi + 1, step)) or [lo]
+
+
+def _clean_hints(slot: SlotInstance, ranges: list[list[int]], step: int, compatible_facs: list[int]) -> None:
+    """Drop warm-start hints outside the slot's domain and snap the rest onto its grid.
+
+    ranges are the allowed [first, last] starts (minutes from midnight, on the grid).
+    """
+    if slot.hint_start is not None:
+        minute_of_day = slot.hint_start - slot.day_start_offset
+        span = next(((first, last) for first, last in ranges if first <= minute_of_day <= last), None)
+        if span is not None:
+            first, last = span
+            nearest = first + round((minute_of_day - first) / step) * step
+            slot.hint_start = slot.day_start_offset + min(nearest, last)
         else:
-            fac_start = start_min
-            fac_duration = duration
+            slot.hint_start = None
+    if slot.hint_facility not in compatible_facs:
+        slot.hint_facility = None
 
-        fixed_interval = model.new_fixed_size_interval_var(fac_start, fac_duration, f'fixed_{ev.id}')
-        fac_intervals[fac_idx].append(fixed_interval)
 
-        # HC3 — team no-overlap (use actual duration, not padded)
-        if ev.team_id:
-            team_interval = model.new_fixed_size_interval_var(start_min, duration, f'fixed_team_{ev.id}')
-            team_intervals.setdefault(ev.team_id, []).append(team_interval)
+def _pattern_groups(slots: list[SlotInstance], facilities: list,
+                    fixed_fac_spans: dict, fixed_team_spans: dict) -> list[list[SlotInstance]]:
+    """Group weekly slots of the same request and weekday into shared pattern decisions.
 
-    # ── Add variable slots ──
-    for idx, slot in enumerate(slots):
-        req = slot.request
-        team = req.team
+    A week whose reachable window could collide with a fixed event (on any
+    compatible facility, or for the team) becomes an exception and is given
+    its own decision, so one blocked week cannot force the whole term to move.
+    """
+    def collides(spans, lo, hi):
+        return any(s < hi and lo < e for s, e in spans)
 
-        # HC7 — Facility-Type Compatibility: restrict to compatible facilities
+    groups = {}
+    singles = []
+    for slot in slots:
+        req = slot.request
+        if req.recurrence != 'weekly':
+            singles.append([slot])
+            continue
+        lo, hi = _window_bounds(slot)
+        lo += slot.day_start_offset
+        hi += slot.day_start_offset + slot.duration
         compatible_facs = _compatible_facilities(facilities, req.event_type)
-        if not compatible_facs:
-            # No compatible facility exists for this event type — skip slot
+        blocked = (
+            any(collides(fixed_fac_spans.get(fi, ()), lo - WARMUP_BUFFER, hi) for fi in compatible_facs)
+            or collides(fixed_team_spans.get(req.team_id, ()), lo, hi)
+        )
+        if blocked:
+            singles.append([slot])
+        else:
+            groups.setdefault((req.id, slot.target_date.weekday()), []).append(slot)
+    return list(groups.values()) + singles
+
+
+# ── Greedy Construction ──
+
+
+class _Timeline:
+    """Busy spans per resource (facility index or team id), bucketed by day for quick lookups."""
+
+    def __init__(self):
+        self._spans = {}
+
+    def add(self, key, start: int, end: int) -> None:
+        for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1):
+            self._spans.setdefault((key, day), []).append((start, end))
+
+    def clash_end(self, key, start: int, end: int) -> int | None:
+        """End of the latest busy span overlapping [start, end), or None if it is free."""
+        ends = [
+            e
+            for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1)
+            for s, e in self._spans.get((key, day), ())
+            if s < end and start < e
+        ]
+        return max(ends) if ends else None
+
+
+def _placement_penalty(req, fac_index: dict, facility_idx: int, minute_of_day: int) -> int:
+    """Soft-constraint penalty of one placed slot — mirrors _add_soft_constraints.
+
+    SC3 costs nothing here: a start inside the slot's domain is inside its window.
+    """
+    team = req.team
+    penalty = 0
+    pref_fac_idx = fac_index.get(req.preferred_facility_id)
+    if pref_fac_idx is not None and facility_idx != pref_fac_idx:
+        penalty += PENALTY_WEIGHTS['preferred_facility']
+    if team.usual_time is not None and minute_of_day != _time_to_minutes(team.usual_time):
+        penalty += (PENALTY_WEIGHTS['usual_time_strict'] if not team.is_flexible
+                    else PENALTY_WEIGHTS['usual_time_flexible'])
+    if _is_juvenile(team) and minute_of_day >= EVENING_CUTOFF_HOUR * 60:
+        penalty += PENALTY_WEIGHTS['younger_earlier']
+    return penalty * req.priority
+
+
+def _greedy_schedule(slots: list[SlotInstance], facilities: list, fixed_events: list, epoch: date,
+                     step: int) -> tuple[list[tuple[SlotInstance, int, int]], list[SlotInstance]]:
+    """Place slots one at a time without CP-SAT, highest priority first.
+
+    Ties go to the most constrained slot (fewest facilities, narrowest window).
+    Each slot takes the cheapest placement, by soft-constraint penalty and then
+    start time, among its warm-start hint, its team's usual time and the earliest
+    free grid start on every compatible facility. Facility spans carry the
+    WARMUP_BUFFER before matches, as in the model, so placements respect HC1–HC7.
+    Returns ([(slot, absolute start, facility index)], unplaced slots).
+    """
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+    fac_busy = _Timeline()
+    team_busy = _Timeline()
+    for ev in fixed_events:
+        start, end = _fixed_span(ev, epoch, step)
+        fac_idx = fac_index.get(ev.facility_id)
+        if fac_idx is not None:
+            buffer = WARMUP_BUFFER if ev.event_type in MATCH_TYPES else 0
+            fac_busy.add(fac_idx, start - buffer, end)
+        if ev.team_id is not None:
+            team_busy.add(ev.team_id, start, end)
+
+    compatible = {}
+    for slot in slots:
+        event_type = slot.request.event_type
+        if event_type not in compatible:
+            compatible[event_type] = _compatible_facilities(facilities, event_type)
+
+    def constrainedness(slot):
+        lo, hi = _window_bounds(slot)
+        return (-slot.request.priority, len(compatible[slot.request.event_type]), hi - lo,
+                slot.target_date, slot.request.id)
+
+    placements = []
+    unplaced = []
+    for slot in sorted(slots, key=constrainedness):
+        req = slot.request
+        offset = slot.day_start_offset
+        buffer = WARMUP_BUFFER if req.event_type in MATCH_TYPES else 0
+        lo, hi = _window_bounds(slot)
+        starts = _grid_starts(lo, hi, step)
+        first, last = starts[0], starts[-1]
+
+        def blocked_until(fac_idx, minute):
+            """Earliest minute a blocked start could move to, or None if minute is free."""
+            start = offset + minute
+            fac_end = fac_busy.clash_end(fac_idx, start - buffer, start + slot.duration)
+            team_end = team_busy.clash_end(req.team_id, start, start + slot.duration)
+            if fac_end is None and team_end is None:
+                return None
+            return max(fac_end + buffer if fac_end is not None else start,
+                       team_end if team_end is not None else start) - offset
+
+        wanted = []
+        if slot.hint_start is not None:
+            wanted.append(slot.hint_start - offset)
+        if req.team.usual_time is not None:
+            wanted.append(_time_to_minutes(req.team.usual_time))
+
+        candidates = []
+        for fac_idx in compatible[req.event_type]:
+            for minute in wanted:
+                if first <= minute <= last and (minute - first) % step == 0 \
+                        and blocked_until(fac_idx, minute) is None:
+                    candidates.append((minute, fac_idx))
+            # Earliest free start: jump past each clash, back onto the grid
+            minute = first
+            while minute <= last:
+                free_from = blocked_until(fac_idx, minute)
+                if free_from is None:
+                    candidates.append((minute, fac_idx))
+                    break
+                minute = first + -(-(free_from - first) // step) * step
+
+        if not candidates:
+            unplaced.append(slot)
             continue
+        minute, fac_idx = min(candidates, key=lambda c: (
+            _placement_penalty(req, fac_index, c[1], c[0]), c[1] != slot.hint_facility, c[0], c[1],
+        ))
+        start = offset + minute
+        fac_busy.add(fac_idx, start - buffer, start + slot.duration)
+        team_busy.add(req.team_id, start, start + slot.duration)
+        placements.append((slot, start, fac_idx))
+    return placements, unplaced
+
+
+# ── Presolve ──
+
+def _free_windows(fixed_events: list, facilities: list, epoch: date, step: int) -> tuple[dict, dict]:
+    """Free time left by fixed events, per (facility index, day) and per (team id, day).
+
+    Busy time is what the model blocks: each fixed span snapped onto the grid, with
+    the WARMUP_BUFFER before matches on its facility. Returns two dicts of
+    {(key, day): [[start, end], ...]} free spans in absolute minutes, clipped to
+    the day. A resource and day without fixed events has no entry — it is free.
+    """
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+    fac_busy = {}
+    team_busy = {}
+
+    def block(busy, key, start, end):
+        for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1):
+            midnight = day * MINUTES_PER_DAY
+            busy.setdefault((key, day), []).append((max(start, midnight), min(end, midnight + MINUTES_PER_DAY)))
 
-        # Start variable: bounded by preferred time window on that day
-        # Absolute minutes = day_start_offset + time_in_day
-        lb = slot.day_start_offset + slot.time_start_min
-        ub = slot.day_start_offset + slot.time_end_min - slot.duration
-        if ub < lb:
-            ub = lb  # if window too tight, pin to start
-
-        slot.start_var = model.new_int_var(lb, ub, f'start_{idx}')
-        end_var = model.new_int_var(lb + slot.duration, ub + slot.duration, f'end_{idx}')
-        model.add(end_var == slot.start_var + slot.duration)  # HC6 duration match
-        if len(compatible_facs) == 1:
-            slot.facility_var = model.new_constant(compatible_facs[0])
+    for ev in fixed_events:
+        start, end = _fixed_span(ev, epoch, step)
+        fac_idx = fac_index.get(ev.facility_id)
+        if fac_idx is not None:
+            buffer = WARMUP_BUFFER if ev.event_type in MATCH_TYPES else 0
+            block(fac_busy, fac_idx, start - buffer, end)
+        if ev.team_id is not None:
+            block(team_busy, ev.team_id, start, end)
+
+    def complement(busy):
+        free = {}
+        for (key, day), spans in busy.items():
+            cursor = day * MINUTES_PER_DAY
+            gaps = []
+            for start, end in _merge_spans(spans):
+                if start > cursor:
+                    gaps.append([cursor, start])
+                cursor = end
+            if cursor < (day + 1) * MINUTES_PER_DAY:
+                gaps.append([cursor, (day + 1) * MINUTES_PER_DAY])
+            free[(key, day)] = gaps
+        return free
+
+    return complement(fac_busy), complement(team_busy)
+
+
+def _fitting_starts(free: dict, key, slot: SlotInstance, lo: int, hi: int, lead: int) -> list[list[int]]:
+    """Starts in [lo, hi] (minutes from midnight) where the slot, with `lead` minutes
+    before it, fits inside one free span of a resource. Returns [first, last] ranges."""
+    offset = slot.day_start_offset
+    reach_start = offset + lo - lead
+    reach_end = offset + hi + slot.duration
+    days = range(reach_start // MINUTES_PER_DAY, (reach_end - 1) // MINUTES_PER_DAY + 1)
+    if not any((key, day) in free for day in days):
+        return [[lo, hi]]  # no fixed event anywhere near
+    gaps = []
+    for day in days:
+        midnight = day * MINUTES_PER_DAY
+        gaps.extend(free.get((key, day), ([midnight, midnight + MINUTES_PER_DAY],)))
+    ranges = []
+    for start, end in _merge_spans(gaps):  # spans touching at midnight join up again
+        first = max(lo, start - offset + lead)
+        last = min(hi, end - offset - slot.duration)
+        if first <= last:
+            ranges.append([first, last])
+    return ranges
+
+
+def _intersect_ranges(a: list[list[int]], b: list[list[int]]) -> list[list[int]]:
+    """Intersection of two sorted lists of disjoint inclusive [first, last] ranges."""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        first = max(a[i][0], b[j][0])
+        last = min(a[i][1], b[j][1])
+        if first <= last:
+            out.append([first, last])
+        if a[i][1] < b[j][1]:
+            i += 1
         else:
-            slot.facility_var = model.new_int_var_from_domain(
-                cp_model.Domain.from_values(compatible_facs), f'fac_{idx}'
-            )
+            j += 1
+    return out
+
+
+def _snap_ranges(ranges: list[list[int]], starts: list[int], step: int) -> list[list[int]]:
+    """Shrink ranges inwards onto the time grid of starts (see _grid_starts)."""
+    if step == 1:
+        return ranges
+    origin = starts[0]
+    snapped = []
+    for first, last in ranges:
+        first = origin + -(-(first - origin) // step) * step
+        last = origin + (last - origin) // step * step
+        if first <= last:
+            snapped.append([first, last])
+    return snapped
+
+
+def _presolve_slots(slots: list[SlotInstance], facilities: list, fixed_events: list, epoch: date,
+                    step: int) -> list[SlotInstance]:
+    """Restrict each slot's starts and facilities to time left free by fixed events.
+
+    Sets slot.free_starts to the grid start ranges that fit on each compatible
+    facility (WARMUP_BUFFER included for matches) without clashing with the
+    team's own fixed events; facilities with no room are left out. Returns the
+    slots that fit nowhere — no solve could place them.
+    """
+    fac_free, team_free = _free_windows(fixed_events, facilities, epoch, step)
+    busy_facilities = {fac_idx for fac_idx, _ in fac_free}
+    compatible = {}
+    unfit = []
+    for slot in slots:
+        req = slot.request
+        if req.event_type not in compatible:
+            compatible[req.event_type] = _compatible_facilities(facilities, req.event_type)
+        if not compatible[req.event_type]:
+            continue  # HC7 — reported as NO_FACILITY_REASON instead
+        lo, hi = _window_bounds(slot)
+        starts = _grid_starts(lo, hi, step)
+        if len(starts) == 1:
+            lo = hi = starts[0]  # narrower than a grid step: pinned to its start
+        buffer = WARMUP_BUFFER if req.event_type in MATCH_TYPES else 0
+        team_ranges = _fitting_starts(team_free, req.team_id, slot, lo, hi, 0)
+        team_free_all_window = team_ranges == [[lo, hi]]
+        slot.free_starts = {}
+        for fac_idx in compatible[req.event_type]:
+            if fac_idx in busy_facilities:
+                ranges = _fitting_starts(fac_free, fac_idx, slot, lo, hi, buffer)
+            else:
+                ranges = [[lo, hi]]
+            if not team_free_all_window:
+                ranges = _intersect_ranges(ranges, team_ranges)
+            ranges = _snap_ranges(ranges, starts, step)
+            if ranges:
+                slot.free_starts[fac_idx] = ranges
+        if not slot.free_starts:
+            unfit.append(slot)
+    return unfit
+
+
+def _event_dict(slot: SlotInstance, start_abs: int, facility, epoch: date) -> dict:
+    """A placed slot as a proposed-event dict, converting absolute minutes back to datetimes."""
+    req = slot.request
+    start_dt = datetime.combine(epoch, time(0, 0)) + timedelta(minutes=start_abs)
+    return {
+        'request_id': req.id,
+        'title': req.title,
+        'start_time': start_dt,
+        'end_time': start_dt + timedelta(minutes=slot.duration),
+        'facility_id': facility.id,
+        'team_id': req.team_id,
+        'event_type': req.event_type,
+    }
 
-        # Main interval (for HC3 team overlap — uses actual duration)
-        slot.interval_var = model.new_interval_var(
-            slot.start_var, slot.duration, end_var, f'interval_{idx}'
-        )
 
-        # Per-facility optional intervals (for HC1 + HC4)
-        # HC4: matches/championships get a warmup buffer BEFORE the event
-        # Training and other events have no buffer (back-to-back is fine)
-        if req.event_type in MATCH_TYPES:
-            fac_start = model.new_int_var(lb - WARMUP_BUFFER, ub, f'fac_start_{idx}')
-            model.add(fac_start == slot.start_var - WARMUP_BUFFER)
-            fac_duration = slot.duration + WARMUP_BUFFER
-            fac_end = model.new_int_var(lb + slot.duration, ub + slot.duration, f'fac_end_{idx}')
-            model.add(fac_end == slot.start_var + slot.duration)
+def _solve_component(component: SolverComponent, facilities: list, epoch: date, options: SolverOptions,
+                     time_limit: float, num_search_workers: int = 0, diagnose: bool = False,
+                     progress: SolveProgress | None = None,
+                     search_params: dict | None = None) -> ComponentResult:
+    """Build and solve the CP-SAT model for one independent component.
+
+    Top-level (and free of DB access) so it can run inside a worker process.
+    search_params are extra CP-SAT parameters (a portfolio run's seed and preset).
+    With diagnose, every request's slots and every fixed event are guarded by an
+    assumption literal and the result carries a minimal conflicting set instead
+    of a schedule.
+    """
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+    slots = component.slots
+    step = options.time_granularity
+    build_started = perf_counter()
+
+    model = cp_model.CpModel()
+    penalties = []
+    unscheduled_terms = []  # the presence part of penalties — stage one of two-stage mode
+
+    # Per-facility interval collectors (for HC1 NoOverlap) — component facilities only.
+    # Entries are (interval, earliest start, latest end), to bucket them by day
+    fac_intervals = {i: [] for i in component.facility_indices}
+
+    # Per-team interval collectors (for HC3 team single location), same entries
+    team_intervals = {}
+
+    # Fixed spans in absolute minutes — used to find pattern exceptions
+    fixed_fac_spans = {}
+    fixed_team_spans = {}
+
+    # Diagnosis — ('request' | 'event', id) → assumption literal
+    assumed = {}
+
+    def assumption(key):
+        if key not in assumed:
+            assumed[key] = model.new_bool_var(f'assume_{key[0]}_{key[1]}')
+        return assumed[key]
+
+    # ── Add fixed events as constants (HC2) ──
+    fixed_on_fac = {}
+    fixed_on_team = {}
+    for ev in component.fixed_events:
+        start_min, end_min = _fixed_span(ev, epoch, step)
+        fac_idx = fac_index.get(ev.facility_id)
+        if fac_idx in fac_intervals:
+            # HC4 — warmup buffer before matches/championships only
+            buffer = WARMUP_BUFFER if ev.event_type in MATCH_TYPES else 0
+            fixed_on_fac.setdefault(fac_idx, []).append((start_min - buffer, end_min, ev))
+        # HC3 — team no-overlap (use actual duration, not padded)
+        if ev.team_id in component.team_ids:
+            fixed_on_team.setdefault(ev.team_id, []).append((start_min, end_min, ev))
+
+    # Only the parts of the timeline some slot can reach matter. Touching spans are
+    # merged into one interval — except when diagnosing, where every event keeps
+    # its own interval so it can be blamed on its own
+    fac_reach, team_reach = _reachable_spans(slots, facilities)
+    fixed_blocks = 0
+    for kind, fixed_on, reach, collectors, spans in (
+        ('f', fixed_on_fac, fac_reach, fac_intervals, fixed_fac_spans),
+        ('t', fixed_on_team, team_reach, team_intervals, fixed_team_spans),
+    ):
+        for key, fixed in fixed_on.items():
+            for n, (start, end, events) in enumerate(_fixed_blocks(fixed, reach.get(key, []), merge=not diagnose)):
+                active = None
+                if diagnose:
+                    # Carried-forward proposals (rolling horizon) are unsaved — blame their request
+                    ev = events[0]
+                    active = assumption(('event', ev.id) if ev.id else ('request', ev.booking_request_id))
+                interval = _new_fixed_interval(model, start, end - start, active, f'fixed_{kind}{key}_{n}')
+                collectors.setdefault(key, []).append((interval, start, end))
+                spans.setdefault(key, []).append((start, end))
+                fixed_blocks += 1
+
+    # Greedy warm start — slots without a previous placement get a conflict-free one
+    greedy_hinted = set()
+    if options.greedy_hints and not diagnose:
+        placements, _ = _greedy_schedule(slots, facilities, component.fixed_events, epoch, step)
+        for slot, start, fac_idx in placements:
+            if slot.hint_start is None and slot.hint_facility is None:
+                slot.hint_start, slot.hint_facility = start, fac_idx
+                greedy_hinted.add(id(slot))
+
+    # ── Add variable slots ──
+    pruned_choices = 0
+    # Each group of slots shares one start/facility decision: a single slot normally,
+    # or every week of a (request, weekday) in pattern mode.
+    if options.pattern_mode:
+        groups = _pattern_groups(slots, facilities, fixed_fac_spans, fixed_team_spans)
+    else:
+        groups = [[slot] for slot in slots]
+
+    compatible = {}
+    for idx, group in enumerate(groups):
+        first = group[0]
+        req = first.request
+
+        # HC7 — Facility-Type Compatibility: restrict to compatible facilities
+        if req.event_type not in compatible:
+            compatible[req.event_type] = _compatible_facilities(facilities, req.event_type)
+        compatible_facs = compatible[req.event_type]
+
+        # Partial scheduling — one presence literal per decision; when diagnosing,
+        # the request's assumption literal plays that role
+        optional = options.allow_partial and all(slot.optional for slot in group)
+        if diagnose:
+            present = assumption(('request', req.id))
         else:
-            fac_start = slot.start_var
-            fac_duration = slot.duration
-            fac_end = end_var
-
-        for fi in compatible_facs:  # HC7: only create intervals for compatible facilities
-            is_at_fac = model.new_bool_var(f'at_f{fi}_{idx}')
-            slot.facility_bools[fi] = is_at_fac
-            model.add(slot.facility_var == fi).only_enforce_if(is_at_fac)
-            model.add(slot.facility_var != fi).only_enforce_if(is_at_fac.negated())
-
-            opt_interval = model.new_optional_interval_var(
-                fac_start, fac_duration, fac_end, is_at_fac, f'opt_f{fi}_{idx}'
-            )
-            slot.facility_intervals[fi] = opt_interval
-            fac_intervals[fi].append(opt_interval)
-
-        # HC3 — team no-overlap
-        team_intervals.setdefault(team.id, []).append(slot.interval_var)
-
-        # ── Soft Constraints ──
-        priority_multiplier = req.priority  # 1, 2, or 3 (SC5)
-
-        # SC1 — Preferred Facility
-        if req.preferred_facility_id is not None:
-            pref_fac_idx = fac_index.get(req.preferred_facility_id)
-            if pref_fac_idx is not None:
-                not_at_pref = model.new_bool_var(f'not_pref_fac_{idx}')
-                model.add(slot.facility_var != pref_fac_idx).only_enforce_if(not_at_pref)
-                model.add(slot.facility_var == pref_fac_idx).only_enforce_if(not_at_pref.negated())
-                penalties.append(not_at_pref * PENALTY_WEIGHTS['preferred_facility'] * priority_multiplier)
-
-        # SC3 — Preferred Time Window
-        # Penalise if start is outside the preferred window
-        pref_start_abs = slot.day_start_offset + slot.time_start_min
-        pref_end_abs = slot.day_start_offset + slot.time_end_min - slot.duration
-        if pref_end_abs > pref_start_abs:
-            outside_window = model.new_bool_var(f'outside_time_{idx}')
-            # If the window is the full domain, this var is never true
-            # But we already bounded start_var to [lb, ub] so this is satisfied by domain
-            # SC3 penalty applies if we ever need to expand the domain
-            # For now, skip if domain already matches preferred window
-            if lb == pref_start_abs and ub == pref_end_abs:
-                pass  # already constrained to preferred window, no penalty needed
+            present = model.new_bool_var(f'present_{idx}') if optional else None
+
+        # Decision variable: bounded by the preferred time window and restricted to
+        # the time grid. A single slot is decided in absolute minutes; a weekly
+        # pattern as a time of day (frame 0)
+        lo, hi = _window_bounds(first)
+        starts = _grid_starts(lo, hi, step)
+        frame = first.day_start_offset if len(group) == 1 else 0
+        lb, ub = frame + lo, frame + hi
+        var_name = f'start_{idx}' if len(group) == 1 else f'pattern_{idx}'
+
+        # Presolve — a single slot only gets the starts and facilities that fixed events
+        # leave free. (Pattern groups collide with no fixed event, see _pattern_groups.)
+        # Diagnosis keeps whole windows, so the blocking events can be blamed
+        free_starts = first.free_starts if len(group) == 1 and not diagnose else None
+        if free_starts:
+            pruned_choices += len(compatible_facs) - len(free_starts)
+            compatible_facs = sorted(free_starts)
+            ranges = _merge_spans(r for fac_ranges in free_starts.values() for r in fac_ranges)
+        else:
+            ranges = [[starts[0], starts[-1]]]
+        decision = model.new_int_var_from_domain(_start_domain(ranges, frame, step), var_name)
+
+        # Warm start — only hints that fall inside the slot's domain are useful
+        for slot in group:
+            _clean_hints(slot, ranges, step, compatible_facs)
+        hinted = next((s for s in group if s.hint_start is not None), None)
+        if hinted is not None:
+            model.add_hint(decision, hinted.hint_start - hinted.day_start_offset + frame)
+        hint_facility = next((s.hint_facility for s in group if s.hint_facility is not None), None)
+        if present is not None and not diagnose:
+            model.add_hint(present, True)
+            # UNSCHEDULED_PENALTY per dropped slot, weighted by priority (SC5)
+            unscheduled_terms.append((1 - present) * UNSCHEDULED_PENALTY * req.priority * len(group))
+            penalties.append(unscheduled_terms[-1])
+
+        new_facility = _new_facility_literals if options.lean_model else _new_facility_choice
+        facility_var, facility_bools = new_facility(model, str(idx), compatible_facs, hint_facility, present)
+        if free_starts:
+            for fi, fac_ranges in free_starts.items():
+                if fac_ranges != ranges:
+                    model.add_linear_expression_in_domain(
+                        decision, _start_domain(fac_ranges, frame, step)
+                    ).only_enforce_if(facility_bools[fi])
+
+        for slot in group:
+            shift = slot.day_start_offset - frame
+            reach_start = slot.day_start_offset + lo
+            reach_end = slot.day_start_offset + hi + slot.duration
+            name = str(idx) if len(group) == 1 else f'{idx}_{slot.target_date:%Y%m%d}'
+            slot.start_var = decision + shift if shift else decision
+            slot.facility_var = facility_var
+            slot.facility_bools = facility_bools
+            slot.present = present
+
+            # Main interval (for HC3 team overlap — uses actual duration, HC6 duration match)
+            if present is None:
+                slot.interval_var = model.new_fixed_size_interval_var(
+                    slot.start_var, slot.duration, f'interval_{name}'
+                )
             else:
-                penalties.append(outside_window * PENALTY_WEIGHTS['preferred_time'] * priority_multiplier)
-
-        # SC4 — Usual Time
-        if team.usual_time is not None:
-            usual_abs = slot.day_start_offset + _time_to_minutes(team.usual_time)
-            not_at_usual = model.new_bool_var(f'not_usual_{idx}')
-            model.add(slot.start_var != usual_abs).only_enforce_if(not_at_usual)
-            model.add(slot.start_var == usual_abs).only_enforce_if(not_at_usual.negated())
-
-            weight = (PENALTY_WEIGHTS['usual_time_strict'] if not team.is_flexible
-                      else PENALTY_WEIGHTS['usual_time_flexible'])
-            penalties.append(not_at_usual * weight * priority_multiplier)
-
-        # SC6 — Younger Teams Earlier (before 7pm)
-        if _is_juvenile(team):
-            evening_abs = slot.day_start_offset + EVENING_CUTOFF_HOUR * 60
-            starts_late = model.new_bool_var(f'late_{idx}')
-            model.add(slot.start_var >= evening_abs).only_enforce_if(starts_late)
-            model.add(slot.start_var < evening_abs).only_enforce_if(starts_late.negated())
-            penalties.append(starts_late * PENALTY_WEIGHTS['younger_earlier'] * priority_multiplier)
-
-    # ── HC1 — No Facility Overlap (per facility) ──
-    for fi in range(num_facilities):
-        if len(fac_intervals[fi]) > 1:
-            model.add_no_overlap(fac_intervals[fi])
-
-    # ── HC3 — Team Single Location (per team, no time overlap) ──
-    for team_id, intervals in team_intervals.items():
-        if len(intervals) > 1:
-            model.add_no_overlap(intervals)
+                slot.interval_var = model.new_optional_fixed_size_interval_var(
+                    slot.start_var, slot.duration, present, f'interval_{name}'
+                )
+
+            # Per-facility optional intervals (for HC1 + HC4)
+            # HC4: matches/championships get a warmup buffer BEFORE the event
+            # Training and other events have no buffer (back-to-back is fine)
+            buffer = WARMUP_BUFFER if req.event_type in MATCH_TYPES else 0
+            fac_start = slot.start_var - buffer if buffer else slot.start_var
+            fac_duration = slot.duration + buffer
+
+            slot.facility_intervals = {}
+            for fi, is_at_fac in facility_bools.items():
+                opt_interval = model.new_optional_fixed_size_interval_var(
+                    fac_start, fac_duration, is_at_fac, f'opt_f{fi}_{name}'
+                )
+                slot.facility_intervals[fi] = opt_interval
+                fac_intervals[fi].append((opt_interval, reach_start - buffer, reach_end))
+
+            # HC3 — team no-overlap
+            team_intervals.setdefault(req.team_id, []).append((slot.interval_var, reach_start, reach_end))
+
+            # SC7 — stability against the slot's previous placement
+            if options.stability and not diagnose and slot.previous_start is not None:
+                _add_stability_penalties(model, penalties, name, slot, facility_bools)
+
+        # ── Soft Constraints ── (once per decision, weighted by the weeks it covers)
+        _add_soft_constraints(model, penalties, str(idx), req, fac_index, decision, facility_var,
+                              frame, lb, ub, occurrences=len(group),
+                              facility_bools=facility_bools if options.lean_model else None, present=present)
+
+    # ── HC1 — No Facility Overlap (per facility and day) ──
+    # ── HC3 — Team Single Location (per team and day, no time overlap) ──
+    # Two intervals can only overlap on a day both can reach, so one small NoOverlap
+    # per resource and calendar day is equivalent to one across the whole horizon
+    no_overlaps = 0
+    for collectors in (fac_intervals, team_intervals):
+        for entries in collectors.values():
+            for intervals in _by_day(entries).values():
+                if len(intervals) > 1:
+                    model.add_no_overlap(intervals)
+                    no_overlaps += 1
 
     # ── Objective: minimise total penalty ──
-    if penalties:
-        model.minimize(sum(penalties))
+    if penalties and not diagnose:
+        model.minimize(cp_model.LinearExpr.sum(penalties))
+
+    stats = _model_stats(model, fac_intervals, team_intervals, no_overlaps, penalties)
+    stats['greedy_hints'] = len(greedy_hinted)
+    stats['fixed_intervals'] = fixed_blocks
+    stats['pruned_choices'] = pruned_choices
+    build_time = perf_counter() - build_started
+
+    if diagnose:
+        started = perf_counter()
+        status_str, conflict = _minimal_conflict(model, assumed, time_limit)
+        return ComponentResult(status=status_str, wall_time=perf_counter() - started, penalty=None,
+                               conflict=conflict, build_time=build_time, stats=stats)
 
     # ── Solve ──
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = SOLVER_TIMEOUT
-    status_code = solver.solve(model)
-
-    status_map = {
-        cp_model.OPTIMAL: 'OPTIMAL',
-        cp_model.FEASIBLE: 'FEASIBLE',
-        cp_model.INFEASIBLE: 'INFEASIBLE',
-        cp_model.MODEL_INVALID: 'MODEL_INVALID',
-        cp_model.UNKNOWN: 'UNKNOWN',
-    }
-    status_str = status_map.get(status_code, 'UNKNOWN')
+    params = {'max_time_in_seconds': time_limit}
+    if options.relative_gap is not None:
+        params['relative_gap_limit'] = options.relative_gap
+    if component.absolute_gap is not None:
+        params['absolute_gap_limit'] = component.absolute_gap
+    if num_search_workers:
+        params['num_workers'] = num_search_workers
+    params.update(search_params or {})
+
+    # ── Two-stage mode ──
+    # Stage one only decides which slots to place; its level is then fixed and its
+    # solution hints the full-penalty search, which gets the rest of the time
+    # A stop during stage one accepts its schedule as it is, without stage two
+    two_stage = bool(options.two_stage and unscheduled_terms)
+    stage_one = None                    # the stage-one solver, when its schedule is accepted
+    stage_one_time = stage_one_branches = stage_one_conflicts = 0
+    if two_stage:
+        status_code, first = _solve_stage_one(
+            model, unscheduled_terms, params, time_limit * STAGE_ONE_SHARE, progress)
+        if status_code in (cp_model.INFEASIBLE, cp_model.MODEL_INVALID):
+            status_str = STATUS_MAP.get(status_code, 'UNKNOWN')
+            return ComponentResult(status=status_str, wall_time=first.wall_time, penalty=None,
+                                   build_time=build_time, stats=stats, stop_reason=status_str.lower())
+        if progress is not None and progress.stopped and status_code != cp_model.UNKNOWN:
+            stage_one = first
+        else:
+            stage_one_time = first.wall_time
+            stage_one_branches, stage_one_conflicts = first.num_branches, first.num_conflicts
+            params['max_time_in_seconds'] = max(time_limit - stage_one_time, MIN_COMPONENT_TIMEOUT)
+            model.minimize(cp_model.LinearExpr.sum(penalties))
+
+    dump_path = component.dump_path
+    if stage_one is not None:
+        solver, status_code, dump_path = stage_one, cp_model.FEASIBLE, None
+    else:
+        if dump_path:
+            if search_params:
+                dump_path = f"{dump_path}-run{search_params['random_seed']}"
+            model.export_to_file(f'{dump_path}.pbtxt')
+
+        solver = cp_model.CpSolver()
+        for name, value in params.items():
+            setattr(solver.parameters, name, value)
+        if progress is None:
+            status_code = solver.solve(model)
+        else:
+            try:
+                status_code = solver.solve(model, progress._attach(solver, new_component=not two_stage))
+            finally:
+                progress._detach()
+    status_str = STATUS_MAP.get(status_code, 'UNKNOWN')
+    stats['branches'] = solver.num_branches + stage_one_branches
+    stats['conflicts'] = solver.num_conflicts + stage_one_conflicts
+    wall_time = solver.wall_time + stage_one_time
+
+    if dump_path:
+        _write_dump_sidecar(dump_path, slots, epoch, options, params, solver, status_code, build_time, stats)
 
     if status_code not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return SolverResult(
-            success=False, status=status_str,
-            solve_time=solver.wall_time, penalty=None,
-        )
+        stop_reason = 'time_limit' if status_code == cp_model.UNKNOWN else status_str.lower()
+        return ComponentResult(status=status_str, wall_time=wall_time, penalty=None,
+                               build_time=build_time, stats=stats, stop_reason=stop_reason)
+
+    if stage_one is not None:
+        # Stage one bounded a different objective, so only the trivial bound holds
+        stats['best_bound'] = 0
+        penalty = solver.value(cp_model.LinearExpr.sum(penalties))
+    else:
+        # Objective and bound are floats (x.999… with the presence offsets), so round, not
+        # truncate — the gap check below compares them as integers. Every penalty is
+        # non-negative, but an early bound can sit below the presence offsets; clamp it at 0
+        stats['best_bound'] = max(0, round(solver.best_objective_bound)) if penalties else 0
+        penalty = round(solver.objective_value) if penalties else 0
+    if status_code == cp_model.FEASIBLE:
+        stop_reason = 'stopped' if progress is not None and progress.stopped else 'time_limit'
+    elif penalty > stats['best_bound']:
+        # CP-SAT reports a met gap limit as OPTIMAL; the schedule is not proven optimal
+        status_str, stop_reason = 'FEASIBLE', 'gap_limit'
+    else:
+        stop_reason = 'optimal'
 
     # ── Extract solution ──
+    extract_started = perf_counter()
     result_events = []
-    processed_request_ids = set()
-
-    for idx, slot in enumerate(slots):
-        if slot.start_var is None:
-            continue  # slot was skipped (no compatible facility — HC7)
+    unscheduled = []
+    hints_added = hints_kept = 0
+    for slot in slots:
         req = slot.request
+        if slot.present is not None and not solver.boolean_value(slot.present):
+            unscheduled.append({'request_id': req.id, 'date': slot.target_date, 'reason': NO_ROOM_REASON})
+            continue
         start_abs = solver.value(slot.start_var)
         fac_idx = solver.value(slot.facility_var)
-        facility = facilities[fac_idx]
-
-        # Convert absolute minutes back to datetime
-        start_dt = datetime.combine(epoch, time(0, 0)) + timedelta(minutes=start_abs)
-        end_dt = start_dt + timedelta(minutes=slot.duration)
-
-        result_events.append({
-            'request_id': req.id,
-            'title': req.title,
-            'start_time': start_dt,
-            'end_time': end_dt,
-            'facility_id': facility.id,
-            'team_id': req.team_id,
-            'event_type': req.event_type,
-        })
-        processed_request_ids.add(req.id)
+
+        # Warm-start stats cover previous placements only, not greedy hints
+        if (slot.hint_start is not None or slot.hint_facility is not None) and id(slot) not in greedy_hinted:
+            hints_added += 1
+            if (slot.hint_start in (None, start_abs)
+                    and slot.hint_facility in (None, fac_idx)):
+                hints_kept += 1
+
+        result_events.append(_event_dict(slot, start_abs, facilities[fac_idx], epoch))
+
+    return ComponentResult(
+        status=status_str,
+        wall_time=wall_time,
+        penalty=penalty,
+        events=result_events,
+        hints_added=hints_added,
+        hints_kept=hints_kept,
+        unscheduled=unscheduled,
+        build_time=build_time,
+        extract_time=perf_counter() - extract_started,
+        stats=stats,
+        stop_reason=stop_reason,
+    )
+
+
+def _solve_stage_one(model, unscheduled_terms: list, params: dict, time_limit: float,
+                     progress: 'SolveProgress | None' = None) -> tuple:
+    """Stage one of two-stage mode: minimise the priority-weighted unscheduled slots alone.
+
+    Without preference penalties the search only asks which slots fit, which
+    CP-SAT settles far faster than the weighted objective. On success the level
+    found becomes a constraint and the whole solution becomes the model's hints,
+    so stage two starts from a complete schedule that keeps at least as much
+    priority placed. Gap limits apply to the final objective, not here.
+    Solutions reach progress with the stage-one objective, and a stop ends the
+    search like any other. Returns (status code, the CpSolver that ran).
+    """
+    objective = cp_model.LinearExpr.sum(unscheduled_terms)
+    model.minimize(objective)
+    solver = cp_model.CpSolver()
+    for name, value in params.items():
+        if name not in ('relative_gap_limit', 'absolute_gap_limit'):
+            setattr(solver.parameters, name, value)
+    solver.parameters.max_time_in_seconds = time_limit
+    if progress is None:
+        status_code = solver.solve(model)
+    else:
+        try:
+            status_code = solver.solve(model, progress._attach(solver))
+        finally:
+            progress._detach()
+
+    if status_code in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        # Rounded: a truncated x.999… level would make stage two infeasible
+        model.add(objective <= round(solver.objective_value))
+        model.clear_hints()
+        for i in range(len(model.proto.variables)):
+            var = model.get_int_var_from_proto_index(i)
+            model.add_hint(var, solver.value(var))
+    return status_code, solver
+
+
+def _write_dump_sidecar(dump_path: str, slots: list[SlotInstance], epoch: date, options: SolverOptions,
+                        params: dict, solver, status_code, build_time: float, stats: dict) -> None:
+    """Write the JSON sidecar of a dumped model: slot → request mapping, parameters and outcome.
+
+    Slot variables are given by their index in the model proto; a pattern-mode
+    start is an offset of a shared variable, and a lean-model facility is a sum
+    of its facility booleans, so neither has an index of its own.
+    """
+    def index(expr):
+        return expr.index if isinstance(expr, cp_model.IntVar) else None
+
+    solved = status_code in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    sidecar = {
+        'model': os.path.basename(f'{dump_path}.pbtxt'),
+        'epoch': epoch,
+        'options': asdict(options),
+        'parameters': params,
+        'slots': [
+            {
+                'request_id': slot.request.id,
+                'date': slot.target_date,
+                'duration': slot.duration,
+                'start': index(slot.start_var),
+                'facility': index(slot.facility_var),
+                'facilities': {fi: index(is_at_fac) for fi, is_at_fac in slot.facility_bools.items()},
+                'present': index(slot.present) if slot.present is not None else None,
+            }
+            for slot in slots
+        ],
+        'result': {
+            'status': STATUS_MAP.get(status_code, 'UNKNOWN'),
+            'objective': solver.objective_value if solved else None,
+            'best_bound': solver.best_objective_bound if solved else None,
+            'wall_time': solver.wall_time,
+            'build_time': build_time,
+        },
+        'stats': stats,
+    }
+    with open(f'{dump_path}.json', 'w') as fh:
+        json.dump(sidecar, fh, indent=2, default=str)
+
+
+def _new_fixed_interval(model, start: int, duration: int, active, name: str):
+    """A constant interval, or an optional one guarded by an assumption literal."""
+    if active is None:
+        return model.new_fixed_size_interval_var(start, duration, name)
+    return model.new_optional_fixed_size_interval_var(start, duration, active, name)
+
+
+def _minimal_conflict(model, assumed: dict, time_limit: float) -> tuple[str, list[tuple]]:
+    """Find a minimal set of assumptions (requests / fixed events) that cannot hold together.
+
+    CP-SAT's sufficient_assumptions_for_infeasibility gives a core that is not
+    necessarily minimal; a deletion pass then drops every member whose removal
+    leaves the rest still infeasible. Returns the diagnosis status and the core.
+    """
+    by_index = {literal.index: key for key, literal in assumed.items()}
+    deadline = perf_counter() + time_limit
+
+    def infeasible_core(keys):
+        model.clear_assumptions()
+        model.add_assumptions([assumed[key] for key in keys])
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(deadline - perf_counter(), 0.1)
+        solver.parameters.num_workers = 1  # cores are only reported by the sequential search
+        status_code = solver.solve(model)
+        if status_code != cp_model.INFEASIBLE:
+            return STATUS_MAP.get(status_code, 'UNKNOWN'), None
+        return 'INFEASIBLE', [by_index[i] for i in solver.sufficient_assumptions_for_infeasibility()]
+
+    status_str, core = infeasible_core(list(assumed))
+    if core is None:
+        return status_str, []
+
+    i = 0
+    while i < len(core) and perf_counter() < deadline:
+        _, smaller = infeasible_core(core[:i] + core[i + 1:])
+        if smaller is None:
+            i += 1          # core[i] is needed for the conflict
+        else:
+            # Still infeasible without it. Members already confirmed as needed are in
+            # every infeasible subset, so keeping core order keeps them before i
+            smaller = set(smaller)
+            core = [key for key in core if key in smaller]
+    return 'INFEASIBLE', sorted(core)
+
+
+def _solve_components(components: list[SolverComponent], facilities: list, epoch: date,
+                      options: SolverOptions, workers: int, time_budget: float,
+                      progress: SolveProgress | None = None) -> list[ComponentResult]:
+    """Solve every component, in-process or across a pool of worker processes.
+
+    In-process, each component gets a share of the remaining time_budget
+    proportional to its slot count (time left over by fast components rolls
+    forward) and CP-SAT searches with _core_budget() threads. In a pool,
+    components run concurrently and each gets the full time_budget; CP-SAT's
+    own search threads are divided between workers (and progress is not
+    reported — see SolveProgress). With options.portfolio_runs > 1 the
+    components are solved as a portfolio instead.
+    """
+    if options.portfolio_runs > 1:
+        return _solve_portfolio(components, facilities, epoch, options, time_budget)
+
+    if workers > 1 and len(components) > 1:
+        pool_size = min(workers, len(components))
+        threads_per_worker = max(1, _core_budget() // pool_size)
+        with _process_pool(pool_size) as pool:
+            futures = [
+                pool.submit(_solve_component, comp, facilities, epoch, options,
+                            time_budget, threads_per_worker)
+                for comp in components
+            ]
+            return [f.result() for f in futures]
+
+    results = []
+    deadline = perf_counter() + time_budget
+    remaining_slots = sum(len(comp.slots) for comp in components)
+    for comp in components:
+        remaining_time = deadline - perf_counter()
+        share = remaining_time * len(comp.slots) / remaining_slots
+        results.append(_solve_component(comp, facilities, epoch, options, max(share, MIN_COMPONENT_TIMEOUT),
+                                        _core_budget(), progress=progress))
+        remaining_slots -= len(comp.slots)
+    return results
+
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """A pool of fresh worker processes, started by forkserver (spawn where unavailable).
+
+    Solves run on a SolveJob thread, and forking a multi-threaded process can
+    copy held locks into the child and deadlock it. Workers receive plain
+    records, but django.setup() is still needed to import this module (and its
+    models) in a fresh worker.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=django.setup)
+
+
+def _core_budget() -> int:
+    """Cores the solver may use at once: settings.SOLVER_CORE_BUDGET, or all of them when unset."""
+    return getattr(settings, 'SOLVER_CORE_BUDGET', 0) or os.cpu_count() or 1
+
+
+def _solve_portfolio(components: list[SolverComponent], facilities: list, epoch: date,
+                     options: SolverOptions, time_budget: float) -> list[ComponentResult]:
+    """Solve every component options.portfolio_runs times and keep each one's best run.
+
+    Run n uses random_seed n and PORTFOLIO_PRESETS[n] (cycling). All runs share
+    one process pool of at most _core_budget() processes, with CP-SAT's search
+    threads split so the pool stays within the budget. Runs that cannot start
+    at once queue for a slot, so the time_budget is divided between the waves.
+    The kept result lists every run of its component in ComponentResult.runs.
+    """
+    runs = min(options.portfolio_runs, MAX_PORTFOLIO_RUNS)
+    cores = _core_budget()
+    tasks = [(comp_idx, run) for comp_idx in range(len(components)) for run in range(runs)]
+    pool_size = min(cores, len(tasks))
+    threads_per_run = max(1, cores // pool_size)
+    waves = -(-len(tasks) // pool_size)
+    time_limit = max(time_budget / waves, MIN_COMPONENT_TIMEOUT)
+
+    with _process_pool(pool_size) as pool:
+        futures = {}
+        for comp_idx, run in tasks:
+            _, preset = PORTFOLIO_PRESETS[run % len(PORTFOLIO_PRESETS)]
+            futures[comp_idx, run] = pool.submit(
+                _solve_component, components[comp_idx], facilities, epoch, options, time_limit,
+                threads_per_run, search_params={'random_seed': run, **preset},
+            )
+        outcomes = {key: future.result() for key, future in futures.items()}
+
+    results = []
+    for comp_idx in range(len(components)):
+        candidates = [outcomes[comp_idx, run] for run in range(runs)]
+        solved = [r for r in candidates if r.status in ('OPTIMAL', 'FEASIBLE')]
+        if solved:
+            best = min(solved, key=lambda r: (r.penalty, r.status != 'OPTIMAL', r.wall_time))
+        else:
+            # A proven INFEASIBLE beats a run that merely ran out of time
+            best = next((r for r in candidates if r.status == 'INFEASIBLE'), candidates[0])
+        best.runs = [
+            {
+                'run': run,
+                'seed': run,
+                'preset': PORTFOLIO_PRESETS[run % len(PORTFOLIO_PRESETS)][0],
+                'status': r.status,
+                'penalty': r.penalty,
+                'best_bound': r.stats.get('best_bound'),
+                'wall_time': round(r.wall_time, 4),
+                'kept': r is best,
+            }
+            for run, r in enumerate(candidates)
+        ]
+        results.append(best)
+    return results
+
+
+# ── Input Snapshot ──
+
+REQUEST_COLUMNS = tuple(name for name in RequestRecord._fields if name != 'team')
+TEAM_COLUMNS = tuple(f'team__{name}' for name in TeamRecord._fields)
+
+
+def _load_facilities() -> tuple[FacilityRecord, ...]:
+    return tuple(
+        FacilityRecord(fac_id, tuple(suitable_for or ()))
+        for fac_id, suitable_for in Facility.objects.order_by('pk').values_list('id', 'suitable_for')
+    )
+
+
+def _load_requests(queryset) -> tuple[RequestRecord, ...]:
+    """Read BookingRequests and their teams in one joined query, sharing one TeamRecord per team."""
+    teams = {}
+    requests = []
+    for row in queryset.values_list(*REQUEST_COLUMNS, *TEAM_COLUMNS):
+        values = dict(zip(REQUEST_COLUMNS, row[:len(REQUEST_COLUMNS)]))
+        team = teams.get(values['team_id'])
+        if team is None:
+            team = teams[values['team_id']] = TeamRecord(*row[len(REQUEST_COLUMNS):])
+        values['preferred_days'] = tuple(values['preferred_days'] or ())
+        requests.append(RequestRecord(team=team, **values))
+    return tuple(requests)
+
+
+def _load_events(queryset) -> tuple[EventRecord, ...]:
+    return tuple(EventRecord(*row) for row in queryset.values_list(*EventRecord._fields))
+
+
+def _load_fixed_events(date_from: date, date_until: date) -> tuple[EventRecord, ...]:
+    return _load_events(Event.objects.filter(
+        start_time__date__lte=date_until,
+        end_time__date__gte=date_from,
+    ).filter(models_q_fixed_or_published()))
+
+
+def _load_hint_events(team_ids, date_from: date, date_until: date) -> tuple[HintRecord, ...]:
+    """Previous proposed/published placements of the teams (within HINT_LOOKBACK_DAYS), most recent first."""
+    return tuple(HintRecord(*row) for row in Event.objects.filter(
+        team_id__in=team_ids,
+        status__in=('proposed', 'published'),
+        start_time__date__gte=date_from - timedelta(days=HINT_LOOKBACK_DAYS),
+        start_time__date__lte=date_until,
+    ).order_by('-start_time').values_list(*HintRecord._fields))
+
+
+def load_snapshot(date_from: date, date_until: date, use_hints: bool = True) -> SolverSnapshot:
+    """Read the inputs of a solve over date_from..date_until into a SolverSnapshot.
+
+    Takes one .values_list() query each for facilities, the pending requests in
+    range (joined with their teams), the fixed/published events in range and —
+    with use_hints — the requesting teams' previous placements. Only the fields
+    the solver reads are loaded and no model instances are built.
+    """
+    requests = _load_requests(BookingRequest.objects.filter(
+        status='pending',
+        schedule_from__lte=date_until,
+        schedule_until__gte=date_from,
+    ))
+    hint_events = None
+    if use_hints:
+        team_ids = {req.team_id for req in requests}
+        hint_events = _load_hint_events(team_ids, date_from, date_until) if team_ids else ()
+    return SolverSnapshot(
+        date_from=date_from,
+        date_until=date_until,
+        facilities=_load_facilities(),
+        requests=requests,
+        fixed_events=_load_fixed_events(date_from, date_until),
+        hint_events=hint_events,
+    )
+
+
+# ── Result Cache ──
+
+CACHEABLE_STATUSES = {'OPTIMAL', 'FEASIBLE', 'INFEASIBLE'}  # UNKNOWN may improve on a re-run
+
+
+def _snapshot_fingerprint(snapshot: SolverSnapshot, options: SolverOptions) -> str:
+    """Hash a snapshot and the options that shape its model into a stable cache key.
+
+    The snapshot holds only the fields the solver reads, so bookkeeping changes
+    (timestamps, names, statuses of unrelated rows) keep the key. Penalty weights
+    and other tuning constants are covered too. Worker count is left out: it
+    changes how the model is solved, not what it is.
+    """
+    payload = {
+        'snapshot': vars(snapshot),
+        'options': {k: v for k, v in asdict(options).items() if k not in ('workers', 'use_cache', 'dump_model')},
+        'constants': [WARMUP_BUFFER, MIN_TIME_LIMIT, MAX_TIME_LIMIT, SECONDS_PER_CHOICE, PENALTY_WEIGHTS,
+                      UNSCHEDULED_PENALTY, EVENING_CUTOFF_HOUR, sorted(JUVENILE_AGE_GROUPS)],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _result_cache():
+    return caches[settings.SOLVER_CACHE_ALIAS]
+
+
+# ── Main Solver ──
+
+def solve_schedule(date_from: date, date_until: date, options: SolverOptions | None = None,
+                   progress: SolveProgress | None = None) -> SolverResult:
+    """
+    Generate a conflict-free schedule from pending BookingRequests.
+
+    Loads a SolverSnapshot of the pending BookingRequests, existing
+    fixed/published Events, Facilities and Teams (load_snapshot) and solves it
+    with solve_snapshot(). Returns a SolverResult with proposed events ready
+    for bulk creation.
+
+    With options.use_cache, a result previously computed from an identical
+    snapshot is returned from the solver cache (SolverResult.cached = True) —
+    except with options.dump_model, which always solves so there is a model to
+    dump. The cache is shared only as far as its backend is: the default
+    LocMemCache is per process (see settings.SOLVER_CACHE_BACKEND).
+
+    A progress object receives improving solutions and can stop the search
+    early.
+    """
+    options = options or SolverOptions()
+    timings = {}
+
+    with _phase(timings, 'query'):
+        snapshot = load_snapshot(date_from, date_until, use_hints=options.use_hints or options.stability)
+
+    cache_key = None
+    if options.use_cache and not options.dump_model:
+        with _phase(timings, 'fingerprint'):
+            cache_key = f'solver-result:{_snapshot_fingerprint(snapshot, options)}'
+            cached = _result_cache().get(cache_key)
+        if cached is not None:
+            # A copy, so callers cannot change the cache entry. Stats describe the
+            # original solve; solve_time and timings describe this call
+            result = copy.deepcopy(cached)
+            result.cached = True
+            result.timings = timings
+            result.solve_time = sum(timings.values())
+            return result
+
+    result = solve_snapshot(snapshot, options, progress)
+    result.timings = {**timings, **result.timings}
+
+    # An early-stopped result is only as good as the moment it was accepted
+    if cache_key and result.status in CACHEABLE_STATUSES and not result.stopped_early:
+        _result_cache().set(cache_key, result)
+    return result
+
+
+def solve_snapshot(snapshot: SolverSnapshot, options: SolverOptions | None = None,
+                   progress: SolveProgress | None = None) -> SolverResult:
+    """
+    Solve a SolverSnapshot without touching the database.
+
+    Generates the slots of the snapshot's requests, warm-starts them from its
+    hint events (when loaded and options.use_hints) and, with options.stability,
+    penalises moving them off those previous placements (SC7). Splits them into
+    independent components (and, with options.window_days, rolling-horizon date
+    windows), builds a CP-SAT model with hard and soft constraints for each,
+    and solves them.
+    """
+    options = options or SolverOptions()
+    date_from, date_until = snapshot.date_from, snapshot.date_until
+    timings = {}
+
+    facilities = list(snapshot.facilities)
+    if not facilities:
+        return SolverResult(success=False, status='INFEASIBLE', solve_time=0.0,
+                            penalty=None, events=[], requests_processed=set(), timings=timings)
+
+    # ── Generate slots ──
+    with _phase(timings, 'generate_slots'):
+        slots = _generate_slots(snapshot.requests, date_from, date_until, date_from)
+
+    if not slots:
+        return SolverResult(success=True, status='OPTIMAL', solve_time=0.0,
+                            penalty=0, events=[], requests_processed=set(), timings=timings)
+
+    if snapshot.hint_events is not None and (options.use_hints or options.stability):
+        with _phase(timings, 'hints'):
+            if options.use_hints:
+                _attach_hints(slots, facilities, snapshot.hint_events)
+            if options.stability:
+                _attach_previous(slots, facilities, snapshot.hint_events)
+
+    result = _solve_slots(slots, facilities, list(snapshot.fixed_events), date_from, date_until, options, progress)
+    result.timings = {**timings, **result.timings}
+    return result
+
+
+def solve_incremental(request_id: int, date_from: date, date_until: date,
+                      options: SolverOptions | None = None,
+                      progress: SolveProgress | None = None) -> SolverResult:
+    """
+    Re-solve a single BookingRequest without disturbing the rest of the proposed schedule.
+
+    Only proposed Events on the request's dates that share a compatible facility
+    or its team (its neighbourhood) are re-placed, together with the request's
+    own previous proposals; every other proposed Event is frozen as if fixed.
+    The events to delete are returned in SolverResult.replaced_event_ids.
+    """
+    options = options or SolverOptions()
+    epoch = date_from
+    started = perf_counter()
+
+    facilities = list(_load_facilities())
+    if not facilities:
+        return SolverResult(success=False, status='INFEASIBLE', solve_time=0.0, penalty=None)
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+
+    targets = _load_requests(BookingRequest.objects.filter(id=request_id))
+    if not targets:
+        raise BookingRequest.DoesNotExist(f'BookingRequest {request_id} does not exist.')
+    target = targets[0]
+    target_slots = _generate_slots([target], date_from, date_until, epoch)
+    if not target_slots:
+        return SolverResult(success=True, status='OPTIMAL', solve_time=0.0, penalty=0)
+
+    target_dates = {slot.target_date for slot in target_slots}
+    target_facs = set(_compatible_facilities(facilities, target.event_type))
+
+    proposed = _load_events(Event.objects.filter(
+        status='proposed',
+        start_time__date__gte=date_from - timedelta(days=1),
+        start_time__date__lte=date_until + timedelta(days=1),
+    ).exclude(
+        models_q_fixed_or_published()
+    ))
+    proposed_requests = {req.id: req for req in _load_requests(BookingRequest.objects.filter(
+        id__in={ev.booking_request_id for ev in proposed if ev.booking_request_id is not None},
+    ))}
+
+    slots = list(target_slots)
+    replaced = []
+    frozen = []
+    seen = set()
+    for ev in proposed:
+        if ev.booking_request_id == target.id:
+            replaced.append(ev)  # the request's own previous proposals are always re-placed
+            continue
+
+        ev_date = timezone.localtime(ev.start_time).date() if timezone.is_aware(ev.start_time) else ev.start_time.date()
+        touches = ev_date in target_dates and (
+            fac_index.get(ev.facility_id) in target_facs or ev.team_id == target.team_id
+        )
+        request = proposed_requests.get(ev.booking_request_id)
+        neighbour_slots = []
+        if touches and request is not None and (request.id, ev_date) not in seen:
+            neighbour_slots = _generate_slots([request], ev_date, ev_date, epoch)
+        if neighbour_slots:
+            for slot in neighbour_slots:
+                slot.optional = False  # already placed once, so it must stay placed
+            seen.add((request.id, ev_date))
+            slots.extend(neighbour_slots)
+            replaced.append(ev)
+        else:
+            frozen.append(ev)  # untouched — or cannot be re-generated from its request
+
+    fixed_events = list(_load_fixed_events(date_from, date_until)) + frozen
+
+    timings = {'neighbourhood': perf_counter() - started}
+    if options.use_hints or options.stability:
+        with _phase(timings, 'hints'):
+            team_ids = {slot.request.team_id for slot in slots}
+            previous = _load_hint_events(team_ids, date_from, date_until)
+            if options.use_hints:
+                _attach_hints(slots, facilities, previous)
+            if options.stability:
+                _attach_previous(slots, facilities, previous)
+
+    result = _solve_slots(slots, facilities, fixed_events, date_from, date_until, options, progress)
+    result.replaced_event_ids = {ev.id for ev in replaced}
+    result.timings = {**timings, **result.timings}
+    return result
+
+
+def _solve_slots(slots: list[SlotInstance], facilities: list, fixed_events: list,
+                 date_from: date, date_until: date, options: SolverOptions,
+                 progress: SolveProgress | None = None) -> SolverResult:
+    """Decompose slots into windows and components, solve them and merge the results."""
+    epoch = date_from
+    workers = options.workers
+    if workers is None:
+        workers = getattr(settings, 'SOLVER_WORKERS', 1)
+
+    # ── Decompose and solve ──
+    timings = {}
+    started = perf_counter()
+    time_limit = options.time_limit or _default_time_limit(slots, facilities)
+    dump_prefix = _dump_prefix(date_from, date_until) if options.dump_model else None
+    windows = _split_windows(date_from, date_until, options.window_days)
+    window_len = options.window_days or (date_until - date_from).days + 1
+    slots_by_window = [[] for _ in windows]
+    for slot in slots:
+        slots_by_window[(slot.target_date - date_from).days // window_len].append(slot)
+
+    results = []
+    solved = []  # components, aligned with results (for diagnosis)
+    num_components = 0
+
+    # HC7 — slots no facility can host never reach a model
+    homeless = [slot for slot in slots if not _compatible_facilities(facilities, slot.request.event_type)]
+    unscheduled = [
+        {'request_id': slot.request.id, 'date': slot.target_date, 'reason': NO_FACILITY_REASON}
+        for slot in homeless
+    ]
+
+    if options.draft:
+        return _draft_result(slots, homeless, facilities, fixed_events, epoch, options, unscheduled, timings)
+
+    unfit_slots = unfit_penalty = 0
+
+    def presolve(w_slots, w_fixed):
+        """Shrink slot domains to free time; leave out slots that fit nowhere, if they may be."""
+        nonlocal unfit_slots, unfit_penalty
+        with _phase(timings, 'presolve'):
+            unfit = _presolve_slots(w_slots, facilities, w_fixed, epoch, options.time_granularity)
+        dropped = set()
+        for slot in unfit:
+            if options.allow_partial and slot.optional:
+                dropped.add(id(slot))
+                unfit_penalty += UNSCHEDULED_PENALTY * slot.request.priority  # as if the model left it out
+                unscheduled.append({'request_id': slot.request.id, 'date': slot.target_date,
+                                    'reason': NO_ROOM_REASON})
+            else:
+                slot.free_starts = None  # the run is infeasible — let the solve (and diagnosis) say so
+        unfit_slots += len(unfit)
+        return [slot for slot in w_slots if id(slot) not in dropped]
+
+    if len(windows) == 1 or options.concurrent_windows:
+        # Windows share no slot intervals, so they are simply more independent components
+        components = []
+        for (w_from, w_until), w_slots in zip(windows, slots_by_window):
+            w_fixed = fixed_events if len(windows) == 1 else _events_in_span(fixed_events, w_from, w_until)
+            w_slots = presolve(w_slots, w_fixed)
+            with _phase(timings, 'decompose'):
+                components.extend(_partition_slots(w_slots, facilities, w_fixed))
+        _share_absolute_gap(components, options, len(slots))
+        _assign_dump_paths(components, dump_prefix, 0)
+        num_components = len(components)
+        results = _solve_components(components, facilities, epoch, options, workers, time_limit, progress)
+        solved = components
+    else:
+        # Rolling horizon: solve windows in date order, carrying each window's
+        # proposals forward as fixed events for the window after it
+        carried = []
+        deadline = started + time_limit
+        remaining_slots = len(slots)
+        for (w_from, w_until), w_slots in zip(windows, slots_by_window):
+            if not w_slots:
+                continue
+            w_fixed = _events_in_span(fixed_events + carried, w_from, w_until)
+            fitting = presolve(w_slots, w_fixed)
+            with _phase(timings, 'decompose'):
+                components = _partition_slots(fitting, facilities, w_fixed)
+            _share_absolute_gap(components, options, len(slots))
+            _assign_dump_paths(components, dump_prefix, num_components)
+            num_components += len(components)
+
+            budget = (deadline - perf_counter()) * len(w_slots) / remaining_slots
+            w_results = _solve_components(components, facilities, epoch, options, workers,
+                                          max(budget, MIN_COMPONENT_TIMEOUT), progress)
+            results.extend(w_results)
+            solved.extend(components)
+            remaining_slots -= len(w_slots)
+
+            if any(r.status not in ('OPTIMAL', 'FEASIBLE') for r in w_results):
+                break  # the run fails as a whole — later windows cannot change that
+            carried = [_as_fixed_event(ev) for r in w_results for ev in r.events]
+
+    solve_time = perf_counter() - started
+
+    # Component phases are summed, so with a process pool they can exceed solve_time
+    timings['build'] = sum(r.build_time for r in results)
+    timings['search'] = sum(r.wall_time for r in results)
+    timings['extract'] = sum(r.extract_time for r in results)
+    timings['solve'] = solve_time
+    stats = _sum_stats([r.stats for r in results])
+    stats['unfit_slots'] = unfit_slots
+    reasons = {r.stop_reason for r in results}
+    portfolio = [{'component': i, **run} for i, r in enumerate(results) for run in r.runs]
+    stop_reason = next((reason for reason in STOP_REASONS if reason in reasons), '')
+
+    # ── Merge ──
+    failed = [r.status for r in results if r.status not in ('OPTIMAL', 'FEASIBLE')]
+    if failed:
+        # INFEASIBLE is the most informative failure, then MODEL_INVALID, then UNKNOWN (timeout)
+        status_str = next(s for s in ('INFEASIBLE', 'MODEL_INVALID', 'UNKNOWN') if s in failed)
+        conflicts = {}
+        if status_str == 'INFEASIBLE' and options.diagnose:
+            with _phase(timings, 'diagnose'):
+                conflicts = _diagnose(solved, results, facilities, epoch, options)
+        return SolverResult(
+            success=False, status=status_str,
+            solve_time=solve_time, penalty=None,
+            components=num_components, windows=len(windows),
+            timings=timings, stats=stats,
+            unscheduled=unscheduled + [u for r in results for u in r.unscheduled],
+            conflicts=conflicts,
+            stopped_early=progress is not None and progress.stopped,
+            stop_reason=stop_reason,
+            time_limit=time_limit,
+            portfolio=portfolio,
+        )
+
+    result_events = [ev for r in results for ev in r.events]
+    status_str = 'OPTIMAL' if all(r.status == 'OPTIMAL' for r in results) else 'FEASIBLE'
 
     return SolverResult(
         success=True,
         status=status_str,
-        solve_time=solver.wall_time,
-        penalty=int(solver.objective_value) if penalties else 0,
+        solve_time=solve_time,
+        penalty=sum(r.penalty for r in results) + unfit_penalty,
         events=result_events,
-        requests_processed=processed_request_ids,
+        requests_processed={ev['request_id'] for ev in result_events},
+        components=num_components,
+        windows=len(windows),
+        hints_added=sum(r.hints_added for r in results),
+        hints_kept=sum(r.hints_kept for r in results),
+        timings=timings,
+        stats=stats,
+        unscheduled=unscheduled + [u for r in results for u in r.unscheduled],
+        stopped_early=progress is not None and progress.stopped,
+        stop_reason=stop_reason,
+        time_limit=time_limit,
+        portfolio=portfolio,
+    )
+
+
+def _draft_result(slots: list[SlotInstance], homeless: list[SlotInstance], facilities: list,
+                  fixed_events: list, epoch: date, options: SolverOptions, unscheduled: list[dict],
+                  timings: dict) -> SolverResult:
+    """Quick draft: place every slot greedily and skip CP-SAT altogether.
+
+    The draft is conflict-free but not optimised. A slot the greedy pass cannot
+    place is left out like an unplaceable slot in partial mode; when slots may
+    not be left out, the run fails with UNKNOWN (the greedy pass proves nothing).
+    """
+    fac_index = {f.id: i for i, f in enumerate(facilities)}
+    skipped = {id(slot) for slot in homeless}
+    with _phase(timings, 'greedy'):
+        placements, unplaced = _greedy_schedule([s for s in slots if id(s) not in skipped], facilities,
+                                                fixed_events, epoch, options.time_granularity)
+    solve_time = timings['greedy']
+    timings['solve'] = solve_time
+
+    if unplaced and not (options.allow_partial and all(slot.optional for slot in unplaced)):
+        return SolverResult(success=False, status='UNKNOWN', solve_time=solve_time, penalty=None,
+                            timings=timings, unscheduled=unscheduled)
+
+    events = [_event_dict(slot, start, facilities[fac_idx], epoch) for slot, start, fac_idx in placements]
+    penalty = sum(
+        _placement_penalty(slot.request, fac_index, fac_idx, start - slot.day_start_offset)
+        for slot, start, fac_idx in placements
+    ) + sum(UNSCHEDULED_PENALTY * slot.request.priority for slot in unplaced)
+    return SolverResult(
+        success=True,
+        status='FEASIBLE',
+        solve_time=solve_time,
+        penalty=penalty,
+        events=events,
+        requests_processed={ev['request_id'] for ev in events},
+        timings=timings,
+        unscheduled=unscheduled + [
+            {'request_id': slot.request.id, 'date': slot.target_date, 'reason': NO_ROOM_REASON}
+            for slot in unplaced
+        ],
     )
 
 
+def _default_time_limit(slots: list[SlotInstance], facilities: list) -> float:
+    """Time budget scaled to model size: SECONDS_PER_CHOICE per (slot, compatible facility) pair.
+
+    Clamped to [MIN_TIME_LIMIT, MAX_TIME_LIMIT], so a small club still gets a
+    generous search and a very large one is cut off.
+    """
+    compatible = {}
+    choices = 0
+    for slot in slots:
+        event_type = slot.request.event_type
+        if event_type not in compatible:
+            compatible[event_type] = len(_compatible_facilities(facilities, event_type))
+        choices += compatible[event_type]
+    return min(max(choices * SECONDS_PER_CHOICE, MIN_TIME_LIMIT), MAX_TIME_LIMIT)
+
+
+def _share_absolute_gap(components: list[SolverComponent], options: SolverOptions, total_slots: int) -> None:
+    """Split options.absolute_gap across components in proportion to their slot counts.
+
+    The objective is a sum of component objectives, so the shares add up to the
+    run's gap. (A relative gap needs no splitting — it holds for the sum if it
+    holds for every part.)
+    """
+    if options.absolute_gap is None:
+        return
+    for comp in components:
+        comp.absolute_gap = options.absolute_gap * len(comp.slots) / total_slots
+
+
+def _dump_prefix(date_from: date, date_until: date) -> str:
+    """Path prefix shared by one run's model dumps: <SOLVER_DUMP_DIR>/<from>_<until>_<timestamp>."""
+    dump_dir = settings.SOLVER_DUMP_DIR
+    os.makedirs(dump_dir, exist_ok=True)
+    stamp = timezone.localtime().strftime('%Y%m%dT%H%M%S%f')
+    return os.path.join(dump_dir, f'{date_from}_{date_until}_{stamp}')
+
+
+def _assign_dump_paths(components: list[SolverComponent], prefix: str | None, first: int) -> None:
+    """Number components across windows so each dump gets its own file."""
+    if prefix is None:
+        return
+    for n, comp in enumerate(components, start=first):
+        comp.dump_path = f'{prefix}-c{n}'
+
+
+def _diagnose(components: list[SolverComponent], results: list[ComponentResult], facilities: list,
+              epoch: date, options: SolverOptions) -> dict:
+    """Explain every INFEASIBLE component with a minimal set of conflicting requests and events."""
+    infeasible = [comp for comp, r in zip(components, results) if r.status == 'INFEASIBLE']
+    conflicts = {'requests': [], 'events': []}
+    deadline = perf_counter() + DIAGNOSIS_TIMEOUT
+    for n, comp in enumerate(infeasible):
+        share = (deadline - perf_counter()) / (len(infeasible) - n)
+        diagnosis = _solve_component(comp, facilities, epoch, options,
+                                     max(share, MIN_COMPONENT_TIMEOUT), diagnose=True)
+        for kind, key in diagnosis.conflict:
+            conflicts[f'{kind}s'].append(key)
+    return conflicts
+
+
 def models_q_fixed_or_published():
     """Return a Q object for fixed or published events."""
     return Q(is_fixed=True) | Q(status='published')
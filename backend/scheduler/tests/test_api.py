@@ -1,10 +1,17 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
 from django.utils import timezone
-from datetime import timedelta, date, time
+from datetime import timedelta, date, datetime, time
+from io import StringIO
+from unittest import mock
+import threading
 
-from scheduler.models import Facility, Team, Event, BookingRequest, UserProfile
+from scheduler.models import Facility, Team, Event, BookingRequest, UserProfile, SolveJob
+from scheduler.jobs import STALE_JOB_ERROR, _get_executor, _watch_job, fail_stale_jobs
+from scheduler.solver import SolveProgress
 
 
 class AuthenticatedAPITestCase(APITestCase):
@@ -127,8 +134,9 @@ class BookingRequestAPITestCase(AuthenticatedAPITestCase):
         self.assertEqual(BookingRequest.objects.count(), 1)
 
 
+@override_settings(SOLVE_JOB_RUNNER='inline')
 class GenerateScheduleAPITestCase(AuthenticatedAPITestCase):
-    """Tests for POST /api/schedule/generate/ endpoint."""
+    """Tests for POST /api/schedule/generate/ endpoint (solve jobs run inline)."""
 
     def setUp(self):
         super().setUp()
@@ -156,15 +164,17 @@ class GenerateScheduleAPITestCase(AuthenticatedAPITestCase):
         )
 
     def test_generate_schedule(self):
-        """POST /api/schedule/generate/ should return success with events created."""
+        """POST /api/schedule/generate/ should return a finished job with events created."""
         response = self.client.post('/api/schedule/generate/', {
             'date_from': str(self.date_from),
             'date_until': str(self.date_until),
         }, format='json')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(response.data['success'])
-        self.assertGreater(response.data['events_created'], 0)
-        self.assertIn('schedule_diff', response.data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'succeeded')
+        result = response.data['result']
+        self.assertTrue(result['success'])
+        self.assertGreater(result['events_created'], 0)
+        self.assertIn('schedule_diff', result)
 
     def test_generate_returns_diff_shape(self):
         """Each schedule_diff entry should have required keys."""
@@ -172,9 +182,10 @@ class GenerateScheduleAPITestCase(AuthenticatedAPITestCase):
             'date_from': str(self.date_from),
             'date_until': str(self.date_until),
         }, format='json')
-        self.assertTrue(response.data['success'])
+        result = response.data['result']
+        self.assertTrue(result['success'])
 
-        diff = response.data['schedule_diff']
+        diff = result['schedule_diff']
         self.assertGreater(len(diff), 0)
 
         required_keys = [
@@ -185,11 +196,306 @@ class GenerateScheduleAPITestCase(AuthenticatedAPITestCase):
         for key in required_keys:
             self.assertIn(key, diff[0], f"Missing key: {key}")
 
+    def test_regenerate_updates_only_changed_events(self):
+        """A re-run should keep unchanged proposals and update moved ones in place, not recreate them."""
+        body = {'date_from': str(self.date_from), 'date_until': str(self.date_until)}
+        first = self.client.post('/api/schedule/generate/', body, format='json').data['result']
+        event = Event.objects.get(status='proposed')
+        self.assertEqual(first['event_changes'], {'created': 1, 'updated': 0, 'unchanged': 0, 'deleted': 0})
+
+        again = self.client.post('/api/schedule/generate/', body, format='json').data['result']
+        self.assertEqual(again['event_changes'], {'created': 0, 'updated': 0, 'unchanged': 1, 'deleted': 0})
+
+        BookingRequest.objects.update(preferred_time_start=time(19, 0))
+        moved = self.client.post('/api/schedule/generate/', body, format='json').data['result']
+        self.assertEqual(moved['event_changes'], {'created': 0, 'updated': 1, 'unchanged': 0, 'deleted': 0})
+        self.assertEqual(Event.objects.get(status='proposed').id, event.id)
+        self.assertEqual(timezone.localtime(Event.objects.get(id=event.id).start_time).hour, 19)
+
+    def test_regenerate_reuses_legacy_proposals(self):
+        """A proposal without a booking request should be matched on team, title and date, not deleted."""
+        body = {'date_from': str(self.date_from), 'date_until': str(self.date_until)}
+        self.client.post('/api/schedule/generate/', body, format='json')
+        Event.objects.filter(status='proposed').update(booking_request=None)
+        event = Event.objects.get(status='proposed')
+
+        again = self.client.post('/api/schedule/generate/', body, format='json').data['result']
+        self.assertEqual(again['event_changes'], {'created': 0, 'updated': 1, 'unchanged': 0, 'deleted': 0})
+        self.assertEqual(Event.objects.get(status='proposed').id, event.id)
+        self.assertIsNotNone(Event.objects.get(id=event.id).booking_request_id)
+
+    def test_generate_rolling_horizon(self):
+        """window_days should solve the range as rolling windows and report the window count."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'window_days': 3,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        result = response.data['result']
+        self.assertTrue(result['success'])
+        self.assertEqual(result['windows'], 3)
+        self.assertEqual(result['events_created'], 1)
+
+    def test_generate_rejects_unplaceable_request(self):
+        """A request no facility can host should be rejected with a reason, not fail the run."""
+        gym_request = BookingRequest.objects.create(
+            team=self.team, title='U14 Gym', event_type='gym_session',
+            duration_minutes=60, recurrence='weekly', preferred_days=['monday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=1, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+        }, format='json')
+        result = response.data['result']
+        self.assertTrue(result['success'])
+        self.assertEqual(result['events_created'], 1)
+        self.assertEqual(result['requests_rejected'], 1)
+        self.assertEqual(result['unscheduled'][0]['request_id'], gym_request.id)
+
+        gym_request.refresh_from_db()
+        self.assertEqual(gym_request.status, 'rejected')
+        self.assertIn('2026-03-16', gym_request.rejection_reason)
+
+    def test_generate_infeasible_reports_conflicts(self):
+        """An all-or-nothing run blocked by a fixed event should name the conflicting pair."""
+        fixed = Event.objects.create(
+            title='County Final (Fixed)',
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 17, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 22, 0)),
+            facility=self.facility, is_fixed=True, status='published',
+        )
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'allow_partial': False,
+        }, format='json')
+        result = response.data['result']
+        self.assertFalse(result['success'])
+        self.assertEqual(result['solver_status'], 'INFEASIBLE')
+        self.assertEqual([ev['id'] for ev in result['conflicts']['events']], [fixed.id])
+        self.assertEqual([r['title'] for r in result['conflicts']['requests']], ['U14 Training'])
+
+    def test_job_records_solutions(self):
+        """A finished job should keep the improving solutions found during the search."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'use_cache': False,
+        }, format='json')
+        self.assertGreater(len(response.data['solutions']), 0)
+        self.assertFalse(response.data['result']['stopped_early'])
+
+    def test_accept_running_job(self):
+        """Accepting a job that has not finished should flag it to stop early."""
+        job = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until, status='running')
+        response = self.client.post(f'/api/schedule/jobs/{job.id}/accept/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['stop_requested'])
+
+    def test_watcher_saves_solutions_and_passes_on_stop(self):
+        """The watcher thread, not the solver callback, should write solutions and stop the search."""
+        job = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until,
+                                      status='running', stop_requested=True)
+        progress = SolveProgress()
+        progress.solutions.append({'component': 1, 'objective': 40, 'bound': 0, 'elapsed': 0.1})
+        finished = mock.Mock(spec=threading.Event)
+        finished.wait.side_effect = [False, True]  # one poll, then the solve is done
+
+        with mock.patch('scheduler.jobs.connection'):  # keep the test's connection open
+            _watch_job(job.id, progress, finished)
+
+        job.refresh_from_db()
+        self.assertEqual(job.solutions, progress.solutions)
+        self.assertIn('latest penalty 40', job.progress)
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertTrue(progress.stopped)
+
+    def test_accept_finished_job(self):
+        """A finished job cannot be accepted early."""
+        job = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until, status='succeeded')
+        response = self.client.post(f'/api/schedule/jobs/{job.id}/accept/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generate_reports_timings_and_stats(self):
+        """The result should break the run down by phase and include model/search stats."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'use_cache': False,
+        }, format='json')
+        result = response.data['result']
+        for phase in ('query', 'generate_slots', 'build', 'search', 'extract', 'apply', 'schedule_diff'):
+            self.assertIn(phase, result['timings'])
+        for key in ('variables', 'intervals', 'no_overlaps', 'penalties', 'branches', 'conflicts', 'best_bound'):
+            self.assertIn(key, result['model_stats'])
+
+    def test_generate_invalid_window_days(self):
+        """A non-positive window_days should return 400."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'window_days': 0,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generate_invalid_time_granularity(self):
+        """A time_granularity that does not divide an hour should return 400."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'time_granularity': 7,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generate_invalid_gap_limits(self):
+        """A relative_gap of 1 or more, or a negative time_limit, should return 400."""
+        for field, value in (('relative_gap', 1.5), ('time_limit', -5), ('absolute_gap', 'lots')):
+            response = self.client.post('/api/schedule/generate/', {
+                'date_from': str(self.date_from),
+                'date_until': str(self.date_until),
+                field: value,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, field)
+
+    def test_generate_parses_string_flags(self):
+        """String flags such as "false" and "0" should switch options off; junk should return 400."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'use_cache': 'false',
+            'use_hints': '0',
+            'two_stage': 'true',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        options = SolveJob.objects.get(id=response.data['job_id']).options
+        self.assertFalse(options['use_cache'])
+        self.assertFalse(options['use_hints'])
+        self.assertTrue(options['two_stage'])
+        self.assertFalse(options['stability'])
+
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+            'stability': 'maybe',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_generate_missing_dates(self):
         """POST /api/schedule/generate/ without dates should return 400."""
         response = self.client.post('/api/schedule/generate/', {}, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_job_status_endpoint(self):
+        """GET /api/schedule/jobs/<id>/ should return the job and its stored result."""
+        job_id = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+        }, format='json').data['job_id']
+
+        response = self.client.get(f'/api/schedule/jobs/{job_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertTrue(response.data['result']['success'])
+        self.assertIsNotNone(response.data['finished_at'])
+
+    def test_job_status_not_found(self):
+        """Polling an unknown job should return 404."""
+        response = self.client.get('/api/schedule/jobs/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_thread_runner_fails_stale_running_jobs(self):
+        """Starting the job executor should fail running jobs whose worker stopped, not live ones."""
+        quiet = timezone.now() - timedelta(minutes=10)
+        stale = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until,
+                                        status='running', started_at=quiet, heartbeat_at=quiet)
+        live = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until,
+                                       status='running', started_at=quiet, heartbeat_at=timezone.now())
+
+        with mock.patch('scheduler.jobs._executor', None):
+            _get_executor()
+
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual(stale.error, STALE_JOB_ERROR)
+        self.assertIsNotNone(stale.finished_at)
+        self.assertEqual(live.status, 'running')
+
+    def test_stale_sweep_skips_inline_jobs(self):
+        """An inline job has no heartbeat, so a long inline solve must not be failed by the sweep."""
+        quiet = timezone.now() - timedelta(minutes=10)
+        inline = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until, runner='inline',
+                                         status='running', started_at=quiet, heartbeat_at=quiet)
+
+        self.assertEqual(fail_stale_jobs(), 0)
+        inline.refresh_from_db()
+        self.assertEqual(inline.status, 'running')
+
+    @override_settings(SOLVE_JOB_RUNNER='command')
+    def test_command_runner_processes_queue(self):
+        """With the command runner, jobs stay queued until run_solve_jobs picks them up."""
+        response = self.client.post('/api/schedule/generate/', {
+            'date_from': str(self.date_from),
+            'date_until': str(self.date_until),
+        }, format='json')
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(Event.objects.filter(status='proposed').count(), 0)
+        quiet = timezone.now() - timedelta(minutes=10)
+        stale = SolveJob.objects.create(date_from=self.date_from, date_until=self.date_until,
+                                        status='running', started_at=quiet, heartbeat_at=quiet)
+
+        call_command('run_solve_jobs', '--once', stdout=StringIO())
+        job = SolveJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, 'succeeded')
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertGreater(Event.objects.filter(status='proposed').count(), 0)
+
+
+class IncrementalScheduleAPITestCase(AuthenticatedAPITestCase):
+    """Tests for POST /api/schedule/incremental/ endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="U14 Hurling")
+        self.request = BookingRequest.objects.create(
+            team=self.team,
+            title='U14 Training',
+            event_type='juvenile_training',
+            duration_minutes=60,
+            recurrence='weekly',
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0),
+            preferred_time_end=time(21, 0),
+            priority=2,
+            schedule_from=date(2026, 3, 16),
+            schedule_until=date(2026, 3, 22),
+        )
+
+    def test_incremental_schedules_request(self):
+        """Incremental re-solve should create the request's events and mark it scheduled."""
+        response = self.client.post('/api/schedule/incremental/', {
+            'request_id': self.request.id,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['success'])
+        self.assertEqual(response.data['events_created'], 1)
+        self.assertEqual(Event.objects.filter(status='proposed', booking_request=self.request).count(), 1)
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'scheduled')
+
+    def test_incremental_unknown_request(self):
+        """An unknown request_id should return 404."""
+        response = self.client.post('/api/schedule/incremental/', {'request_id': 999}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class PublishScheduleAPITestCase(AuthenticatedAPITestCase):
     """Tests for POST /api/schedule/publish/ endpoint."""
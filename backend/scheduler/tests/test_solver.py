@@ -1,9 +1,27 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
 from django.utils import timezone
 from datetime import date, time, timedelta, datetime
+import csv
+import json
+import os
+import pickle
+import tempfile
+from contextlib import nullcontext
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from ortools.sat.python import cp_model
 
 from scheduler.models import Facility, Team, Event, BookingRequest
-from scheduler.solver import solve_schedule
+from scheduler.solver import (
+    solve_schedule, solve_incremental, SolveProgress, SolverOptions, SlotTable, NO_FACILITY_REASON,
+    NO_ROOM_REASON, UNSCHEDULED_PENALTY, MIN_TIME_LIMIT, MAX_TIME_LIMIT, SECONDS_PER_CHOICE, _default_time_limit,
+    _slot_table, _solve_component, load_snapshot, solve_snapshot, RequestRecord, TeamRecord, SolverComponent,
+)
 
 
 class SolverBasicTestCase(TestCase):
@@ -83,6 +101,106 @@ class SolverBasicTestCase(TestCase):
         self.assertEqual(result.status, 'INFEASIBLE')
 
 
+class SolverSlotTableTestCase(TestCase):
+    """Tests for the array-backed slot table and its SlotInstance views."""
+
+    def test_slots_are_generated_as_columns(self):
+        """Weekly runs expand per weekday and week; a one-time request takes its first matching day."""
+        team = Team.objects.create(name="Senior Men")
+        date_from = date(2026, 3, 16)  # a Monday
+        window = dict(team=team, event_type='adult_training', preferred_time_start=time(18, 0),
+                      preferred_time_end=time(21, 0), schedule_from=date_from, schedule_until=date(2026, 4, 5))
+        weekly = BookingRequest.objects.create(title="Training", duration_minutes=90, recurrence='weekly',
+                                               preferred_days=['tuesday', 'thursday'], **window)
+        once = BookingRequest.objects.create(title="Meeting", duration_minutes=60, recurrence='once',
+                                             preferred_days=['friday', 'monday'], **window)
+
+        table = _slot_table([weekly, once], date_from, date(2026, 4, 5), date_from)
+
+        self.assertEqual(table.day.tolist(), [1, 8, 15, 3, 10, 17, 4])
+        self.assertEqual(table.request_idx.tolist(), [0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(table.duration.tolist(), [90] * 6 + [60])
+        slot = table.views()[-1]
+        self.assertEqual((slot.request, slot.target_date, slot.day_start_offset), (once, date(2026, 3, 20), 4 * 1440))
+        self.assertEqual((slot.time_start_min, slot.time_end_min), (18 * 60, 21 * 60))
+        self.assertIsNone(slot.hint_start)
+        slot.hint_start = 4 * 1440 + 18 * 60
+        self.assertEqual(table.views()[-1].hint_start, 4 * 1440 + 18 * 60)
+
+    def test_pickled_component_holds_only_its_rows(self):
+        """A component sent to a worker process should not drag the whole season's table along."""
+        team = TeamRecord(1, 'Senior', None, None, True)
+        requests = [
+            RequestRecord(i, 1, team, f'Session {i}', 'adult_training', 2, 60, 'weekly', None,
+                          ('monday', 'wednesday', 'friday'), time(18, 0), time(21, 0), None,
+                          date(2026, 1, 1), date(2026, 12, 31))
+            for i in range(300)
+        ]
+        slots = _slot_table(requests, date(2026, 1, 1), date(2026, 12, 31), date(2026, 1, 1)).views()
+        own = [slot for slot in slots if slot.request.id == 7]
+        own[0].free_starts = {0: [[18 * 60, 19 * 60]]}
+
+        packed = pickle.dumps(SolverComponent(slots=own, facility_indices={0}, team_ids={1}))
+
+        self.assertEqual((len(slots), len(own)), (46800, 156))
+        self.assertLess(len(packed), 50_000)
+        restored = pickle.loads(packed).slots
+        self.assertEqual(len(restored[0].table), 156)
+        self.assertEqual([s.target_date for s in restored], [s.target_date for s in own])
+        self.assertEqual(restored[0].request, requests[7])
+        self.assertEqual(restored[0].free_starts, {0: [[18 * 60, 19 * 60]]})
+
+
+class SolverSnapshotTestCase(TestCase):
+    """Tests for solving a picklable SolverSnapshot decoupled from the ORM."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch", suitable_for=['adult_training', 'match'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior", usual_time=time(19, 0))
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 29)
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        Event.objects.create(
+            title="League Match", event_type='match', facility=self.facility,
+            start_time=timezone.make_aware(datetime(2026, 3, 17, 18, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 17, 19, 30)),
+            is_fixed=True, status='published',
+        )
+
+    def test_snapshot_loads_in_one_query_per_input(self):
+        """Facilities, requests with teams, fixed events and hint events take one query each."""
+        with self.assertNumQueries(4):
+            snapshot = load_snapshot(self.date_from, self.date_until)
+        with self.assertNumQueries(3):
+            load_snapshot(self.date_from, self.date_until, use_hints=False)
+
+        self.assertEqual(len(snapshot.requests), 1)
+        self.assertEqual(snapshot.requests[0].team.usual_time, time(19, 0))
+        self.assertEqual(len(snapshot.fixed_events), 1)
+
+    def test_pickled_snapshot_solves_without_database(self):
+        """A snapshot should survive pickling and solve to the same schedule with no queries."""
+        options = SolverOptions(use_cache=False)
+        expected = solve_schedule(self.date_from, self.date_until, options)
+        snapshot = pickle.loads(pickle.dumps(load_snapshot(self.date_from, self.date_until)))
+
+        with self.assertNumQueries(0):
+            result = solve_snapshot(snapshot, options)
+
+        self.assertEqual(result.status, 'OPTIMAL')
+        self.assertEqual(result.events, expected.events)
+        tuesday = next(ev for ev in result.events if ev['start_time'].date() == date(2026, 3, 17))
+        self.assertGreaterEqual(tuesday['start_time'].time(), time(19, 30))
+
+
 class SolverHardConstraintTestCase(TestCase):
     """Tests verifying hard constraint enforcement (HC1-HC7)."""
 
@@ -327,3 +445,1033 @@ class SolverSoftConstraintTestCase(TestCase):
             # Should be within 18:00-19:30 window
             self.assertGreaterEqual(start_total, 18 * 60)
             self.assertLessEqual(start_total + 60, 19 * 60 + 30)
+
+
+class SolverDecompositionTestCase(TestCase):
+    """Tests for splitting the model into independent facility/team components."""
+
+    def setUp(self):
+        self.pitch = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.gym = Facility.objects.create(
+            name="Gym", type="gym",
+            suitable_for=['gym_session'],
+        )
+        self.team = Team.objects.create(name="U14 Hurling", age_group="U14")
+        self.team2 = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+
+    def _create_request(self, team, title, event_type, days):
+        return BookingRequest.objects.create(
+            team=team, title=title, event_type=event_type,
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=days,
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_disjoint_facilities_and_teams_split(self):
+        """Requests sharing no facility and no team should be solved as separate components."""
+        self._create_request(self.team, "U14 Training", "juvenile_training", ['wednesday'])
+        self._create_request(self.team2, "Senior Gym", "gym_session", ['wednesday'])
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.components, 2)
+        self.assertEqual(len(result.events), 2)
+
+    def test_shared_team_joins_components(self):
+        """A team with pitch and gym requests links both facilities into one component (HC3)."""
+        self._create_request(self.team, "U14 Training", "juvenile_training", ['wednesday'])
+        self._create_request(self.team, "U14 Gym", "gym_session", ['wednesday'])
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.components, 1)
+        events = {ev['event_type']: ev for ev in result.events}
+        training, gym = events['juvenile_training'], events['gym_session']
+        self.assertFalse(
+            training['start_time'] < gym['end_time'] and gym['start_time'] < training['end_time'],
+            "HC3 violated: team double-booked across components",
+        )
+
+    def test_parallel_workers_match_sequential(self):
+        """Solving components in a process pool should give the same schedule quality."""
+        self._create_request(self.team, "U14 Training", "juvenile_training", ['wednesday'])
+        self._create_request(self.team2, "Senior Gym", "gym_session", ['wednesday'])
+        sequential = solve_schedule(self.date_from, self.date_until, SolverOptions(workers=1))
+        parallel = solve_schedule(self.date_from, self.date_until, SolverOptions(workers=2))
+
+        self.assertTrue(parallel.success)
+        self.assertEqual(parallel.status, sequential.status)
+        self.assertEqual(parallel.penalty, sequential.penalty)
+        self.assertEqual(len(parallel.events), len(sequential.events))
+
+
+class SolverRollingHorizonTestCase(TestCase):
+    """Tests for solving long ranges as a rolling horizon of date windows."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)   # Monday
+        self.date_until = date(2026, 4, 5)   # Sunday, 3 weeks later
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=90, recurrence='weekly',
+            preferred_facility=self.facility,
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_weekly_windows_match_full_solve(self):
+        """Week-by-week windows should schedule every occurrence with the same penalty."""
+        full = solve_schedule(self.date_from, self.date_until)
+        rolling = solve_schedule(self.date_from, self.date_until, SolverOptions(window_days=7))
+
+        self.assertTrue(rolling.success)
+        self.assertEqual(rolling.windows, 3)
+        self.assertEqual(len(rolling.events), 6)
+        self.assertEqual(rolling.penalty, full.penalty)
+
+    def test_concurrent_windows(self):
+        """Windows solved together should produce the same events as in-order windows."""
+        result = solve_schedule(
+            self.date_from, self.date_until,
+            SolverOptions(window_days=7, concurrent_windows=True),
+        )
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.windows, 3)
+        self.assertEqual(result.components, 3)
+        self.assertEqual(len(result.events), 6)
+
+    def test_fixed_event_respected_in_later_window(self):
+        """HC2: a fixed event in the last window should still block its facility."""
+        fixed_start = timezone.make_aware(datetime(2026, 4, 2, 18, 0))
+        fixed_end = timezone.make_aware(datetime(2026, 4, 2, 21, 0))
+        Event.objects.create(
+            title="County Match (Fixed)",
+            start_time=fixed_start, end_time=fixed_end,
+            facility=self.facility, is_fixed=True, status='published',
+        )
+        result = solve_schedule(self.date_from, self.date_until,
+                                SolverOptions(window_days=7, allow_partial=False))
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.status, 'INFEASIBLE')
+
+        partial = solve_schedule(self.date_from, self.date_until, SolverOptions(window_days=7))
+        self.assertTrue(partial.success)
+        self.assertEqual(len(partial.events), 5)
+        self.assertEqual([u['date'] for u in partial.unscheduled], [date(2026, 4, 2)])
+
+
+class SolverWarmStartTestCase(TestCase):
+    """Tests for warm-starting CP-SAT from previous placements (solution hints)."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.facility2 = Facility.objects.create(
+            name="Training Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.request = BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_previous_proposal_used_as_hint(self):
+        """A previous proposed event for the same request/date should become a hint."""
+        Event.objects.create(
+            title="Senior Training",
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 19, 30)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 20, 30)),
+            facility=self.facility2, team=self.team,
+            event_type='adult_training', status='proposed',
+        )
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.hints_added, 1)
+        self.assertLessEqual(result.hints_kept, result.hints_added)
+        self.assertEqual(result.penalty, 0)
+
+    def test_usual_time_fallback_hint(self):
+        """With no previous events, the team's usual time/facility should seed the hint."""
+        self.team.usual_time = time(18, 30)
+        self.team.usual_facility = self.facility
+        self.team.save()
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.hints_added, 1)
+
+    def test_stability_keeps_previous_placement(self):
+        """With stability, a previous proposal should stay put rather than move for a small preference."""
+        self.team.usual_time = time(18, 0)
+        self.team.save()
+        BookingRequest.objects.filter(id=self.request.id).update(priority=1)
+        Event.objects.create(
+            title="Senior Training",
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 19, 30)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 20, 30)),
+            facility=self.facility2, team=self.team,
+            event_type='adult_training', status='proposed',
+        )
+
+        moved = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+        stable = solve_schedule(self.date_from, self.date_until,
+                                SolverOptions(use_cache=False, use_hints=False, stability=True))
+
+        self.assertEqual(moved.events[0]['start_time'], datetime(2026, 3, 18, 18, 0))
+        self.assertEqual(stable.status, 'OPTIMAL')
+        self.assertEqual(stable.events[0]['start_time'], datetime(2026, 3, 18, 19, 30))
+        self.assertEqual(stable.events[0]['facility_id'], self.facility2.id)
+
+    def test_hints_disabled(self):
+        """use_hints=False should solve cold."""
+        self.team.usual_time = time(18, 30)
+        self.team.save()
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_hints=False))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.hints_added, 0)
+
+
+class SolverPatternModeTestCase(TestCase):
+    """Tests for weekly pattern decisions shared across every week of a request."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.facility2 = Facility.objects.create(
+            name="Training Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)   # Monday
+        self.date_until = date(2026, 4, 5)   # 3 weeks
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=90, recurrence='weekly',
+            preferred_facility=self.facility,
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_same_slot_every_week(self):
+        """Every week of a pattern should land on the same time of day and facility."""
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(pattern_mode=True))
+
+        self.assertTrue(result.success)
+        self.assertEqual(len(result.events), 3)
+        self.assertEqual(len({ev['start_time'].time() for ev in result.events}), 1)
+        self.assertEqual(len({ev['facility_id'] for ev in result.events}), 1)
+        self.assertEqual(result.penalty, 0)
+
+    def test_fixed_event_week_is_exception(self):
+        """A week blocked by a fixed event should move on its own without shifting the others."""
+        Event.objects.create(
+            title="County Match (Fixed)",
+            start_time=timezone.make_aware(datetime(2026, 3, 25, 17, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 25, 22, 0)),
+            facility=self.facility, is_fixed=True, status='published',
+        )
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(pattern_mode=True))
+
+        self.assertTrue(result.success)
+        self.assertEqual(len(result.events), 3)
+        by_date = {ev['start_time'].date(): ev for ev in result.events}
+        self.assertEqual(by_date[date(2026, 3, 25)]['facility_id'], self.facility2.id)
+        self.assertEqual(by_date[date(2026, 3, 18)]['facility_id'], self.facility.id)
+        self.assertEqual(by_date[date(2026, 4, 1)]['facility_id'], self.facility.id)
+
+
+class SolverTimeGridTestCase(TestCase):
+    """Tests for restricting start times to a coarse time grid."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_facility=self.facility,
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_starts_on_quarter_hours(self):
+        """With a 15-minute grid, an off-grid fixed event is snapped outwards and starts stay on the grid."""
+        Event.objects.create(
+            title="County Match (Fixed)",
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 17, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 18, 7)),
+            facility=self.facility, is_fixed=True, status='published',
+        )
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(time_granularity=15))
+
+        self.assertTrue(result.success)
+        start = result.events[0]['start_time']
+        self.assertEqual(start.minute % 15, 0)
+        self.assertGreaterEqual(start.time(), time(18, 15))
+
+    def test_window_narrower_than_grid(self):
+        """A window with no grid point should still be schedulable at its earliest start."""
+        BookingRequest.objects.update(
+            preferred_time_start=time(18, 10), preferred_time_end=time(19, 20),
+        )
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(time_granularity=30))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.events[0]['start_time'].time(), time(18, 10))
+
+
+class SolverResultCacheTestCase(TestCase):
+    """Tests for serving identical re-runs from the solver result cache."""
+
+    def setUp(self):
+        caches[settings.SOLVER_CACHE_ALIAS].clear()
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.request = BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_identical_rerun_is_cached(self):
+        """Solving the same inputs twice should return the cached result the second time."""
+        first = solve_schedule(self.date_from, self.date_until)
+        second = solve_schedule(self.date_from, self.date_until)
+
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.events, first.events)
+        self.assertEqual(second.solve_time, sum(second.timings.values()))  # the lookup, not the original solve
+
+        second.events.clear()  # callers get a copy, not the cache entry
+        self.assertEqual(solve_schedule(self.date_from, self.date_until).events, first.events)
+
+    def test_changed_input_misses_cache(self):
+        """Editing a pending request should change the fingerprint and force a fresh solve."""
+        solve_schedule(self.date_from, self.date_until)
+        BookingRequest.objects.filter(id=self.request.id).update(duration_minutes=90)
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertFalse(result.cached)
+        event = result.events[0]
+        self.assertEqual(event['end_time'] - event['start_time'], timedelta(minutes=90))
+
+    def test_unread_field_change_keeps_cache(self):
+        """Renaming a team changes nothing the solver reads, so the cached result should stand."""
+        solve_schedule(self.date_from, self.date_until)
+        Team.objects.filter(id=self.team.id).update(name="Senior Hurling")
+        self.assertTrue(solve_schedule(self.date_from, self.date_until).cached)
+
+    def test_cache_can_be_bypassed(self):
+        """use_cache=False should always solve afresh."""
+        solve_schedule(self.date_from, self.date_until)
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+        self.assertFalse(result.cached)
+
+
+class SolverInstrumentationTestCase(TestCase):
+    """Tests for per-phase timings and model/search stats on SolverResult."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_model_size_stats(self):
+        """Two slots on one facility on different days: four intervals, no no-overlap needed."""
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.stats['intervals'], 4)
+        self.assertEqual(result.stats['no_overlaps'], 0)
+        self.assertGreater(result.stats['variables'], 0)
+        self.assertLessEqual(result.stats['best_bound'], result.penalty)
+        for phase in ('query', 'generate_slots', 'hints', 'decompose', 'build', 'search', 'extract', 'solve'):
+            self.assertGreaterEqual(result.timings[phase], 0.0)
+
+    def test_no_overlaps_are_partitioned_by_day(self):
+        """Only slots sharing a calendar day share a facility/team no-overlap."""
+        other = Team.objects.create(name="Senior Women", age_group="Senior")
+        BookingRequest.objects.create(
+            team=other, title="Women Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertTrue(result.success)
+        self.assertEqual(len(result.events), 4)
+        # Tuesday is the only day with two slots on the pitch; each team has one slot per day
+        self.assertEqual(result.stats['no_overlaps'], 1)
+
+    def test_lean_and_classic_models_agree(self):
+        """Both formulations reach the same optimum; the lean one without facility variables."""
+        Facility.objects.create(name="Back Pitch", type="pitch", suitable_for=['juvenile_training', 'adult_training'])
+        juniors = Team.objects.create(name="U12 Boys", age_group="U12", usual_time=time(19, 30))
+        BookingRequest.objects.create(
+            team=juniors, title="U12 Training", event_type='juvenile_training',
+            duration_minutes=60, recurrence='weekly', preferred_days=['tuesday'],
+            preferred_facility=self.facility,
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=3, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        lean = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+        classic = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False, lean_model=False))
+
+        self.assertEqual(lean.status, 'OPTIMAL')
+        self.assertEqual(classic.status, 'OPTIMAL')
+        self.assertEqual(lean.penalty, classic.penalty)
+        self.assertLess(lean.stats['variables'], classic.stats['variables'])
+
+    def test_fixed_events_are_pruned_and_merged(self):
+        """Back-to-back fixed events become one interval; one no slot can reach is left out."""
+        for start, end in ((17, 18), (18, 19), (8, 9)):
+            Event.objects.create(
+                title=f"Booking {start}:00", facility=self.facility, is_fixed=True, status='published',
+                start_time=timezone.make_aware(datetime(2026, 3, 17, start, 0)),
+                end_time=timezone.make_aware(datetime(2026, 3, 17, end, 0)),
+            )
+
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.stats['fixed_intervals'], 1)
+        self.assertEqual(result.stats['intervals'], 5)
+        tuesday = next(ev for ev in result.events if ev['start_time'].date() == date(2026, 3, 17))
+        self.assertGreaterEqual(tuesday['start_time'], datetime(2026, 3, 17, 19, 0))
+
+
+class SolverTimeLimitTestCase(TestCase):
+    """Tests for the model-size time budget, gap limits and the reported stop reason."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_default_budget_scales_with_model_size(self):
+        """The default budget grows with slot × facility choices, within its floor and cap."""
+        facilities = [self.facility, Facility(name="Pitch 2", type="pitch", suitable_for=['adult_training'])]
+        request = BookingRequest(event_type='adult_training')
+
+        def budget(num_slots):
+            slots = SlotTable(self.date_from, [request], *np.zeros((5, num_slots), dtype=np.int32)).views()
+            return _default_time_limit(slots, facilities)
+
+        self.assertEqual(budget(2), MIN_TIME_LIMIT)
+        self.assertAlmostEqual(budget(500), 1000 * SECONDS_PER_CHOICE)
+        self.assertEqual(budget(100_000), MAX_TIME_LIMIT)
+
+    def test_small_run_reports_optimal(self):
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertEqual(result.status, 'OPTIMAL')
+        self.assertEqual(result.stop_reason, 'optimal')
+        self.assertEqual(result.time_limit, MIN_TIME_LIMIT)
+
+    def test_explicit_limits_are_applied(self):
+        """A met gap limit is reported as FEASIBLE with stop_reason 'gap_limit', never as OPTIMAL."""
+        options = SolverOptions(use_cache=False, time_limit=7, relative_gap=0.9, absolute_gap=500)
+        result = solve_schedule(self.date_from, self.date_until, options)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.time_limit, 7)
+        self.assertIn(result.stop_reason, ('optimal', 'gap_limit'))
+        if result.stop_reason == 'gap_limit':
+            self.assertEqual(result.status, 'FEASIBLE')
+            self.assertGreater(result.penalty, result.stats['best_bound'])
+        else:
+            self.assertEqual(result.penalty, result.stats['best_bound'])
+
+
+class SolverGreedyTestCase(TestCase):
+    """Tests for the greedy constructive pass — quick draft mode and CP-SAT warm start."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['adult_training', 'match'],
+        )
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.draft = SolverOptions(use_cache=False, draft=True)
+
+    def _request(self, name, priority, start=time(16, 0), end=time(21, 0)):
+        return BookingRequest.objects.create(
+            team=Team.objects.create(name=name), title=f"{name} Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly', preferred_days=['wednesday'],
+            preferred_time_start=start, preferred_time_end=end,
+            priority=priority, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def _start(self, result, request):
+        return next(ev['start_time'] for ev in result.events if ev['request_id'] == request.id)
+
+    def test_draft_places_by_priority_around_warmup(self):
+        """Higher priority goes first; the next slot skips the match and its 15-min warmup."""
+        Event.objects.create(
+            title="League Match (Fixed)",
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 18, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 19, 30)),
+            facility=self.facility, event_type='match', is_fixed=True, status='published',
+        )
+        low = self._request("Junior Men", priority=1)
+        high = self._request("Senior Men", priority=3)
+
+        result = solve_schedule(self.date_from, self.date_until, self.draft)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.status, 'FEASIBLE')
+        self.assertEqual(result.stats, {})
+        self.assertEqual(self._start(result, high), datetime(2026, 3, 18, 16, 0))
+        self.assertEqual(self._start(result, low), datetime(2026, 3, 18, 19, 30))
+
+    def test_draft_leaves_out_unplaceable(self):
+        """Two requests for one hour: the lower priority is left out, or the draft fails when strict."""
+        self._request("Senior Men", priority=3, start=time(18, 0), end=time(19, 0))
+        low = self._request("Junior Men", priority=1, start=time(18, 0), end=time(19, 0))
+
+        result = solve_schedule(self.date_from, self.date_until, self.draft)
+        self.assertTrue(result.success)
+        self.assertEqual([(u['request_id'], u['reason']) for u in result.unscheduled], [(low.id, NO_ROOM_REASON)])
+
+        strict = SolverOptions(use_cache=False, draft=True, allow_partial=False)
+        result = solve_schedule(self.date_from, self.date_until, strict)
+        self.assertFalse(result.success)
+        self.assertEqual(result.status, 'UNKNOWN')
+
+    def test_greedy_hints_warm_start(self):
+        """Without previous placements every slot is hinted greedily; warm-start stats stay at zero."""
+        self._request("Senior Men", priority=3)
+        self._request("Junior Men", priority=1)
+
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False, use_hints=False))
+
+        self.assertEqual(result.status, 'OPTIMAL')
+        self.assertEqual(result.stats['greedy_hints'], 2)
+        self.assertEqual(result.hints_added, 0)
+
+
+class SolverPortfolioTestCase(TestCase):
+    """Tests for multi-seed portfolio solving across a process pool."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        for name in ("Senior Men", "Junior Men"):
+            BookingRequest.objects.create(
+                team=Team.objects.create(name=name), title=f"{name} Training", event_type='adult_training',
+                duration_minutes=60, recurrence='weekly', preferred_days=['tuesday', 'thursday'],
+                preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+                priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+            )
+
+    @override_settings(SOLVER_CORE_BUDGET=2)
+    def test_best_run_is_kept_and_every_run_reported(self):
+        single = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False, portfolio_runs=3))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.penalty, single.penalty)
+        self.assertEqual([run['run'] for run in result.portfolio], [0, 1, 2])
+        self.assertEqual([run['preset'] for run in result.portfolio], ['default', 'lp_heavy', 'core'])
+        self.assertEqual(sum(run['kept'] for run in result.portfolio), 1)
+        kept = next(run for run in result.portfolio if run['kept'])
+        self.assertEqual(kept['penalty'], result.penalty)
+
+    @override_settings(SOLVER_CORE_BUDGET=2)
+    def test_in_process_solve_stays_within_core_budget(self):
+        """Without a pool, CP-SAT should still search with at most SOLVER_CORE_BUDGET threads."""
+        with mock.patch('scheduler.solver._solve_component', wraps=_solve_component) as solve_component:
+            solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False, workers=1))
+
+        self.assertTrue(solve_component.called)
+        for call in solve_component.call_args_list:
+            self.assertEqual(call.args[5], 2)  # num_search_workers
+
+
+class SolverPartialSchedulingTestCase(TestCase):
+    """Tests for leaving unplaceable slots out instead of failing the whole run."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+
+    def _request(self, team, priority, event_type='adult_training'):
+        return BookingRequest.objects.create(
+            team=team, title=f"{team.name} Session", event_type=event_type,
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(19, 0),
+            priority=priority, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_lower_priority_is_left_out(self):
+        """Two requests for the only hour on the only pitch: the higher priority one is placed."""
+        high = self._request(Team.objects.create(name="Senior Men"), priority=3)
+        low = self._request(Team.objects.create(name="Junior Men"), priority=1)
+
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.requests_processed, {high.id})
+        self.assertEqual(len(result.unscheduled), 1)
+        self.assertEqual(result.unscheduled[0]['request_id'], low.id)
+        self.assertEqual(result.unscheduled[0]['reason'], NO_ROOM_REASON)
+
+        strict = solve_schedule(self.date_from, self.date_until, SolverOptions(allow_partial=False))
+        self.assertEqual(strict.status, 'INFEASIBLE')
+
+    def test_left_out_slot_pays_no_soft_penalties(self):
+        """Of two equal-priority requests that cannot both fit, the one with soft penalties is left out."""
+        # The usual time is outside the window, so a placed session always pays SC4
+        penalised = self._request(Team.objects.create(name="Senior Men", usual_time=time(20, 0)), priority=2)
+        clean = self._request(Team.objects.create(name="Junior Men"), priority=2)
+
+        for lean_model in (False, True):
+            result = solve_schedule(self.date_from, self.date_until,
+                                    SolverOptions(use_cache=False, lean_model=lean_model))
+
+            self.assertEqual(result.requests_processed, {clean.id}, lean_model)
+            self.assertEqual([u['request_id'] for u in result.unscheduled], [penalised.id], lean_model)
+            self.assertEqual(result.penalty, UNSCHEDULED_PENALTY * 2, lean_model)
+
+    def test_objective_is_rounded_not_truncated(self):
+        """CP-SAT's float objective and bound (x.999… with presence offsets) should be rounded."""
+        self._request(Team.objects.create(name="Senior Men"), priority=2)
+        self._request(Team.objects.create(name="Junior Men"), priority=2)
+
+        with mock.patch.object(cp_model.CpSolver, 'objective_value', new_callable=mock.PropertyMock,
+                               return_value=UNSCHEDULED_PENALTY * 2 - 4e-12), \
+                mock.patch.object(cp_model.CpSolver, 'best_objective_bound', new_callable=mock.PropertyMock,
+                                  return_value=UNSCHEDULED_PENALTY * 2 - 1e-6):
+            result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertEqual(result.penalty, UNSCHEDULED_PENALTY * 2)
+        # A bound a hair below the objective is still a proof of optimality, not a met gap limit
+        self.assertEqual(result.status, 'OPTIMAL')
+        self.assertEqual(result.stop_reason, 'optimal')
+        self.assertEqual(result.stats['best_bound'], UNSCHEDULED_PENALTY * 2)
+
+    def test_negative_bound_is_clamped_at_zero(self):
+        """A time-limited bound below the presence offsets should be reported as 0, not negative."""
+        self._request(Team.objects.create(name="Senior Men"), priority=2)
+
+        with mock.patch.object(cp_model.CpSolver, 'best_objective_bound', new_callable=mock.PropertyMock,
+                               return_value=-UNSCHEDULED_PENALTY / 2):
+            result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertEqual(result.stats['best_bound'], 0)
+
+    def test_left_out_slot_pays_no_stability_penalty(self):
+        """With stability, leaving a slot out should cost UNSCHEDULED_PENALTY only, not a move."""
+        # The previous proposal's 18:30 start is outside the window, so placing it again moves it
+        moved = self._request(Team.objects.create(name="Senior Men"), priority=2)
+        kept = self._request(Team.objects.create(name="Junior Men"), priority=2)
+        Event.objects.create(
+            title=moved.title, team=moved.team, facility=self.facility,
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 18, 30)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 19, 30)),
+            event_type='adult_training', status='proposed',
+        )
+
+        result = solve_schedule(self.date_from, self.date_until,
+                                SolverOptions(use_cache=False, use_hints=False, stability=True))
+
+        self.assertEqual(result.requests_processed, {kept.id})
+        self.assertEqual(result.penalty, UNSCHEDULED_PENALTY * 2)
+
+    def test_two_stage_matches_weighted_optimum(self):
+        """Two-stage mode should place the same requests at the same penalty as one weighted objective."""
+        high = self._request(Team.objects.create(name="Senior Men"), priority=3)
+        self._request(Team.objects.create(name="Junior Men"), priority=1)
+
+        weighted = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+        two_stage = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False, two_stage=True))
+
+        self.assertEqual(two_stage.status, 'OPTIMAL')
+        self.assertEqual(two_stage.requests_processed, {high.id})
+        self.assertEqual(two_stage.penalty, weighted.penalty)
+        self.assertEqual(len(two_stage.unscheduled), 1)
+
+    def test_no_compatible_facility_is_reported(self):
+        """A slot no facility can host (HC7) should be reported with its own reason."""
+        gym = self._request(Team.objects.create(name="Senior Men"), priority=2, event_type='gym_session')
+
+        result = solve_schedule(self.date_from, self.date_until)
+
+        self.assertEqual(result.events, [])
+        self.assertEqual(result.unscheduled,
+                         [{'request_id': gym.id, 'date': date(2026, 3, 18), 'reason': NO_FACILITY_REASON}])
+
+
+class SolverPresolveTestCase(TestCase):
+    """Tests for shrinking slot domains to the time fixed events leave free."""
+
+    def setUp(self):
+        self.pitches = [
+            Facility.objects.create(name=f"Pitch {n}", type="pitch",
+                                    suitable_for=['match', 'adult_training'])
+            for n in (1, 2)
+        ]
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.request = BookingRequest.objects.create(
+            team=Team.objects.create(name="Senior Men"), title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly', preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(19, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def _fixed(self, facility, start_hour, event_type='adult_training'):
+        start = timezone.make_aware(datetime(2026, 3, 18, start_hour, 0))
+        return Event.objects.create(title="County Booking", start_time=start, end_time=start + timedelta(hours=1),
+                                    facility=facility, event_type=event_type, is_fixed=True, status='published')
+
+    def test_blocked_facility_is_pruned(self):
+        """The only hour is taken on pitch 1, so the slot is only offered pitch 2."""
+        self._fixed(self.pitches[0], 18)
+
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertEqual(result.stats['pruned_choices'], 1)
+        self.assertEqual(result.stats['unfit_slots'], 0)
+        self.assertEqual([ev['facility_id'] for ev in result.events], [self.pitches[1].id])
+
+    def test_unfit_slot_is_reported_without_a_solve(self):
+        """Pitch 1 is booked and pitch 2's match warmup starts at 18:45 — there is no room at all."""
+        self._fixed(self.pitches[0], 18)
+        self._fixed(self.pitches[1], 19, event_type='match')
+
+        result = solve_schedule(self.date_from, self.date_until, SolverOptions(use_cache=False))
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.components, 0)
+        self.assertEqual(result.stats['unfit_slots'], 1)
+        self.assertEqual(result.penalty, UNSCHEDULED_PENALTY * 2)
+        self.assertEqual(result.unscheduled,
+                         [{'request_id': self.request.id, 'date': date(2026, 3, 18), 'reason': NO_ROOM_REASON}])
+
+
+class SolverDiagnosisTestCase(TestCase):
+    """Tests for explaining INFEASIBLE runs with a minimal conflicting set."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.strict = SolverOptions(allow_partial=False, use_cache=False)
+
+    def _request(self, name, day='wednesday', start=time(18, 0), end=time(19, 0)):
+        return BookingRequest.objects.create(
+            team=Team.objects.create(name=name), title=f"{name} Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly', preferred_days=[day],
+            preferred_time_start=start, preferred_time_end=end,
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_conflicting_requests_are_isolated(self):
+        """Only the two requests fighting over the same hour should be reported."""
+        first = self._request("Senior Men")
+        second = self._request("Junior Men")
+        self._request("Minor Men", start=time(17, 0), end=time(21, 0))
+        self._request("Masters", day='thursday')
+
+        result = solve_schedule(self.date_from, self.date_until, self.strict)
+
+        self.assertEqual(result.status, 'INFEASIBLE')
+        self.assertEqual(sorted(result.conflicts['requests']), sorted([first.id, second.id]))
+        self.assertEqual(result.conflicts['events'], [])
+
+    def test_fixed_event_in_conflict(self):
+        """A request blocked by a fixed event should report both."""
+        blocked = self._request("Senior Men")
+        fixed = Event.objects.create(
+            title="County Match (Fixed)",
+            start_time=timezone.make_aware(datetime(2026, 3, 18, 18, 0)),
+            end_time=timezone.make_aware(datetime(2026, 3, 18, 19, 0)),
+            facility=self.facility, is_fixed=True, status='published',
+        )
+
+        result = solve_schedule(self.date_from, self.date_until, self.strict)
+
+        self.assertEqual(result.conflicts, {'requests': [blocked.id], 'events': [fixed.id]})
+
+
+class SolverProgressTestCase(TestCase):
+    """Tests for streaming improving solutions and accepting one early."""
+
+    def setUp(self):
+        caches[settings.SOLVER_CACHE_ALIAS].clear()
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="U12 Boys", age_group="U12", usual_time=time(18, 0))
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        BookingRequest.objects.create(
+            team=self.team, title="U12 Training", event_type='juvenile_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(17, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_solutions_are_streamed(self):
+        """Every improving solution should be recorded, ending with the final objective."""
+        seen = []
+        progress = SolveProgress(on_solution=seen.append)
+        result = solve_schedule(self.date_from, self.date_until, progress=progress)
+
+        self.assertTrue(result.success)
+        self.assertFalse(result.stopped_early)
+        self.assertEqual(seen, progress.solutions)
+        self.assertEqual(progress.solutions[-1]['objective'], result.penalty)
+        self.assertEqual(set(progress.solutions[0]), {'component', 'objective', 'bound', 'elapsed'})
+
+    def test_stop_accepts_first_solution(self):
+        """A stopped solve should still return a schedule, and it should not be cached."""
+        progress = SolveProgress()
+        progress.stop()
+        result = solve_schedule(self.date_from, self.date_until, progress=progress)
+
+        self.assertTrue(result.success)
+        self.assertTrue(result.stopped_early)
+        self.assertEqual(len(result.events), 2)
+        self.assertFalse(solve_schedule(self.date_from, self.date_until).cached)
+
+    def test_stop_during_stage_one_skips_stage_two(self):
+        """A two-stage solve stopped in stage one should return that schedule without solving again."""
+        solves = []
+        for options in (SolverOptions(use_cache=False), SolverOptions(use_cache=False, two_stage=True)):
+            progress = SolveProgress()
+            progress.stop()
+            with mock.patch('scheduler.solver.cp_model.CpSolver', wraps=cp_model.CpSolver) as solver_class:
+                result = solve_schedule(self.date_from, self.date_until, options, progress=progress)
+            solves.append(solver_class.call_count)
+
+            self.assertTrue(result.success)
+            self.assertTrue(result.stopped_early)
+            self.assertEqual(len(result.events), 2)
+            self.assertIsNotNone(result.penalty)
+        self.assertEqual(solves[0], solves[1])
+
+
+class SolverIncrementalTestCase(TestCase):
+    """Tests for re-solving one request against a frozen proposed schedule."""
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name="Main Pitch", type="pitch",
+            suitable_for=['juvenile_training', 'adult_training'],
+        )
+        self.team = Team.objects.create(name="Senior Men", age_group="Senior")
+        self.team2 = Team.objects.create(name="Minor Boys", age_group="U17")
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.existing = BookingRequest.objects.create(
+            team=self.team, title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+            status='scheduled',
+        )
+        self.tuesday = self._propose(datetime(2026, 3, 17, 18, 0))
+        self.thursday = self._propose(datetime(2026, 3, 19, 18, 0))
+
+    def _propose(self, start):
+        return Event.objects.create(
+            title="Senior Training",
+            start_time=timezone.make_aware(start),
+            end_time=timezone.make_aware(start + timedelta(hours=1)),
+            facility=self.facility, team=self.team, event_type='adult_training',
+            status='proposed', booking_request=self.existing,
+        )
+
+    def test_only_neighbourhood_is_replaced(self):
+        """A new Tuesday request should move only the Tuesday proposal, leaving Thursday frozen."""
+        new = BookingRequest.objects.create(
+            team=self.team2, title="Minor Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['tuesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(19, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        result = solve_incremental(new.id, self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.replaced_event_ids, {self.tuesday.id})
+        self.assertEqual(result.requests_processed, {new.id, self.existing.id})
+
+        by_request = {ev['request_id']: ev for ev in result.events}
+        self.assertEqual(by_request[new.id]['start_time'], datetime(2026, 3, 17, 18, 0))
+        self.assertGreaterEqual(by_request[self.existing.id]['start_time'], datetime(2026, 3, 17, 19, 0))
+
+    def test_unrelated_day_is_untouched(self):
+        """A request on a day with no proposals should replace nothing."""
+        new = BookingRequest.objects.create(
+            team=self.team2, title="Minor Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly',
+            preferred_days=['wednesday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+        result = solve_incremental(new.id, self.date_from, self.date_until)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.replaced_event_ids, set())
+        self.assertEqual(len(result.events), 1)
+
+
+class SolverBenchmarkTestCase(TestCase):
+    """Tests for the benchmark_solver management command."""
+
+    def setUp(self):
+        # The test database is already throwaway; don't create another one inside it
+        patcher = mock.patch('scheduler.management.commands.benchmark_solver.benchmark_database',
+                             side_effect=nullcontext)
+        self.benchmark_database = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_benchmark_writes_report_and_leaves_data(self):
+        """A tiny benchmark should report one row per scenario and roll back its synthetic club."""
+        Facility.objects.create(name="Main Pitch", type="pitch")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.csv')
+            call_command('benchmark_solver', '--teams', '4', '--weeks', '1', '--seeds', '1', '2',
+                         '--output', path, stdout=StringIO())
+            with open(path) as fh:
+                rows = list(csv.DictReader(fh))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['status'], 'OPTIMAL')
+        self.assertEqual(rows[0]['facilities'], '4')
+        self.assertEqual(list(Facility.objects.values_list('name', flat=True)), ["Main Pitch"])
+        self.assertFalse(Team.objects.exists())
+        self.benchmark_database.assert_called_once_with()
+
+    def test_benchmark_compares_formulations(self):
+        """--formulations runs each scenario once per model builder."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            call_command('benchmark_solver', '--teams', '4', '--weeks', '1', '--formulations', 'lean', 'classic',
+                         '--output', path, stdout=StringIO())
+            with open(path) as fh:
+                rows = json.load(fh)
+
+        self.assertEqual([row['formulation'] for row in rows], ['lean', 'classic'])
+        self.assertEqual(rows[0]['penalty'], rows[1]['penalty'])
+        self.assertLess(rows[0]['variables'], rows[1]['variables'])
+
+
+class SolverModelDumpTestCase(TestCase):
+    """Tests for dumping solver models and replaying them offline."""
+
+    def setUp(self):
+        Facility.objects.create(name="Main Pitch", type="pitch", suitable_for=['adult_training'])
+        self.date_from = date(2026, 3, 16)
+        self.date_until = date(2026, 3, 22)
+        self.request = BookingRequest.objects.create(
+            team=Team.objects.create(name="Senior Men"), title="Senior Training", event_type='adult_training',
+            duration_minutes=60, recurrence='weekly', preferred_days=['tuesday', 'thursday'],
+            preferred_time_start=time(18, 0), preferred_time_end=time(21, 0),
+            priority=2, schedule_from=self.date_from, schedule_until=self.date_until,
+        )
+
+    def test_dump_and_replay(self):
+        """A dumped model replays to the recorded outcome, and its sidecar maps slots to the request."""
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SOLVER_DUMP_DIR=tmp):
+            result = solve_schedule(self.date_from, self.date_until, SolverOptions(dump_model=True))
+            names = sorted(os.listdir(tmp))
+            with open(os.path.join(tmp, names[0])) as fh:
+                sidecar = json.load(fh)
+
+            path = os.path.join(tmp, 'replay.json')
+            call_command('replay_solver_model', tmp, '--time-limit', '5', '--output', path, stdout=StringIO())
+            with open(path) as fh:
+                rows = json.load(fh)
+
+        self.assertEqual([os.path.splitext(name)[1] for name in names], ['.json', '.pbtxt'])
+        self.assertEqual([slot['request_id'] for slot in sidecar['slots']], [self.request.id] * 2)
+        self.assertEqual(sidecar['result']['status'], result.status)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['status'], result.status)
+        self.assertEqual(rows[0]['objective'], result.penalty)
+        self.assertEqual(rows[0]['time_limit'], 5)
@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     FacilityViewSet, EventViewSet, TeamViewSet, BookingRequestViewSet,
-    generate_schedule, publish_schedule, discard_schedule,
+    generate_schedule, solve_job_status, accept_solve_job, incremental_schedule,
+    publish_schedule, discard_schedule,
 )
 from .auth_views import login_view, logout_view, me_view
 
@@ -15,6 +16,9 @@ router.register('requests', BookingRequestViewSet, basename='bookingrequest')
 urlpatterns = [
     path('', include(router.urls)),
     path('schedule/generate/', generate_schedule, name='generate-schedule'),
+    path('schedule/jobs/<int:job_id>/', solve_job_status, name='solve-job-status'),
+    path('schedule/jobs/<int:job_id>/accept/', accept_solve_job, name='accept-solve-job'),
+    path('schedule/incremental/', incremental_schedule, name='incremental-schedule'),
     path('schedule/publish/', publish_schedule, name='publish-schedule'),
     path('schedule/discard/', discard_schedule, name='discard-schedule'),
     path('auth/login/', login_view, name='auth-login'),
@@ -1,14 +1,33 @@
-from rest_framework import viewsets
+from rest_framework import serializers, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import Facility, Event, Team, BookingRequest
-from .serializers import FacilitySerializer, EventSerializer, TeamSerializer, BookingRequestSerializer
+from .models import Facility, Event, Team, BookingRequest, SolveJob
+from .serializers import (
+    FacilitySerializer, EventSerializer, TeamSerializer, BookingRequestSerializer, SolveJobSerializer,
+)
 from .permissions import IsAdminRole, IsCoachOrAdmin
-from .solver import solve_schedule as run_solver
-from collections import defaultdict, Counter
+from .solver import SolverOptions, MAX_PORTFOLIO_RUNS, TIME_GRANULARITIES
+from .jobs import SOLVED_STATUSES, create_job, request_stop, resolve_request_incrementally
 from datetime import date
 
+MAX_REQUEST_TIME_LIMIT = 600  # seconds — cap on a caller-supplied solver time_limit
+
+# Boolean SolverOptions fields a generate request may set, with their defaults.
+SOLVER_FLAGS = (
+    ('concurrent_windows', False),
+    ('use_hints', True),
+    ('pattern_mode', False),
+    ('use_cache', True),
+    ('allow_partial', True),
+    ('diagnose', True),
+    ('draft', False),
+    ('greedy_hints', True),
+    ('dump_model', False),
+    ('two_stage', False),
+    ('stability', False),
+)
+
 
 class FacilityViewSet(viewsets.ReadOnlyModelViewSet):
     """All authenticated users can view facilities."""
@@ -52,12 +71,104 @@ class EventViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAdminRole()]
 
+def _flag(data, name: str, default: bool) -> bool:
+    """Parse a boolean request field the way DRF does ("false", "0", "no" are False)."""
+    value = data.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError:
+        raise ValueError(f'{name} must be true or false.')
+
+
+def _solver_options_from(data) -> SolverOptions:
+    """Build SolverOptions from the optional tuning fields of a generate request.
+
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    options = SolverOptions()
+
+    window_days = data.get('window_days')
+    if window_days not in (None, ''):
+        try:
+            options.window_days = int(window_days)
+        except (TypeError, ValueError):
+            raise ValueError('window_days must be a whole number of days.')
+        if options.window_days < 1:
+            raise ValueError('window_days must be at least 1.')
+
+    for name, default in SOLVER_FLAGS:
+        setattr(options, name, _flag(data, name, default))
+
+    granularity = data.get('time_granularity')
+    if granularity not in (None, ''):
+        try:
+            options.time_granularity = int(granularity)
+        except (TypeError, ValueError):
+            raise ValueError('time_granularity must be a whole number of minutes.')
+        if options.time_granularity not in TIME_GRANULARITIES:
+            allowed = ', '.join(str(g) for g in TIME_GRANULARITIES)
+            raise ValueError(f'time_granularity must be one of: {allowed}.')
+
+    time_limit = data.get('time_limit')
+    if time_limit not in (None, ''):
+        try:
+            options.time_limit = float(time_limit)
+        except (TypeError, ValueError):
+            raise ValueError('time_limit must be a number of seconds.')
+        if not 0 < options.time_limit <= MAX_REQUEST_TIME_LIMIT:
+            raise ValueError(f'time_limit must be between 0 and {MAX_REQUEST_TIME_LIMIT} seconds.')
+
+    relative_gap = data.get('relative_gap')
+    if relative_gap not in (None, ''):
+        try:
+            options.relative_gap = float(relative_gap)
+        except (TypeError, ValueError):
+            raise ValueError('relative_gap must be a number.')
+        if not 0 <= options.relative_gap < 1:
+            raise ValueError('relative_gap must be at least 0 and below 1.')
+
+    absolute_gap = data.get('absolute_gap')
+    if absolute_gap not in (None, ''):
+        try:
+            options.absolute_gap = float(absolute_gap)
+        except (TypeError, ValueError):
+            raise ValueError('absolute_gap must be a number of penalty points.')
+        if options.absolute_gap < 0:
+            raise ValueError('absolute_gap must not be negative.')
+
+    portfolio_runs = data.get('portfolio_runs')
+    if portfolio_runs not in (None, ''):
+        try:
+            options.portfolio_runs = int(portfolio_runs)
+        except (TypeError, ValueError):
+            raise ValueError('portfolio_runs must be a whole number.')
+        if not 1 <= options.portfolio_runs <= MAX_PORTFOLIO_RUNS:
+            raise ValueError(f'portfolio_runs must be between 1 and {MAX_PORTFOLIO_RUNS}.')
+    return options
+
+
 @api_view(['POST'])
 @permission_classes([IsAdminRole])
 def generate_schedule(request):
     """
-    Run the CP-SAT solver to generate a conflict-free schedule from pending BookingRequests.
-    Creates proposed Events and updates BookingRequest statuses.
+    Queue a CP-SAT solve job that generates a conflict-free schedule from pending
+    BookingRequests, creating proposed Events and updating BookingRequest statuses.
+    Returns 202 with the job; poll /schedule/jobs/<id>/ for progress and the result.
+
+    Optional body fields: window_days (solve as a rolling horizon of N-day windows)
+    and concurrent_windows (solve those windows together rather than in order),
+    use_hints (warm-start from previous proposed/published events; default true),
+    pattern_mode (one time/facility per request and weekday across all weeks),
+    time_granularity (start-time grid in minutes, e.g. 15 for quarter hours),
+    time_limit (seconds; default scales with model size), relative_gap and
+    absolute_gap (stop once the schedule is provably this close to optimal),
+    draft (greedy placement only — a fast, unoptimised draft for long ranges),
+    portfolio_runs (solve with several seeds/presets in parallel and keep the best),
+    dump_model (write the CP-SAT models to SOLVER_DUMP_DIR for offline replay),
+    two_stage (place the most priority first, then minimise preference penalties),
+    stability (penalise moving events off their previous proposed/published placement).
     """
     date_from_str = request.data.get('date_from')
     date_until_str = request.data.get('date_until')
@@ -74,142 +185,84 @@ def generate_schedule(request):
     if date_from > date_until:
         return Response({'error': 'date_from must be before date_until.'}, status=400)
 
-    # Clean slate: delete existing proposed events in range (allows re-runs)
-    Event.objects.filter(
-        status='proposed',
-        start_time__date__gte=date_from,
-        start_time__date__lte=date_until,
-    ).delete()
+    try:
+        options = _solver_options_from(request.data)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=400)
 
-    # Reset any previously scheduled requests back to pending
-    BookingRequest.objects.filter(
-        status='scheduled',
-        schedule_from__lte=date_until,
-        schedule_until__gte=date_from,
-    ).update(status='pending')
-
-    # Run solver
-    result = run_solver(date_from, date_until)
-
-    if not result.success:
-        return Response({
-            'success': False,
-            'solver_status': result.status,
-            'solve_time_seconds': round(result.solve_time, 2),
-            'message': 'Could not find a valid schedule. Try reducing requests or relaxing constraints.',
-        })
-
-    # Bulk create proposed events (bypasses Event.save() overlap check — solver guarantees HC1)
-    new_events = [
-        Event(
-            title=ev['title'],
-            start_time=ev['start_time'],
-            end_time=ev['end_time'],
-            facility_id=ev['facility_id'],
-            team_id=ev['team_id'],
-            event_type=ev['event_type'],
-            status='proposed',
-            is_fixed=False,
-        )
-        for ev in result.events
-    ]
-    Event.objects.bulk_create(new_events)
-
-    # Update processed BookingRequests to 'scheduled'
-    if result.requests_processed:
-        BookingRequest.objects.filter(id__in=result.requests_processed).update(status='scheduled')
-
-    # Build schedule_diff for the review panel
-    schedule_diff = []
-    if result.requests_processed:
-        facility_lookup = {f.id: f.name for f in Facility.objects.all()}
-
-        processed_requests = {
-            r.id: r
-            for r in BookingRequest.objects.filter(
-                id__in=result.requests_processed
-            ).select_related('team', 'preferred_facility')
-        }
-
-        events_by_request = defaultdict(list)
-        for ev in result.events:
-            events_by_request[ev['request_id']].append(ev)
-
-        for req_id, req in processed_requests.items():
-            assigned_events = events_by_request.get(req_id, [])
-            if not assigned_events:
-                continue
-
-            # Determine assigned facility
-            facility_ids = {ev['facility_id'] for ev in assigned_events}
-            if len(facility_ids) == 1:
-                assigned_facility = facility_lookup.get(facility_ids.pop(), 'Unknown')
-            else:
-                most_common_id = Counter(ev['facility_id'] for ev in assigned_events).most_common(1)[0][0]
-                assigned_facility = f"Mixed (mostly {facility_lookup.get(most_common_id, 'Unknown')})"
-
-            # Determine assigned time
-            start_times = {ev['start_time'].strftime('%H:%M') for ev in assigned_events}
-            if len(start_times) == 1:
-                assigned_time = start_times.pop()
-            else:
-                most_common_time = Counter(ev['start_time'].strftime('%H:%M') for ev in assigned_events).most_common(1)[0][0]
-                assigned_time = f"Mixed (mostly {most_common_time})"
-
-            # Compare against preferences
-            requested_facility = req.preferred_facility.name if req.preferred_facility else 'Any'
-            requested_time = f"{req.preferred_time_start.strftime('%H:%M')}-{req.preferred_time_end.strftime('%H:%M')}"
-
-            facility_changed = bool(
-                req.preferred_facility and
-                not all(ev['facility_id'] == req.preferred_facility_id for ev in assigned_events)
-            )
-
-            time_changed = False
-            pref_start_mins = req.preferred_time_start.hour * 60 + req.preferred_time_start.minute
-            pref_end_mins = req.preferred_time_end.hour * 60 + req.preferred_time_end.minute
-            for ev in assigned_events:
-                ev_start_mins = ev['start_time'].hour * 60 + ev['start_time'].minute
-                ev_end_mins = ev_start_mins + req.duration_minutes
-                if ev_start_mins < pref_start_mins or ev_end_mins > pref_end_mins:
-                    time_changed = True
-                    break
-
-            # Per-week breakdown for expandable row
-            weekly_breakdown = []
-            for ev in sorted(assigned_events, key=lambda e: e['start_time']):
-                weekly_breakdown.append({
-                    'date': ev['start_time'].strftime('%a %d %b'),
-                    'facility': facility_lookup.get(ev['facility_id'], 'Unknown'),
-                    'time': ev['start_time'].strftime('%H:%M'),
-                    'duration': req.duration_minutes,
-                })
-
-            schedule_diff.append({
-                'request_id': req_id,
-                'team_name': req.team.name,
-                'event_type': req.event_type,
-                'title': req.title,
-                'requested_facility': requested_facility,
-                'assigned_facility': assigned_facility,
-                'facility_changed': facility_changed,
-                'requested_time': requested_time,
-                'assigned_time': assigned_time,
-                'time_changed': time_changed,
-                'events_count': len(assigned_events),
-                'priority': req.priority,
-                'weekly_breakdown': weekly_breakdown,
-            })
+    job = create_job(date_from, date_until, options, user=request.user)
+    return Response(SolveJobSerializer(job).data, status=202)
 
-    return Response({
-        'success': True,
-        'solver_status': result.status,
-        'solve_time_seconds': round(result.solve_time, 2),
-        'total_penalty': result.penalty,
-        'events_created': len(result.events),
-        'requests_processed': len(result.requests_processed),
-        'schedule_diff': schedule_diff,
-    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def solve_job_status(request, job_id):
+    """
+    Poll a solve job — status, progress and, once finished, the generate result
+    (including schedule_diff) under `result`.
+    """
+    try:
+        job = SolveJob.objects.get(id=job_id)
+    except SolveJob.DoesNotExist:
+        return Response({'error': 'Solve job not found.'}, status=404)
+    return Response(SolveJobSerializer(job).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+def accept_solve_job(request, job_id):
+    """
+    Stop a running solve job early and keep the best schedule found so far.
+    The job then finishes normally; keep polling it for the result.
+    """
+    try:
+        job = SolveJob.objects.get(id=job_id)
+    except SolveJob.DoesNotExist:
+        return Response({'error': 'Solve job not found.'}, status=404)
+
+    if not request_stop(job):
+        return Response({'error': 'Solve job has already finished.'}, status=400)
+    job.refresh_from_db()
+    return Response(SolveJobSerializer(job).data, status=202)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+def incremental_schedule(request):
+    """
+    Fit one added/edited BookingRequest into the current proposed schedule.
+
+    Only proposed events on the request's days that share a facility or its team
+    are re-solved; everything else stays where it is. date_from/date_until default
+    to the request's own scheduling period. Runs synchronously — it is fast.
+    """
+    request_id = request.data.get('request_id')
+    if not request_id:
+        return Response({'error': 'request_id is required.'}, status=400)
+
+    try:
+        booking_request = BookingRequest.objects.get(id=request_id)
+    except (BookingRequest.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Booking request not found.'}, status=404)
+
+    if booking_request.status == 'published':
+        return Response({'error': 'Published requests cannot be re-solved.'}, status=400)
+
+    try:
+        date_from = date.fromisoformat(request.data.get('date_from') or str(booking_request.schedule_from))
+        date_until = date.fromisoformat(request.data.get('date_until') or str(booking_request.schedule_until))
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+
+    if date_from > date_until:
+        return Response({'error': 'date_from must be before date_until.'}, status=400)
+
+    try:
+        options = _solver_options_from(request.data)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=400)
+
+    return Response(resolve_request_incrementally(booking_request, date_from, date_until, options))
 
 
 @api_view(['POST'])
@@ -238,7 +291,7 @@ def publish_schedule(request):
 
     # Mark corresponding BookingRequests as published (terminal status)
     BookingRequest.objects.filter(
-        status='scheduled',
+        status__in=('scheduled', 'partial'),
         schedule_from__lte=date_until,
         schedule_until__gte=date_from,
     ).update(status='published')
@@ -274,10 +327,10 @@ def discard_schedule(request):
     ).delete()[0]
 
     reset_count = BookingRequest.objects.filter(
-        status='scheduled',
+        status__in=SOLVED_STATUSES,
         schedule_from__lte=date_until,
         schedule_until__gte=date_from,
-    ).update(status='pending')
+    ).update(status='pending', rejection_reason='')
 
     return Response({
         'success': True,
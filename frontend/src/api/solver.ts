@@ -27,26 +27,109 @@ export interface ScheduleDiffEntry {
 
 // --- Generate Schedule ---
 
+export interface PortfolioRun {
+  component: number;
+  run: number;
+  seed: number;
+  preset: string;
+  status: string;
+  penalty: number | null;
+  best_bound: number | null;
+  wall_time: number;
+  kept: boolean;
+}
+
 export interface GenerateResult {
   success: boolean;
   solver_status: string;
   solve_time_seconds: number;
   total_penalty?: number;
   events_created?: number;
+  event_changes?: { created: number; updated: number; unchanged: number; deleted: number };
   requests_processed?: number;
+  components?: number;
+  windows?: number;
+  hints_added?: number;
+  hints_kept?: number;
+  cached?: boolean;
+  stopped_early?: boolean;
+  stop_reason?: "optimal" | "gap_limit" | "time_limit" | "stopped" | "infeasible" | "model_invalid" | "";
+  time_limit_seconds?: number | null;
+  requests_partial?: number;
+  requests_rejected?: number;
+  unscheduled?: { request_id: number; date: string; reason: string }[];
+  conflicts?: {
+    requests: { id: number; title: string; team_name: string }[];
+    events: { id: number; title: string; facility_name: string; start_time: string }[];
+  };
+  timings?: Record<string, number>;
+  model_stats?: Record<string, number>;
+  portfolio?: PortfolioRun[];
   message?: string;
   schedule_diff?: ScheduleDiffEntry[];
 }
 
+// --- Solve Jobs ---
+
+export interface SolutionProgress {
+  component: number;
+  objective: number;
+  bound: number;
+  elapsed: number;
+}
+
+export interface SolveJob {
+  job_id: number;
+  status: "queued" | "running" | "succeeded" | "failed";
+  status_display: string;
+  progress: string;
+  solutions: SolutionProgress[];
+  stop_requested: boolean;
+  date_from: string;
+  date_until: string;
+  result: GenerateResult | null;
+  error: string;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
+export async function getSolveJob(jobId: number): Promise<SolveJob> {
+  const response = await axios.get<SolveJob>(`/api/schedule/jobs/${jobId}/`);
+  return response.data;
+}
+
+// Stops a running job early — it finishes with the best schedule found so far
+export async function acceptSolveJob(jobId: number): Promise<SolveJob> {
+  const response = await axios.post<SolveJob>(`/api/schedule/jobs/${jobId}/accept/`);
+  return response.data;
+}
+
+// Queues a solve job, then polls it until the solver has finished
 export async function generateSchedule(
   dateFrom: string,
   dateUntil: string
 ): Promise<GenerateResult> {
-  const response = await axios.post<GenerateResult>("/api/schedule/generate/", {
+  const response = await axios.post<SolveJob>("/api/schedule/generate/", {
     date_from: dateFrom,
     date_until: dateUntil,
   });
-  return response.data;
+  let job = response.data;
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    job = await getSolveJob(job.job_id);
+  }
+  if (job.status === "failed" || !job.result) {
+    return {
+      success: false,
+      solver_status: "ERROR",
+      solve_time_seconds: 0,
+      message: job.error || "The solve job failed.",
+    };
+  }
+  return job.result;
 }
 
 // --- Publish Schedule ---